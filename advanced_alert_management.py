@@ -604,10 +604,13 @@ class AdvancedAlertManager:
         alerts = []
         
         try:
-            import psutil
+            from system_metrics_sampler import get_system_metrics_sampler
+            
+            # Latest background sample instead of a blocking one-second CPU measurement
+            sample = get_system_metrics_sampler().latest()
             
             # CPU alerts
-            cpu_percent = psutil.cpu_percent(interval=1)
+            cpu_percent = sample.cpu_percent
             if cpu_percent > 90:
                 alerts.append({
                     "level": "critical",
@@ -626,27 +629,26 @@ class AdvancedAlertManager:
                 })
             
             # Memory alerts
-            memory = psutil.virtual_memory()
-            if memory.percent > 90:
+            memory_percent = sample.memory_percent
+            if memory_percent > 90:
                 alerts.append({
                     "level": "critical",
-                    "message": f"Critical memory usage: {memory.percent:.1f}%",
+                    "message": f"Critical memory usage: {memory_percent:.1f}%",
                     "timestamp": datetime.now().isoformat(),
                     "category": "system",
-                    "value": memory.percent
+                    "value": memory_percent
                 })
-            elif memory.percent > 75:
+            elif memory_percent > 75:
                 alerts.append({
                     "level": "warning",
-                    "message": f"High memory usage: {memory.percent:.1f}%",
+                    "message": f"High memory usage: {memory_percent:.1f}%",
                     "timestamp": datetime.now().isoformat(),
                     "category": "system",
-                    "value": memory.percent
+                    "value": memory_percent
                 })
             
             # Disk space alerts
-            disk = psutil.disk_usage('/')
-            disk_percent = (disk.used / disk.total) * 100
+            disk_percent = sample.disk_percent
             if disk_percent > 90:
                 alerts.append({
                     "level": "warning",
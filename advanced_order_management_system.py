@@ -15,16 +15,25 @@ import json
 import sqlite3
 import threading
 import time as time_module
-from typing import Dict, List, Optional, Any, Tuple, Union
-from dataclasses import dataclass, asdict
+from typing import Callable, Dict, Iterator, List, Optional, Any, Tuple, Union
+from dataclasses import dataclass, asdict, replace
 from enum import Enum
 import logging
 import uuid
 from collections import defaultdict, deque
 import asyncio
+import atexit
+import bisect
+import heapq
+import itertools
+import math
 import websocket
 import requests
 
+from local_order_book import OrderBookManager
+from matching_engine import MatchingEngine, MatchReport
+from volume_profile import VolumeProfileService, get_volume_profile_service
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -112,6 +121,7 @@ class OrderState:
     last_update: datetime
     status_message: str
     executions: List[OrderExecution]
+    filled_notional: float = 0.0  # running sum of fill quantity * price; avg_fill_price derives from it
 
 @dataclass
 class MarketData:
@@ -134,14 +144,54 @@ class RiskCheck:
     timestamp: datetime
 
 class OrderDatabase:
-    def __init__(self, db_path: str = "orders.db"):
+    """SQLite store for orders, states, executions and risk checks.
+
+    Writes go through an in-memory journal: ``record_*`` calls only build a
+    row tuple and append it with a sequence number, so the trading hot path
+    never touches the disk. A writer thread drains the journal in group
+    commits (every ``flush_interval_ms`` or ``max_batch`` events, whichever
+    comes first) using ``executemany`` against a WAL-mode database. Repeated
+    state updates of one order within a batch collapse into a single upsert.
+    ``durable_seq`` is the highest sequence number known to be on disk;
+    ``wait_durable(seq)`` blocks until an event is committed and ``load()``
+    rebuilds the in-memory model after a restart.
+    """
+
+    TABLES = ("orders", "risk_checks", "executions", "order_states")  # commit order respects FKs
+    UPSERTS = {
+        "orders": "INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        "order_states": "INSERT OR REPLACE INTO order_states VALUES (?, ?, ?, ?, ?, ?, ?)",
+        "executions": "INSERT OR IGNORE INTO executions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        "risk_checks": "INSERT OR IGNORE INTO risk_checks VALUES (?, ?, ?, ?, ?, ?)",
+    }
+
+    def __init__(self, db_path: str = "orders.db", flush_interval_ms: float = 20, max_batch: int = 500,
+                 max_pending: int = 100000):
         self.db_path = db_path
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.max_pending = max_pending
         self.init_database()
+        
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._next_seq = 0
+        self.durable_seq = 0
+        self.committed_batches = 0
+        self.rejected_rows = 0  # rows SQLite refused even on their own; logged and set aside
+        self._closed = False
+        self._failure: Optional[BaseException] = None  # set if the writer thread dies
+        self._writer = threading.Thread(target=self._write_loop, name="order-db-writer", daemon=True)
+        self._writer.start()
+        # The writer is a daemon thread; drain the journal on normal interpreter exit
+        atexit.register(self.close)
     
     def init_database(self):
         """Initialize order management database."""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
+        # WAL lets readers (dashboards, recovery tools) run while the writer commits
+        cursor.execute("PRAGMA journal_mode=WAL")
         
         # Orders table
         cursor.execute('''
@@ -214,9 +264,479 @@ class OrderDatabase:
         
         conn.commit()
         conn.close()
+    
+    # --- Hot path: build a row and enqueue it, no I/O ---
+    
+    def _append(self, table: str, row: tuple) -> int:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("OrderDatabase is closed")
+            while len(self._pending) >= self.max_pending and self._failure is None:
+                # Backpressure only when the disk cannot keep up at all
+                self._cond.wait()
+            if self._failure is not None:
+                raise RuntimeError(f"Order journal writer failed: {self._failure}")
+            self._next_seq += 1
+            self._pending.append((self._next_seq, table, row))
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                # First event opens a batch window; a full batch is written right away
+                self._cond.notify_all()
+            return self._next_seq
+    
+    def record_order(self, order: OrderRequest) -> int:
+        return self._append("orders", (
+            order.order_id, order.symbol, order.side.value, order.order_type.value, order.quantity,
+            order.price, order.stop_price, order.time_in_force, order.algorithm.value, order.priority.value,
+            order.parent_order_id, order.client_order_id, order.trader_id, order.created_at.isoformat(),
+            order.valid_until.isoformat() if order.valid_until else None, order.min_quantity,
+            order.display_quantity, json.dumps(order.metadata, default=str)
+        ))
+    
+    def record_state(self, state: OrderState) -> int:
+        return self._append("order_states", (
+            state.order_id, state.status.value, state.filled_quantity, state.remaining_quantity,
+            state.avg_fill_price, state.last_update.isoformat(), state.status_message
+        ))
+    
+    def record_execution(self, execution: OrderExecution) -> int:
+        return self._append("executions", (
+            execution.execution_id, execution.order_id, execution.symbol, execution.side.value,
+            execution.quantity, execution.price, execution.commission, execution.timestamp.isoformat(),
+            execution.exchange, execution.liquidity_flag, execution.execution_venue
+        ))
+    
+    def record_risk_check(self, check: RiskCheck) -> int:
+        return self._append("risk_checks", (
+            check.check_id, check.order_id, check.check_type, check.status, check.message,
+            check.timestamp.isoformat()
+        ))
+    
+    # --- Writer thread ---
+    
+    def _write_loop(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # WAL + synchronous=FULL: each group commit is one fsync of the log
+        conn.execute("PRAGMA synchronous=FULL")
+        try:
+            self._write_batches(conn)
+        except Exception as e:
+            # Fail loudly: producers and waiters raise instead of blocking on a journal that never advances
+            logger.exception(f"Order DB writer stopped: {e}")
+            with self._cond:
+                self._failure = e
+                self._cond.notify_all()
+        finally:
+            conn.close()
+    
+    def _write_batches(self, conn: sqlite3.Connection):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return  # closed and drained
+                # Give the batch time to fill unless it is already full or we are closing
+                deadline = time_module.monotonic() + self.flush_interval
+                while len(self._pending) < self.max_batch and not self._closed:
+                    remaining = deadline - time_module.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+                self._cond.notify_all()  # wake producers blocked on backpressure
+            
+            self._commit(conn, batch)
+            with self._cond:
+                self.durable_seq = batch[-1][0]
+                self.committed_batches += 1
+                self._cond.notify_all()
+    
+    def _commit(self, conn: sqlite3.Connection, batch: List[Tuple[int, str, tuple]]):
+        rows: Dict[str, Any] = {table: ([] if table in ("executions", "risk_checks") else {})
+                                for table in self.TABLES}
+        for _, table, row in batch:
+            if isinstance(rows[table], dict):
+                rows[table][row[0]] = row  # last write per key wins
+            else:
+                rows[table].append(row)
+        values = {table: list(rows[table].values()) if isinstance(rows[table], dict) else rows[table]
+                  for table in self.TABLES}
+        while True:
+            try:
+                with conn:
+                    for table in self.TABLES:
+                        if values[table]:
+                            conn.executemany(self.UPSERTS[table], values[table])
+                return
+            except sqlite3.OperationalError as e:
+                # Typically "database is locked" by an external reader/writer; never drop acked events
+                logger.error(f"Order DB commit failed, retrying: {e}")
+                time_module.sleep(0.1)
+            except sqlite3.Error as e:
+                # A bad row (constraint, unbindable type) would fail every retry; find it row by row
+                logger.error(f"Order DB batch rejected, writing its rows one at a time: {e}")
+                break
+        for table in self.TABLES:
+            for value in values[table]:
+                while True:
+                    try:
+                        with conn:
+                            conn.execute(self.UPSERTS[table], value)
+                        break
+                    except sqlite3.OperationalError as e:
+                        logger.error(f"Order DB commit failed, retrying: {e}")
+                        time_module.sleep(0.1)
+                    except sqlite3.Error as e:
+                        logger.error(f"Order DB set aside {table} row {value[0]!r}: {e}")
+                        self.rejected_rows += 1
+                        break
+    
+    def wait_durable(self, seq: Optional[int] = None, timeout: Optional[float] = None) -> bool:
+        """Block until event ``seq`` (default: everything appended so far) is committed"""
+        with self._cond:
+            target = self._next_seq if seq is None else seq
+            done = self._cond.wait_for(lambda: self.durable_seq >= target or self._failure is not None, timeout)
+            if self.durable_seq < target and self._failure is not None:
+                raise RuntimeError(f"Order journal writer failed: {self._failure}")
+            return done
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return self.wait_durable(None, timeout)
+    
+    def close(self, timeout: Optional[float] = 10):
+        """Drain the journal and stop the writer"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join(timeout)
+    
+    def stats(self) -> Dict[str, int]:
+        return {"pending": len(self._pending), "appended": self._next_seq, "durable_seq": self.durable_seq,
+                "committed_batches": self.committed_batches, "rejected_rows": self.rejected_rows}
+    
+    # --- Recovery ---
+    
+    def load(self) -> Dict[str, Any]:
+        """Read everything back as OMS objects: orders, states (with executions), executions, risk checks"""
+        def parse_time(value):
+            return datetime.fromisoformat(value) if value else None
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            orders = {}
+            for row in conn.execute("SELECT * FROM orders ORDER BY created_at"):
+                orders[row[0]] = OrderRequest(
+                    order_id=row[0], symbol=row[1], side=OrderSide(row[2]), order_type=OrderType(row[3]),
+                    quantity=row[4], price=row[5], stop_price=row[6], time_in_force=row[7],
+                    algorithm=ExecutionAlgorithm(row[8]), priority=OrderPriority(row[9]),
+                    parent_order_id=row[10], client_order_id=row[11], trader_id=row[12],
+                    created_at=parse_time(row[13]), valid_until=parse_time(row[14]), min_quantity=row[15],
+                    display_quantity=row[16], metadata=json.loads(row[17]) if row[17] else {}
+                )
+            executions = [self._execution_from_row(row)
+                          for row in conn.execute("SELECT * FROM executions ORDER BY rowid")]
+            by_order = defaultdict(list)
+            for execution in executions:
+                by_order[execution.order_id].append(execution)
+            states = {
+                row[0]: OrderState(
+                    order_id=row[0], status=OrderStatus(row[1]), filled_quantity=row[2], remaining_quantity=row[3],
+                    avg_fill_price=row[4], last_update=parse_time(row[5]), status_message=row[6],
+                    executions=by_order.get(row[0], []), filled_notional=(row[2] or 0.0) * (row[4] or 0.0)
+                )
+                for row in conn.execute("SELECT * FROM order_states")
+            }
+            risk_checks = [self._risk_check_from_row(row)
+                           for row in conn.execute("SELECT * FROM risk_checks ORDER BY rowid")]
+        finally:
+            conn.close()
+        return {"orders": orders, "order_states": states, "executions": executions, "risk_checks": risk_checks}
+    
+    @staticmethod
+    def _execution_from_row(row: tuple) -> OrderExecution:
+        return OrderExecution(
+            execution_id=row[0], order_id=row[1], symbol=row[2], side=OrderSide(row[3]), quantity=row[4],
+            price=row[5], commission=row[6], timestamp=datetime.fromisoformat(row[7]) if row[7] else None,
+            exchange=row[8], liquidity_flag=row[9], execution_venue=row[10]
+        )
+    
+    @staticmethod
+    def _risk_check_from_row(row: tuple) -> RiskCheck:
+        return RiskCheck(check_id=row[0], order_id=row[1], check_type=row[2], status=row[3], message=row[4],
+                         timestamp=datetime.fromisoformat(row[5]) if row[5] else None)
+    
+    def row_count(self, table: str) -> int:
+        """Committed rows in ``table``"""
+        self.flush(timeout=5)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        finally:
+            conn.close()
+    
+    def read_history(self, table: str, offset: int, limit: int) -> List[Any]:
+        """Committed executions or risk checks in journal order, ``limit`` rows from ``offset``"""
+        parse = {"executions": self._execution_from_row, "risk_checks": self._risk_check_from_row}[table]
+        self.flush(timeout=5)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute(f"SELECT * FROM {table} ORDER BY rowid LIMIT ? OFFSET ?", (limit, offset))
+            return [parse(row) for row in rows]
+        finally:
+            conn.close()
+
+
+class RollingHistory:
+    """Newest ``maxlen`` records in memory; older ones stay in the journal and are read back on demand.
+
+    Every execution and risk check is already written to SQLite by
+    OrderDatabase, so dropping the oldest in-memory entry spills nothing
+    new: it only bounds memory. ``total_count`` counts every record ever
+    appended, and ``older()`` pages back through the evicted ones.
+    """
+    
+    def __init__(self, maxlen: int = 10000, load_older: Optional[Callable[[int, int], List[Any]]] = None):
+        self.maxlen = maxlen
+        self._items = deque(maxlen=maxlen)
+        self._load_older = load_older
+        self.total_count = 0
+    
+    def append(self, item: Any):
+        self._items.append(item)
+        self.total_count += 1
+    
+    def extend(self, items: List[Any]):
+        for item in items:
+            self.append(item)
+    
+    @property
+    def spilled(self) -> int:
+        """Records no longer held in memory"""
+        return self.total_count - len(self._items)
+    
+    def recent(self, n: int) -> List[Any]:
+        """Newest ``n`` records, oldest first"""
+        n = min(n, len(self._items))
+        return list(itertools.islice(self._items, len(self._items) - n, None))
+    
+    def older(self, limit: int = 100, skip: int = 0) -> List[Any]:
+        """Evicted records, oldest first: the ``limit`` newest after skipping the ``skip`` newest evicted"""
+        end = self.spilled - skip
+        if self._load_older is None or end <= 0:
+            return []
+        start = max(0, end - limit)
+        return self._load_older(start, end - start)
+    
+    def copy(self) -> List[Any]:
+        return list(self._items)
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def __iter__(self):
+        return iter(self._items)
+    
+    def __getitem__(self, index: int) -> Any:
+        return self._items[index]
+
+@dataclass
+class BlotterPage:
+    rows: List[Tuple[OrderRequest, OrderState]]  # newest first
+    offset: int
+    limit: int
+    total: Optional[int]  # number of matches, when known without scanning past the page
+    has_more: bool
+
+class OrderBlotter:
+    """Secondary indexes over every order and child slice, for paged blotter queries.
+
+    Each order gets a registration number. The symbol, trader, parent and
+    time-bucket indexes are append-only lists of those numbers, so they are
+    sorted for free. Each status has a sorted list with lazy deletion: a
+    transition inserts into the new status's list (near its end, since recent
+    orders are the ones that move) and an entry only counts while the order
+    still has that status; a list is compacted once stale entries outnumber
+    live ones.
+
+    A query walks the smallest matching index newest first, tests the other
+    filters on each candidate and stops once the page is full.
+    """
+    
+    def __init__(self, bucket_seconds: int = 60):
+        self.bucket_seconds = bucket_seconds
+        self._lock = threading.RLock()
+        self._seq: Dict[str, int] = {}
+        self._orders: List[OrderRequest] = []
+        self._states: List[OrderState] = []
+        self._status: List[OrderStatus] = []
+        self._by_status: Dict[OrderStatus, List[int]] = defaultdict(list)
+        self.status_counts: Dict[OrderStatus, int] = defaultdict(int)
+        self._by_symbol: Dict[str, List[int]] = defaultdict(list)
+        self._by_trader: Dict[str, List[int]] = defaultdict(list)
+        self._by_parent: Dict[Optional[str], List[int]] = defaultdict(list)  # None: top-level orders
+        self._by_bucket: Dict[int, List[int]] = defaultdict(list)
+        self._buckets: List[int] = []  # sorted keys of _by_bucket
+    
+    def _bucket(self, when: datetime) -> int:
+        return int(when.timestamp() // self.bucket_seconds)
+    
+    def add(self, order: OrderRequest, state: OrderState):
+        with self._lock:
+            seq = self._seq.get(order.order_id)
+            if seq is not None:
+                self._states[seq] = state
+                self.set_status(order.order_id, state.status)
+                return
+            seq = len(self._orders)
+            self._seq[order.order_id] = seq
+            self._orders.append(order)
+            self._states.append(state)
+            self._status.append(state.status)
+            self._by_status[state.status].append(seq)
+            self.status_counts[state.status] += 1
+            self._by_symbol[order.symbol].append(seq)
+            self._by_trader[order.trader_id].append(seq)
+            self._by_parent[order.parent_order_id].append(seq)
+            bucket = self._bucket(order.created_at)
+            if bucket not in self._by_bucket:
+                bisect.insort(self._buckets, bucket)
+            self._by_bucket[bucket].append(seq)
+    
+    def set_status(self, order_id: str, status: OrderStatus):
+        with self._lock:
+            seq = self._seq.get(order_id)
+            if seq is None:
+                return
+            previous = self._status[seq]
+            if previous == status:
+                return
+            self._status[seq] = status
+            self.status_counts[previous] -= 1
+            self.status_counts[status] += 1
+            bisect.insort(self._by_status[status], seq)
+            entries = self._by_status[previous]
+            if len(entries) > 2 * self.status_counts[previous] + 64:
+                self._by_status[previous] = [entry for i, entry in enumerate(entries)
+                                             if self._status[entry] == previous and (i == 0 or entries[i - 1] != entry)]
+    
+    def get(self, order_id: str) -> Optional[Tuple[OrderRequest, OrderState]]:
+        with self._lock:
+            seq = self._seq.get(order_id)
+            return None if seq is None else (self._orders[seq], self._states[seq])
+    
+    def __len__(self) -> int:
+        return len(self._orders)
+    
+    def _status_seqs(self, status: OrderStatus) -> Iterator[int]:
+        """Live entries of one status list, newest first"""
+        previous = None
+        for seq in reversed(self._by_status.get(status, ())):
+            if seq != previous and self._status[seq] == status:
+                yield seq
+            previous = seq
+    
+    def _bucket_seqs(self, keys: List[int]) -> Iterator[int]:
+        for key in reversed(keys):
+            yield from reversed(self._by_bucket[key])
+    
+    def query(self, status: Optional[Union[OrderStatus, List[OrderStatus]]] = None, symbol: Optional[str] = None,
+              trader_id: Optional[str] = None, parent_order_id: Optional[str] = None, top_level_only: bool = False,
+              since: Optional[datetime] = None, until: Optional[datetime] = None,
+              offset: int = 0, limit: int = 50) -> BlotterPage:
+        """One page of matching orders, newest first.
+
+        Pages follow registration order, or time bucket order when a time
+        range is the only filter. ``top_level_only`` drops child slices.
+        """
+        statuses = None if status is None else ([status] if isinstance(status, OrderStatus) else list(status))
+        with self._lock:
+            # (size, seqs newest first or a sorted list, filter name)
+            drivers = []
+            if statuses is not None:
+                drivers.append((sum(self.status_counts[s] for s in statuses),
+                                lambda: heapq.merge(*(self._status_seqs(s) for s in statuses), reverse=True),
+                                "status"))
+            for name, index, key, wanted in (
+                    ("symbol", self._by_symbol, symbol, symbol is not None),
+                    ("trader", self._by_trader, trader_id, trader_id is not None),
+                    ("parent", self._by_parent, parent_order_id, parent_order_id is not None or top_level_only)):
+                if wanted:
+                    entries = index.get(key, [])
+                    drivers.append((len(entries), entries, name))
+            if since is not None or until is not None:
+                lo = bisect.bisect_left(self._buckets, self._bucket(since)) if since is not None else 0
+                hi = bisect.bisect_right(self._buckets, self._bucket(until)) if until is not None else len(self._buckets)
+                keys = self._buckets[lo:hi]
+                # Only worth sizing up to the best index found so far
+                bound = min((d[0] for d in drivers), default=0)
+                size = 0
+                for key in keys:
+                    if size > bound:
+                        break
+                    size += len(self._by_bucket[key])
+                drivers.append((size, lambda: self._bucket_seqs(keys), "time"))
+            if not drivers:
+                drivers.append((len(self._orders), range(len(self._orders)), "all"))
+            size, driver, used = min(drivers, key=lambda d: d[0])
+            
+            def matches(seq: int) -> bool:
+                order = self._orders[seq]
+                return ((statuses is None or used == "status" or self._status[seq] in statuses)
+                        and (symbol is None or order.symbol == symbol)
+                        and (trader_id is None or order.trader_id == trader_id)
+                        and (used == "parent" or (parent_order_id is None and not top_level_only)
+                             or order.parent_order_id == parent_order_id)
+                        and (since is None or order.created_at >= since)
+                        and (until is None or order.created_at <= until))
+            
+            exact = len(drivers) == 1 and used != "time"
+            if exact and not callable(driver):
+                # A sorted index with nothing else to check: slice the page straight out
+                end = max(len(driver) - offset, 0)
+                seqs = driver[max(end - limit, 0):end][::-1]
+                has_more = end - limit > 0
+            else:
+                candidates = driver() if callable(driver) else reversed(driver)
+                if not exact:
+                    candidates = filter(matches, candidates)
+                seqs = list(itertools.islice(candidates, offset, offset + limit + 1))
+                has_more = len(seqs) > limit
+                seqs = seqs[:limit]
+            return BlotterPage(rows=[(self._orders[seq], self._states[seq]) for seq in seqs], offset=offset,
+                               limit=limit, total=size if exact else None, has_more=has_more)
+
+@dataclass
+class VenueStats:
+    latency_ms: float  # EWMA round-trip latency
+    fill_rate: float  # EWMA filled / requested
+    samples: int = 0
 
 class OrderRouter:
-    def __init__(self):
+    """Smart order router scoring venues by expected cost in basis points.
+
+    The cost of sending ``quantity`` to a venue is:
+    - its fee,
+    - the price impact of walking its local order book (or a liquidity-based
+      guess when there is no book),
+    - a latency penalty,
+    - a penalty for the share that historically goes unfilled.
+
+    Latency and fill rate are EWMAs updated from live executions.
+
+    Rankings are cached per (symbol, side, notional size bucket). A ranking
+    is recomputed only when a venue statistic has moved by more than
+    ``tolerance`` or one of the venue books has applied a new update, so
+    repeated routing decisions are a few dict lookups. ``route`` splits an
+    order across venues when walking the combined books is cheaper than
+    the best single venue.
+    """
+    
+    LATENCY_COST_BPS_PER_MS = 0.02  # adverse move risk while the order is in flight
+    MISS_COST_BPS = 10.0  # re-routing cost of the expected unfilled share
+    UNKNOWN_DEPTH_IMPACT_BPS = 5.0  # impact assumed at a venue without a local book
+    SPLIT_COST_BPS = 0.5  # per additional child order
+    
+    def __init__(self, alpha: float = 0.2, tolerance: float = 0.05):
         self.venues = {
             'BINANCE': {'fees': 0.001, 'latency': 50, 'liquidity_score': 0.95},
             'COINBASE': {'fees': 0.005, 'latency': 80, 'liquidity_score': 0.90},
@@ -224,142 +744,298 @@ class OrderRouter:
             'INTERNAL': {'fees': 0.0, 'latency': 10, 'liquidity_score': 0.70}
         }
         self.routing_rules = {}
+        self.alpha = alpha
+        self.tolerance = tolerance
+        # Static numbers are only the priors; measurements take over
+        self.stats = {venue: VenueStats(props['latency'], props['liquidity_score'])
+                      for venue, props in self.venues.items()}
+        self._published = {venue: (stats.latency_ms, stats.fill_rate) for venue, stats in self.stats.items()}
+        self._stats_version = 0
+        self.books: Dict[str, OrderBookManager] = {}
+        self._rankings: Dict[Tuple[str, bool, int], Tuple[tuple, List[Tuple[float, str]]]] = {}
+        self._lock = threading.Lock()
+    
+    # --- Inputs ---
+    
+    def attach_books(self, venue: str, books: OrderBookManager):
+        """Use ``books`` as the local L2 view of ``venue``."""
+        self.books[venue] = books
+    
+    def record_latency(self, venue: str, latency_ms: float):
+        with self._lock:
+            stats = self.stats[venue]
+            stats.latency_ms += self.alpha * (latency_ms - stats.latency_ms)
+            stats.samples += 1
+            self._maybe_publish(venue)
+    
+    def record_fill(self, venue: str, requested: float, filled: float):
+        if requested <= 0:
+            return
+        with self._lock:
+            stats = self.stats[venue]
+            stats.fill_rate += self.alpha * (min(filled / requested, 1.0) - stats.fill_rate)
+            self._maybe_publish(venue)
+    
+    def _maybe_publish(self, venue: str):
+        # Small EWMA drift keeps the cached rankings; a material move invalidates them
+        stats = self.stats[venue]
+        latency, fill_rate = self._published[venue]
+        if abs(stats.latency_ms - latency) > self.tolerance * max(latency, 1e-3) or \
+                abs(stats.fill_rate - fill_rate) > self.tolerance * max(fill_rate, 1e-3):
+            self._published[venue] = (stats.latency_ms, stats.fill_rate)
+            self._stats_version += 1
+    
+    # --- Costs ---
+    
+    def _fixed_cost_bps(self, venue: str) -> float:
+        latency, fill_rate = self._published[venue]
+        return (self.venues[venue]['fees'] * 10000 + latency * self.LATENCY_COST_BPS_PER_MS
+                + (1 - fill_rate) * self.MISS_COST_BPS)
+    
+    def _levels(self, venue: str, symbol: str, is_buy: bool) -> List[Tuple[float, float]]:
+        manager = self.books.get(venue)
+        book = manager.get(symbol) if manager is not None else None
+        if book is None:
+            return []
+        with book.lock:
+            side = book.ask_depth(len(book.asks)) if is_buy else book.bid_depth(len(book.bids))
+            return list(side)
+    
+    def _impact_bps(self, venue: str, symbol: str, is_buy: bool, quantity: float, reference: float) -> float:
+        levels = self._levels(venue, symbol, is_buy)
+        unknown = self.UNKNOWN_DEPTH_IMPACT_BPS / self.venues[venue]['liquidity_score']
+        if not levels:
+            return unknown
+        left, cost = quantity, 0.0
+        for price, size in levels:
+            take = min(left, size)
+            cost += take * price
+            left -= take
+            if left <= 0:
+                break
+        average = cost / (quantity - left) if quantity > left else levels[0][0]
+        impact = (average - reference) / reference * 10000 if is_buy else (reference - average) / reference * 10000
+        # Quantity beyond the visible book pays the unknown-depth penalty on top
+        return impact + unknown * left / quantity
+    
+    def _versions(self, symbol: str) -> tuple:
+        books = []
+        for venue, manager in self.books.items():
+            book = manager.get(symbol)
+            books.append(book.update_id if book is not None else None)
+        return (self._stats_version, *books)
+    
+    def rank_venues(self, symbol: str, is_buy: bool, quantity: float, reference: float) -> List[Tuple[float, str]]:
+        """(expected cost bps, venue) pairs, cheapest first; cached until an input changes"""
+        bucket = int(math.log2(max(quantity * reference, 1.0)))
+        key = (symbol, is_buy, bucket)
+        versions = self._versions(symbol)
+        cached = self._rankings.get(key)
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+        ranking = sorted(
+            (self._fixed_cost_bps(venue) + self._impact_bps(venue, symbol, is_buy, quantity, reference), venue)
+            for venue in self.venues
+        )
+        self._rankings[key] = (versions, ranking)
+        return ranking
+    
+    # --- Decisions ---
+    
+    @staticmethod
+    def _reference_price(order: OrderRequest, market_data: Dict[str, MarketData]) -> Optional[float]:
+        symbol_data = market_data.get(order.symbol)
+        if symbol_data is not None:
+            return (symbol_data.bid_price + symbol_data.ask_price) / 2
+        return order.price
     
     def select_venue(self, order: OrderRequest, market_data: Dict[str, MarketData]) -> str:
         """Smart order routing to select best execution venue."""
-        symbol_data = market_data.get(order.symbol)
-        if not symbol_data:
+        reference = self._reference_price(order, market_data)
+        if not reference:
             return 'BINANCE'  # Default venue
-        
-        # Calculate venue scores based on multiple factors
-        venue_scores = {}
-        
-        for venue, props in self.venues.items():
-            # Score = liquidity_weight * liquidity + cost_weight * (1-fees) + speed_weight * (1/latency)
-            liquidity_weight = 0.4
-            cost_weight = 0.4
-            speed_weight = 0.2
-            
-            liquidity_score = props['liquidity_score']
-            cost_score = 1 - props['fees']
-            speed_score = 1 / (props['latency'] + 1)
-            
-            total_score = (liquidity_weight * liquidity_score + 
-                          cost_weight * cost_score + 
-                          speed_weight * speed_score)
-            
-            venue_scores[venue] = total_score
-        
-        # Select venue with highest score
-        best_venue = max(venue_scores.items(), key=lambda x: x[1])[0]
-        return best_venue
+        ranking = self.rank_venues(order.symbol, order.side == OrderSide.BUY, order.quantity, reference)
+        return ranking[0][1]
+    
+    def route(self, order: OrderRequest, market_data: Dict[str, MarketData]) -> List[Tuple[str, float]]:
+        """Venue allocation for ``order``: the best single venue, or a split when that is cheaper."""
+        reference = self._reference_price(order, market_data)
+        if not reference:
+            return [('BINANCE', order.quantity)]
+        is_buy = order.side == OrderSide.BUY
+        ranking = self.rank_venues(order.symbol, is_buy, order.quantity, reference)
+        best_cost, best_venue = ranking[0]
+        
+        # Walk every venue book at once, cheapest level first, costs in bps of the reference
+        candidates = []
+        for venue in self.books:
+            fixed = self._fixed_cost_bps(venue)
+            for price, size in self._levels(venue, order.symbol, is_buy):
+                move = (price - reference) if is_buy else (reference - price)
+                candidates.append((move / reference * 10000 + fixed, venue, size))
+        if len({venue for _, venue, _ in candidates}) < 2:
+            return [(best_venue, order.quantity)]
+        
+        allocation: Dict[str, float] = defaultdict(float)
+        left, total_cost = order.quantity, 0.0
+        for cost, venue, size in sorted(candidates):
+            take = min(left, size)
+            allocation[venue] += take
+            total_cost += take * cost
+            left -= take
+            if left <= 0:
+                break
+        if left > 0:
+            # Deeper than every visible book: the rest goes to the best venue overall
+            allocation[best_venue] += left
+            total_cost += left * best_cost
+        split_cost = total_cost / order.quantity + self.SPLIT_COST_BPS * (len(allocation) - 1)
+        if len(allocation) < 2 or split_cost >= best_cost:
+            return [(best_venue, order.quantity)]
+        return sorted(allocation.items(), key=lambda item: -item[1])
 
 class AlgorithmicExecutor:
-    def __init__(self):
+    """Child-order generators for the execution algorithms.
+
+    Each algorithm is a generator that builds the next slice only when it is
+    asked for one. The OMS pulls a slice when the previous one is done, so a
+    parent never has more than one working slice in memory. Slice sizes come
+    from ``remaining()``, the parent quantity not yet filled or working, and
+    slices without a parent limit price are priced from ``quote()``, the
+    live top of book.
+    """
+    
+    VWAP_SLICES = 12  # 12 5-minute intervals
+    VWAP_SLICE_MINUTES = 5
+    
+    def __init__(self, volume_profiles: Optional[VolumeProfileService] = None):
         self.active_algorithms = {}
         self.market_data = {}
+        self.volume_profiles = volume_profiles or get_volume_profile_service()
     
-    def execute_twap(self, order: OrderRequest, duration_minutes: int = 60) -> List[OrderRequest]:
-        """Time-Weighted Average Price execution algorithm."""
-        child_orders = []
-        num_slices = min(20, duration_minutes // 3)  # Create slices every 3 minutes
-        slice_quantity = order.quantity / num_slices
+    @staticmethod
+    def _tracker(order: OrderRequest, remaining: Optional[Callable[[], float]]):
+        """``remaining`` or, without a live source, the parent quantity minus what was already sliced"""
+        if remaining is not None:
+            return remaining, lambda quantity: None
+        issued = [0.0]
+        
+        def issue(quantity: float):
+            issued[0] += quantity
+        return (lambda: order.quantity - issued[0]), issue
+    
+    @staticmethod
+    def _child(order: OrderRequest, tag: str, number: int, quantity: float, order_type: OrderType,
+               price: Optional[float], time_in_force: str, created_at: datetime,
+               min_quantity: Optional[float], metadata: Dict[str, Any]) -> OrderRequest:
+        return OrderRequest(
+            order_id=f"{order.order_id}_{tag}_{number}",
+            symbol=order.symbol,
+            side=order.side,
+            order_type=order_type,
+            quantity=quantity,
+            price=price,
+            stop_price=order.stop_price if order_type in (OrderType.STOP, OrderType.STOP_LIMIT) else None,
+            time_in_force=time_in_force,
+            algorithm=order.algorithm,
+            priority=order.priority,
+            parent_order_id=order.order_id,
+            client_order_id=f"{order.client_order_id}_{tag}_{number}",
+            trader_id=order.trader_id,
+            created_at=created_at,
+            valid_until=order.valid_until,
+            min_quantity=min_quantity,
+            display_quantity=quantity,
+            metadata={**order.metadata, **metadata}
+        )
+    
+    @staticmethod
+    def _slice_price(order: OrderRequest, quote: Optional[Callable[[], Optional[MarketData]]]):
+        """Parent limit, else a marketable limit at the live touch, else a market slice"""
+        if order.price is not None:
+            return OrderType.LIMIT, order.price
+        market = quote() if quote else None
+        if market is None:
+            return OrderType.MARKET, None
+        return OrderType.LIMIT, market.ask_price if order.side == OrderSide.BUY else market.bid_price
+    
+    def twap_slices(self, order: OrderRequest, duration_minutes: int = 60,
+                    remaining: Optional[Callable[[], float]] = None,
+                    quote: Optional[Callable[[], Optional[MarketData]]] = None) -> Iterator[OrderRequest]:
+        """Time-Weighted Average Price: equal shares of what is left, one per interval."""
+        num_slices = max(1, min(20, duration_minutes // 3))  # Create slices every 3 minutes
         interval_seconds = (duration_minutes * 60) // num_slices
+        remaining, issue = self._tracker(order, remaining)
         
         for i in range(num_slices):
-            child_order = OrderRequest(
-                order_id=f"{order.order_id}_TWAP_{i+1}",
-                symbol=order.symbol,
-                side=order.side,
-                order_type=OrderType.LIMIT,
-                quantity=slice_quantity,
-                price=order.price,
-                stop_price=None,
-                time_in_force="IOC",
-                algorithm=ExecutionAlgorithm.TWAP,
-                priority=order.priority,
-                parent_order_id=order.order_id,
-                client_order_id=f"{order.client_order_id}_TWAP_{i+1}",
-                trader_id=order.trader_id,
-                created_at=order.created_at + timedelta(seconds=i * interval_seconds),
-                valid_until=order.valid_until,
-                min_quantity=slice_quantity * 0.1,
-                display_quantity=slice_quantity,
-                metadata={**order.metadata, "slice": i+1, "total_slices": num_slices}
-            )
-            child_orders.append(child_order)
-        
-        return child_orders
+            left = remaining()
+            if left <= 1e-12:
+                return
+            slice_quantity = left / (num_slices - i)
+            order_type, price = self._slice_price(order, quote)
+            issue(slice_quantity)
+            yield self._child(order, "TWAP", i + 1, slice_quantity, order_type, price, "IOC",
+                              order.created_at + timedelta(seconds=i * interval_seconds), slice_quantity * 0.1,
+                              {"slice": i + 1, "total_slices": num_slices})
     
-    def execute_vwap(self, order: OrderRequest, historical_volume: List[float]) -> List[OrderRequest]:
-        """Volume-Weighted Average Price execution algorithm."""
-        child_orders = []
-        total_historical_volume = sum(historical_volume)
+    def vwap_slices(self, order: OrderRequest, historical_volume: Optional[List[float]] = None,
+                    remaining: Optional[Callable[[], float]] = None,
+                    quote: Optional[Callable[[], Optional[MarketData]]] = None) -> Iterator[OrderRequest]:
+        """Volume-Weighted Average Price: what is left, split by the rest of the volume profile.
+
+        Without an explicit ``historical_volume`` the schedule is the symbol's
+        intraday volume curve over the next hour, starting at ``created_at``.
+        """
+        if historical_volume is None:
+            historical_volume = self.volume_profiles.schedule(order.symbol, order.created_at, self.VWAP_SLICES,
+                                                              self.VWAP_SLICE_MINUTES)
+        remaining, issue = self._tracker(order, remaining)
+        volume_left = sum(historical_volume)
         
         for i, volume in enumerate(historical_volume):
-            volume_weight = volume / total_historical_volume
-            slice_quantity = order.quantity * volume_weight
-            
-            if slice_quantity > 0:
-                child_order = OrderRequest(
-                    order_id=f"{order.order_id}_VWAP_{i+1}",
-                    symbol=order.symbol,
-                    side=order.side,
-                    order_type=OrderType.LIMIT,
-                    quantity=slice_quantity,
-                    price=order.price,
-                    stop_price=None,
-                    time_in_force="IOC",
-                    algorithm=ExecutionAlgorithm.VWAP,
-                    priority=order.priority,
-                    parent_order_id=order.order_id,
-                    client_order_id=f"{order.client_order_id}_VWAP_{i+1}",
-                    trader_id=order.trader_id,
-                    created_at=order.created_at + timedelta(minutes=i * 5),
-                    valid_until=order.valid_until,
-                    min_quantity=slice_quantity * 0.1,
-                    display_quantity=slice_quantity,
-                    metadata={**order.metadata, "volume_slice": i+1, "volume_weight": volume_weight}
-                )
-                child_orders.append(child_order)
-        
-        return child_orders
+            left = remaining()
+            if left <= 1e-12 or volume_left <= 0:
+                return
+            volume_weight = volume / volume_left
+            volume_left -= volume
+            slice_quantity = left * volume_weight
+            if slice_quantity <= 0:
+                continue
+            order_type, price = self._slice_price(order, quote)
+            issue(slice_quantity)
+            yield self._child(order, "VWAP", i + 1, slice_quantity, order_type, price, "IOC",
+                              order.created_at + timedelta(minutes=i * self.VWAP_SLICE_MINUTES),
+                              slice_quantity * 0.1,
+                              {"volume_slice": i + 1, "volume_weight": volume_weight})
     
-    def execute_iceberg(self, order: OrderRequest, display_size: float) -> List[OrderRequest]:
-        """Iceberg execution algorithm - hide large orders."""
-        child_orders = []
-        remaining_quantity = order.quantity
+    def iceberg_slices(self, order: OrderRequest, display_size: float,
+                       remaining: Optional[Callable[[], float]] = None) -> Iterator[OrderRequest]:
+        """Iceberg: show ``display_size`` at a time; the next slice follows the previous fill."""
+        remaining, issue = self._tracker(order, remaining)
         slice_num = 1
         
-        while remaining_quantity > 0:
-            slice_quantity = min(display_size, remaining_quantity)
-            
-            child_order = OrderRequest(
-                order_id=f"{order.order_id}_ICE_{slice_num}",
-                symbol=order.symbol,
-                side=order.side,
-                order_type=order.order_type,
-                quantity=slice_quantity,
-                price=order.price,
-                stop_price=order.stop_price,
-                time_in_force="GTC",
-                algorithm=ExecutionAlgorithm.ICEBERG,
-                priority=order.priority,
-                parent_order_id=order.order_id,
-                client_order_id=f"{order.client_order_id}_ICE_{slice_num}",
-                trader_id=order.trader_id,
-                created_at=order.created_at,
-                valid_until=order.valid_until,
-                min_quantity=order.min_quantity,
-                display_quantity=slice_quantity,
-                metadata={**order.metadata, "iceberg_slice": slice_num, "hidden_quantity": remaining_quantity - slice_quantity}
-            )
-            child_orders.append(child_order)
-            
-            remaining_quantity -= slice_quantity
+        while True:
+            left = remaining()
+            if left <= 1e-12:
+                return
+            slice_quantity = min(display_size, left)
+            issue(slice_quantity)
+            yield self._child(order, "ICE", slice_num, slice_quantity, order.order_type, order.price, "GTC",
+                              datetime.now(), order.min_quantity,
+                              {"iceberg_slice": slice_num, "hidden_quantity": left - slice_quantity})
             slice_num += 1
-        
-        return child_orders
+    
+    def execute_twap(self, order: OrderRequest, duration_minutes: int = 60) -> List[OrderRequest]:
+        """Time-Weighted Average Price execution algorithm (all slices at once)."""
+        return list(self.twap_slices(order, duration_minutes))
+    
+    def execute_vwap(self, order: OrderRequest, historical_volume: Optional[List[float]] = None) -> List[OrderRequest]:
+        """Volume-Weighted Average Price execution algorithm (all slices at once)."""
+        return list(self.vwap_slices(order, historical_volume))
+    
+    def execute_iceberg(self, order: OrderRequest, display_size: float) -> List[OrderRequest]:
+        """Iceberg execution algorithm - hide large orders (all slices at once)."""
+        return list(self.iceberg_slices(order, display_size))
 
 class RiskManager:
     def __init__(self):
@@ -368,10 +1044,38 @@ class RiskManager:
             'max_order_size': 1000000,  # $1M max order
             'max_daily_volume': 10000000,  # $10M daily volume
             'max_position_concentration': 0.25,  # 25% max concentration
+            'concentration_min_portfolio': 1000000,  # concentration is checked once exposure reaches $1M
             'max_leverage': 3.0
         }
         self.daily_volumes = defaultdict(float)
         self.positions = defaultdict(float)
+        # Running exposure, updated per fill so a check never walks every position
+        self.marks: Dict[str, float] = {}
+        self.exposure = defaultdict(float)  # symbol -> |position| * last fill price
+        self.gross_exposure = 0.0
+        self.account_positions = defaultdict(float)  # (account, symbol) -> position
+        self.account_exposure = defaultdict(float)  # account -> gross exposure
+        # Booked by other OMS shards (see sharded_oms.py); zero for a standalone OMS
+        self.peer_daily_volume = 0.0
+        self.peer_gross_exposure = 0.0
+    
+    def on_fill(self, symbol: str, side: OrderSide, quantity: float, price: float,
+                account: Optional[str] = None, when: Optional[datetime] = None):
+        """Apply one fill to positions, exposure and daily volume in O(1)."""
+        signed = quantity if side == OrderSide.BUY else -quantity
+        self.marks[symbol] = price
+        
+        self.positions[symbol] += signed
+        new_exposure = abs(self.positions[symbol]) * price
+        self.gross_exposure += new_exposure - self.exposure[symbol]
+        self.exposure[symbol] = new_exposure
+        
+        key = (account or "unassigned", symbol)
+        old_account_leg = abs(self.account_positions[key]) * price
+        self.account_positions[key] += signed
+        self.account_exposure[key[0]] += abs(self.account_positions[key]) * price - old_account_leg
+        
+        self.daily_volumes[(when or datetime.now()).date()] += quantity * price
     
     def pre_trade_risk_check(self, order: OrderRequest) -> List[RiskCheck]:
         """Perform comprehensive pre-trade risk checks."""
@@ -391,7 +1095,7 @@ class RiskManager:
         
         # Daily volume check
         today = datetime.now().date()
-        current_daily_volume = self.daily_volumes[today]
+        current_daily_volume = self.daily_volumes[today] + self.peer_daily_volume
         if current_daily_volume + order_value > self.risk_limits['max_daily_volume']:
             checks.append(RiskCheck(
                 check_id=str(uuid.uuid4()),
@@ -405,10 +1109,11 @@ class RiskManager:
         # Position concentration check
         current_position = self.positions[order.symbol]
         new_position = current_position + (order.quantity if order.side == OrderSide.BUY else -order.quantity)
-        portfolio_value = sum(abs(pos * 50000) for pos in self.positions.values())  # Estimate
+        portfolio_value = self.gross_exposure + self.peer_gross_exposure
         
-        if portfolio_value > 0:
-            concentration = abs(new_position * (order.price or 50000)) / portfolio_value
+        if portfolio_value >= self.risk_limits['concentration_min_portfolio']:
+            mark = order.price or self.marks.get(order.symbol, 50000)
+            concentration = abs(new_position * mark) / portfolio_value
             if concentration > self.risk_limits['max_position_concentration']:
                 checks.append(RiskCheck(
                     check_id=str(uuid.uuid4()),
@@ -432,39 +1137,158 @@ class RiskManager:
         
         return checks
 
-class OrderManagementSystem:
+class OrderScheduler:
+    """Release-time and priority ordered queue for the execution engine.
+
+    Orders wait in a heap keyed by (release time, sequence) until their
+    release time (``created_at`` for TWAP/VWAP slices, or an explicit retry
+    time) has passed. They then move to a ready heap keyed by
+    (-priority, sequence), so due orders come out URGENT first and FIFO
+    within one priority. ``pop`` sleeps on a condition variable exactly until
+    the next release or a new push, never on a fixed polling interval.
+    """
+    
     def __init__(self):
-        self.db = OrderDatabase()
+        self._delayed: List[Tuple[float, int, OrderRequest]] = []
+        self._ready: List[Tuple[int, int, OrderRequest]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+    
+    def push(self, order: OrderRequest, release_at: Optional[float] = None):
+        """Queue ``order``; ``release_at`` (epoch seconds) defaults to ``order.created_at``"""
+        release = order.created_at.timestamp() if release_at is None else release_at
+        with self._cond:
+            seq = next(self._seq)
+            if release <= time_module.time():
+                heapq.heappush(self._ready, (-order.priority.value, seq, order))
+                self._cond.notify()
+            else:
+                heapq.heappush(self._delayed, (release, seq, order))
+                if self._delayed[0][1] == seq:
+                    # New earliest release: the sleeping engine must recompute its timeout
+                    self._cond.notify()
+    
+    def extend(self, orders: List[OrderRequest]):
+        for order in orders:
+            self.push(order)
+    
+    def _release_due(self, now: float):
+        while self._delayed and self._delayed[0][0] <= now:
+            _, seq, order = heapq.heappop(self._delayed)
+            heapq.heappush(self._ready, (-order.priority.value, seq, order))
+    
+    def pop(self, timeout: Optional[float] = None) -> Optional[OrderRequest]:
+        """Next due order, waiting up to ``timeout`` seconds; None on timeout or close"""
+        deadline = None if timeout is None else time_module.monotonic() + timeout
+        with self._cond:
+            while not self._closed:
+                self._release_due(time_module.time())
+                if self._ready:
+                    return heapq.heappop(self._ready)[2]
+                wait = self._delayed[0][0] - time_module.time() if self._delayed else None
+                if deadline is not None:
+                    remaining = deadline - time_module.monotonic()
+                    if remaining <= 0:
+                        return None
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._cond.wait(wait)
+            return None
+    
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+    
+    def __len__(self) -> int:
+        return len(self._ready) + len(self._delayed)
+    
+    def __iter__(self):
+        """Snapshot of queued orders, ready ones first"""
+        with self._cond:
+            return iter([entry[2] for entry in sorted(self._ready)] + [entry[2] for entry in sorted(self._delayed)])
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            next_release = self._delayed[0][0] - time_module.time() if self._delayed else None
+            return {"ready": len(self._ready), "delayed": len(self._delayed), "next_release_in": next_release}
+
+class OrderManagementSystem:
+    ACTIVE_STATUSES = (OrderStatus.PENDING, OrderStatus.SUBMITTED, OrderStatus.PARTIALLY_FILLED)
+    
+    def __init__(self, db_path: str = "orders.db", recover: bool = True, history_size: int = 10000,
+                 start_threads: bool = True, volume_profiles: Optional[VolumeProfileService] = None):
+        self.db = OrderDatabase(db_path)
         self.router = OrderRouter()
-        self.executor = AlgorithmicExecutor()
+        # VWAP curves; defaults to the process-wide service, which refreshes from the exchange
+        self.executor = AlgorithmicExecutor(volume_profiles)
         self.risk_manager = RiskManager()
         
         self.orders: Dict[str, OrderRequest] = {}
         self.order_states: Dict[str, OrderState] = {}
         self.market_data: Dict[str, MarketData] = {}
-        self.executions: List[OrderExecution] = []
-        self.risk_checks: List[RiskCheck] = []
-        
-        self.order_queue = deque()
+        # Indexed view of orders and child slices for blotter queries
+        self.blotter = OrderBlotter()
+        # Bounded in memory; older records are paged back from the database. Without recovery the
+        # history starts empty, so rows left by earlier sessions are skipped when paging back
+        executions_base = 0 if recover else self.db.row_count("executions")
+        risk_checks_base = 0 if recover else self.db.row_count("risk_checks")
+        self.executions = RollingHistory(
+            history_size,
+            lambda offset, limit: self.db.read_history("executions", executions_base + offset, limit))
+        self.risk_checks = RollingHistory(
+            history_size,
+            lambda offset, limit: self.db.read_history("risk_checks", risk_checks_base + offset, limit))
+        # Running session totals, so dashboards never sum over the history
+        self.execution_totals = {"count": 0, "quantity": 0.0, "notional": 0.0, "commission": 0.0}
+        self.risk_check_counts = defaultdict(int)  # status -> count
+        # Local L2 books; market_data top-of-book is derived from them
+        self.order_books = OrderBookManager()
+        # The paper matching engine is quoted from these books: it is the INTERNAL venue
+        self.router.attach_books('INTERNAL', self.order_books)
+        
+        self.order_queue = OrderScheduler()
         self.execution_engine_active = True
-        
-        self.start_market_data_simulation()
-        self.start_execution_engine()
+        self.retry_interval = 0.5  # seconds before retrying an order whose market has no data yet
+        # Paper-trading venue: one matching engine per symbol, quoted by the simulated feed
+        self.matching_engines: Dict[str, MatchingEngine] = {}
+        self._matching_lock = threading.RLock()
+        self._working: Dict[str, OrderRequest] = {}  # orders sent to an engine and not yet done
+        self._liquidity_orders: Dict[str, List[str]] = defaultdict(list)
+        self._liquidity_ids = itertools.count(1)
+        self._simulated_update_ids: Dict[str, int] = defaultdict(int)
+        # Algorithmic parents: slice generator and the slices currently working
+        self._child_streams: Dict[str, Iterator[OrderRequest]] = {}
+        self._active_children: Dict[str, set] = defaultdict(set)
+        self._child_parent: Dict[str, str] = {}
+        # Journal sequence number of each order's latest write; durable once db.durable_seq reaches it
+        self._journal_seq: Dict[str, int] = {}
+        
+        if recover:
+            self.recover_from_database()
+        
+        # Without threads the caller feeds books and drives order_queue itself (tests, benchmarks)
+        if start_threads:
+            self.start_market_data_simulation()
+            self.start_execution_engine()
     
     def submit_order(self, order_request: OrderRequest) -> Tuple[bool, str]:
         """Submit new order with full validation and risk checks."""
         try:
             # Pre-trade risk checks
             risk_checks = self.risk_manager.pre_trade_risk_check(order_request)
-            self.risk_checks.extend(risk_checks)
+            for check in risk_checks:
+                self._record_risk_check(check)
+                self.db.record_risk_check(check)
             
             # Check if any risk check failed
             failed_checks = [check for check in risk_checks if check.status == "failed"]
             if failed_checks:
                 return False, f"Risk check failed: {failed_checks[0].message}"
             
-            # Add to orders
+            # Add to orders (journaled; the disk write happens on the DB writer thread)
             self.orders[order_request.order_id] = order_request
+            self._journal_seq[order_request.order_id] = self.db.record_order(order_request)
             
             # Initialize order state
             self.order_states[order_request.order_id] = OrderState(
@@ -477,18 +1301,18 @@ class OrderManagementSystem:
                 status_message="Order received and validated",
                 executions=[]
             )
+            self.blotter.add(order_request, self.order_states[order_request.order_id])
             
             # Handle algorithmic orders
+            # Update order status
+            self.update_order_status(order_request.order_id, OrderStatus.SUBMITTED, "Order submitted for execution")
+            
             if order_request.algorithm in [ExecutionAlgorithm.TWAP, ExecutionAlgorithm.VWAP, ExecutionAlgorithm.ICEBERG]:
-                child_orders = self.create_child_orders(order_request)
-                for child_order in child_orders:
-                    self.order_queue.append(child_order)
+                # Slices are generated one at a time, each released at its own created_at
+                self._start_algorithm(order_request)
             else:
                 # Add to execution queue
-                self.order_queue.append(order_request)
-            
-            # Update order status
-            self.update_order_status(order_request.order_id, OrderStatus.SUBMITTED, "Order submitted for execution")
+                self.order_queue.push(order_request)
             
             return True, f"Order {order_request.order_id} submitted successfully"
             
@@ -496,19 +1320,85 @@ class OrderManagementSystem:
             logger.error(f"Error submitting order: {e}")
             return False, f"Error submitting order: {str(e)}"
     
-    def create_child_orders(self, parent_order: OrderRequest) -> List[OrderRequest]:
-        """Create child orders for algorithmic execution."""
+    def create_child_orders(self, parent_order: OrderRequest) -> Iterator[OrderRequest]:
+        """Child-order generator for algorithmic execution; each slice is built when it is pulled."""
+        parent_id = parent_order.order_id
+        
+        def remaining() -> float:
+            # Parent quantity neither filled nor held by a working slice
+            state = self.order_states.get(parent_id)
+            if state is None:
+                return 0.0
+            working = sum(self.order_states[child_id].remaining_quantity
+                          for child_id in self._active_children.get(parent_id, ()))
+            return state.remaining_quantity - working
+        
+        def quote() -> Optional[MarketData]:
+            return self.market_data.get(parent_order.symbol)
+        
         if parent_order.algorithm == ExecutionAlgorithm.TWAP:
-            return self.executor.execute_twap(parent_order, duration_minutes=60)
+            return self.executor.twap_slices(parent_order, duration_minutes=60, remaining=remaining, quote=quote)
         elif parent_order.algorithm == ExecutionAlgorithm.VWAP:
-            # Simulate historical volume data
-            historical_volume = [np.random.uniform(0.5, 2.0) for _ in range(12)]  # 12 5-minute intervals
-            return self.executor.execute_vwap(parent_order, historical_volume)
+            # Slice weights follow the symbol's intraday volume profile
+            return self.executor.vwap_slices(parent_order, remaining=remaining, quote=quote)
         elif parent_order.algorithm == ExecutionAlgorithm.ICEBERG:
             display_size = parent_order.display_quantity or (parent_order.quantity * 0.1)
-            return self.executor.execute_iceberg(parent_order, display_size)
+            return self.executor.iceberg_slices(parent_order, display_size, remaining=remaining)
         
-        return []
+        return iter(())
+    
+    def _start_algorithm(self, parent_order: OrderRequest):
+        """Attach the parent's slice generator and schedule its first slice."""
+        with self._matching_lock:
+            self._child_streams[parent_order.order_id] = self.create_child_orders(parent_order)
+            self._release_next_child(parent_order.order_id)
+    
+    def _release_next_child(self, parent_id: str):
+        """Pull the next slice from the parent's generator and queue it for its release time."""
+        stream = self._child_streams.get(parent_id)
+        if stream is None:
+            return
+        parent_state = self.order_states.get(parent_id)
+        parent_active = parent_state is not None and parent_state.status in self.ACTIVE_STATUSES
+        child_order = next(stream, None) if parent_active else None
+        if child_order is None:
+            del self._child_streams[parent_id]
+            if parent_active and parent_state.remaining_quantity > 1e-12 and not self._active_children.get(parent_id):
+                self.update_order_status(parent_id, OrderStatus.EXPIRED,
+                                         f"Schedule finished with {parent_state.remaining_quantity:.8g} unfilled")
+            return
+        self._register_child(child_order)
+        self._active_children[parent_id].add(child_order.order_id)
+        self._child_parent[child_order.order_id] = parent_id
+        self.order_queue.push(child_order)
+    
+    def _on_child_done(self, child_id: str):
+        """A slice reached a final state: release the parent's next one."""
+        with self._matching_lock:
+            parent_id = self._child_parent.pop(child_id, None)
+            if parent_id is None:
+                return
+            active = self._active_children.get(parent_id)
+            if active is not None:
+                active.discard(child_id)
+                if active:
+                    return
+                del self._active_children[parent_id]
+            self._release_next_child(parent_id)
+    
+    def _register_child(self, child_order: OrderRequest):
+        """Track a child slice's own state; its fills roll up into the parent."""
+        self.order_states[child_order.order_id] = OrderState(
+            order_id=child_order.order_id,
+            status=OrderStatus.PENDING,
+            filled_quantity=0.0,
+            remaining_quantity=child_order.quantity,
+            avg_fill_price=0.0,
+            last_update=datetime.now(),
+            status_message="Child order scheduled",
+            executions=[]
+        )
+        self.blotter.add(child_order, self.order_states[child_order.order_id])
     
     def cancel_order(self, order_id: str) -> Tuple[bool, str]:
         """Cancel an existing order."""
@@ -525,6 +1415,25 @@ class OrderManagementSystem:
         # Update order status
         self.update_order_status(order_id, OrderStatus.CANCELLED, "Order cancelled by user")
         
+        # Pull the order and any working slices out of the book
+        with self._matching_lock:
+            engine = self.matching_engines.get(self.orders[order_id].symbol)
+            if engine is not None:
+                for working_id, working in list(self._working.items()):
+                    if working_id == order_id or working.parent_order_id == order_id:
+                        engine.cancel(working_id)
+                        self._working.pop(working_id, None)
+                        if working_id != order_id:
+                            self.update_order_status(working_id, OrderStatus.CANCELLED, "Parent order cancelled")
+                            self._child_parent.pop(working_id, None)
+                            active = self._active_children.get(order_id)
+                            if active is not None:
+                                active.discard(working_id)
+                                if not active:
+                                    del self._active_children[order_id]
+            # No further slices; queued ones are dropped when they come due
+            self._child_streams.pop(order_id, None)
+        
         return True, f"Order {order_id} cancelled successfully"
     
     def update_order_status(self, order_id: str, status: OrderStatus, message: str):
@@ -533,146 +1442,367 @@ class OrderManagementSystem:
             self.order_states[order_id].status = status
             self.order_states[order_id].status_message = message
             self.order_states[order_id].last_update = datetime.now()
+            self._journal_seq[order_id] = self.db.record_state(self.order_states[order_id])
+            self.blotter.set_status(order_id, status)
+    
+    def query_orders(self, **filters) -> BlotterPage:
+        """Paged blotter query; see OrderBlotter.query for the filters."""
+        return self.blotter.query(**filters)
+    
+    ENGINE_ORDER_TYPES = {
+        OrderType.MARKET: "market",
+        OrderType.LIMIT: "limit",
+        OrderType.STOP: "stop",
+        OrderType.STOP_LIMIT: "stop_limit",
+        OrderType.ICEBERG: "iceberg",
+    }
+    
+    def matching_engine(self, symbol: str) -> MatchingEngine:
+        with self._matching_lock:
+            engine = self.matching_engines.get(symbol)
+            if engine is None:
+                engine = self.matching_engines[symbol] = MatchingEngine(symbol)
+            return engine
     
     def simulate_execution(self, order: OrderRequest) -> Optional[OrderExecution]:
-        """Simulate order execution with realistic fills."""
+        """Send the order to the symbol's matching engine and book the resulting fills.
+
+        Unfilled GTC quantity rests in the engine's book and fills later, when
+        the simulated liquidity moves through its price.
+        """
         if order.symbol not in self.market_data:
             return None
         
-        market = self.market_data[order.symbol]
-        
-        # Determine execution price based on order type
-        if order.order_type == OrderType.MARKET:
-            execution_price = market.ask_price if order.side == OrderSide.BUY else market.bid_price
-        elif order.order_type == OrderType.LIMIT:
-            if order.side == OrderSide.BUY and order.price >= market.ask_price:
-                execution_price = market.ask_price
-            elif order.side == OrderSide.SELL and order.price <= market.bid_price:
-                execution_price = market.bid_price
-            else:
-                return None  # No execution
-        else:
-            execution_price = order.price or market.last_price
-        
-        # Calculate execution quantity (partial fills possible)
-        max_executable = min(order.quantity, market.bid_size if order.side == OrderSide.SELL else market.ask_size)
-        execution_quantity = np.random.uniform(max_executable * 0.3, max_executable)
-        execution_quantity = min(execution_quantity, self.order_states[order.order_id].remaining_quantity)
-        
-        if execution_quantity < (order.min_quantity or 0):
-            return None
-        
-        # Create execution
+        order_type = self.ENGINE_ORDER_TYPES.get(order.order_type)
+        if order_type is None:
+            # TWAP/VWAP/bracket parents that reach the engine trade as plain orders
+            order_type = "limit" if order.price is not None else "market"
+        if order_type == "iceberg" and not order.display_quantity:
+            order_type = "limit"
+        time_in_force = order.time_in_force if order.time_in_force in ("GTC", "IOC", "FOK") else "GTC"
+        
+        with self._matching_lock:
+            engine = self.matching_engine(order.symbol)
+            if engine.has_order(order.order_id):
+                return None
+            self._working[order.order_id] = order
+            order_state = self.order_states[order.order_id]
+            if order_state.status == OrderStatus.PENDING:
+                self.update_order_status(order.order_id, OrderStatus.SUBMITTED, "Sent to matching engine")
+            requested = order_state.remaining_quantity
+            started = time_module.perf_counter()
+            report = engine.submit(
+                order.order_id, order.side.value, requested,
+                order_type=order_type, price=order.price, stop_price=order.stop_price,
+                time_in_force=time_in_force, display_quantity=order.display_quantity,
+            )
+            # Round trip and immediate fill ratio of the venue that executes paper orders
+            self.router.record_latency('INTERNAL', (time_module.perf_counter() - started) * 1000)
+            if order_type == "market" or time_in_force in ("IOC", "FOK"):
+                self.router.record_fill('INTERNAL', requested, report.filled)
+            executions = self._apply_match(report)
+        
+        own = [execution for execution in executions if execution.order_id == order.order_id]
+        return own[-1] if own else None
+    
+    def _apply_match(self, report: MatchReport) -> List[OrderExecution]:
+        """Book both sides of every engine trade that involves one of our orders."""
+        executions = []
+        for trade in report.trades:
+            for order_id, liquidity_flag in ((trade.taker_id, "taker"), (trade.maker_id, "maker")):
+                if order_id in self._working:
+                    executions.append(self._apply_fill(order_id, trade.quantity, trade.price, liquidity_flag))
+        for order_id in report.expired:
+            order_state = self.order_states.get(order_id)
+            if order_state is not None and order_state.status in (OrderStatus.SUBMITTED, OrderStatus.PENDING,
+                                                                  OrderStatus.PARTIALLY_FILLED):
+                self.update_order_status(order_id, OrderStatus.CANCELLED,
+                                         f"Unfilled {order_state.remaining_quantity:.8g} cancelled by the engine")
+            self._working.pop(order_id, None)
+        if self._child_parent and (report.trades or report.expired):
+            touched = {trade.taker_id for trade in report.trades} | {trade.maker_id for trade in report.trades}
+            for order_id in touched.union(report.expired):
+                if order_id in self._child_parent and \
+                        self.order_states[order_id].status not in self.ACTIVE_STATUSES:
+                    self._on_child_done(order_id)
+        return executions
+    
+    def _apply_fill(self, order_id: str, quantity: float, price: float, liquidity_flag: str) -> OrderExecution:
+        order = self._working[order_id]
+        commission_rate = 0.001 if liquidity_flag == "taker" else 0.0002
         execution = OrderExecution(
             execution_id=str(uuid.uuid4()),
-            order_id=order.order_id,
+            order_id=order_id,
             symbol=order.symbol,
             side=order.side,
-            quantity=execution_quantity,
-            price=execution_price,
-            commission=execution_quantity * execution_price * 0.001,  # 0.1% commission
+            quantity=quantity,
+            price=price,
+            commission=quantity * price * commission_rate,
             timestamp=datetime.now(),
             exchange=self.router.select_venue(order, self.market_data),
-            liquidity_flag="taker" if order.order_type == OrderType.MARKET else "maker",
+            liquidity_flag=liquidity_flag,
             execution_venue="SMART"
         )
         
         # Update order state
-        order_state = self.order_states[order.order_id]
+        self.db.record_execution(execution)
+        order_state = self.order_states[order_id]
         order_state.executions.append(execution)
-        order_state.filled_quantity += execution_quantity
-        order_state.remaining_quantity -= execution_quantity
+        order_state.filled_quantity += quantity
+        order_state.remaining_quantity -= quantity
         
-        # Update average fill price
-        total_value = sum(ex.quantity * ex.price for ex in order_state.executions)
-        order_state.avg_fill_price = total_value / order_state.filled_quantity
+        # Update average fill price from the running notional
+        order_state.filled_notional += quantity * price
+        order_state.avg_fill_price = order_state.filled_notional / order_state.filled_quantity
         
         # Update status
-        if order_state.remaining_quantity <= 0:
-            self.update_order_status(order.order_id, OrderStatus.FILLED, "Order fully executed")
+        if order_state.remaining_quantity <= 1e-12:
+            self.update_order_status(order_id, OrderStatus.FILLED, "Order fully executed")
+            self._working.pop(order_id, None)
         else:
-            self.update_order_status(order.order_id, OrderStatus.PARTIALLY_FILLED, f"Partial fill: {execution_quantity}")
+            self.update_order_status(order_id, OrderStatus.PARTIALLY_FILLED, f"Partial fill: {quantity}")
+        
+        # Child slice fills count towards the parent order
+        parent_state = self.order_states.get(order.parent_order_id) if order.parent_order_id else None
+        if parent_state is not None:
+            parent_state.executions.append(execution)
+            parent_state.filled_quantity += quantity
+            parent_state.remaining_quantity -= quantity
+            parent_state.filled_notional += quantity * price
+            parent_state.avg_fill_price = parent_state.filled_notional / parent_state.filled_quantity
+            if parent_state.remaining_quantity <= 1e-12:
+                self.update_order_status(order.parent_order_id, OrderStatus.FILLED, "All slices executed")
+            else:
+                self.update_order_status(order.parent_order_id, OrderStatus.PARTIALLY_FILLED,
+                                         f"Slice fill: {quantity}")
         
-        self.executions.append(execution)
+        self._record_execution(execution, order.trader_id)
         return execution
     
+    def _record_execution(self, execution: OrderExecution, account: Optional[str] = None):
+        """Add a fill to the history, session totals and risk positions."""
+        self.executions.append(execution)
+        totals = self.execution_totals
+        totals["count"] += 1
+        totals["quantity"] += execution.quantity
+        totals["notional"] += execution.quantity * execution.price
+        totals["commission"] += execution.commission
+        self.risk_manager.on_fill(execution.symbol, execution.side, execution.quantity, execution.price,
+                                  account, execution.timestamp)
+    
+    def _record_risk_check(self, check: RiskCheck):
+        self.risk_checks.append(check)
+        self.risk_check_counts[check.status] += 1
+    
+    def recover_from_database(self):
+        """Rebuild orders, states, executions and risk checks from the database after a restart.
+
+        Orders that were still working are queued again; algorithmic parents
+        get fresh child orders for their remaining quantity.
+        """
+        saved = self.db.load()
+        self.orders.update(saved["orders"])
+        self.order_states.update(saved["order_states"])
+        for order_id, order in saved["orders"].items():
+            if order_id in saved["order_states"]:
+                self.blotter.add(order, saved["order_states"][order_id])
+        for execution in saved["executions"]:
+            order = saved["orders"].get(execution.order_id)
+            self._record_execution(execution, order.trader_id if order else None)
+        for check in saved["risk_checks"]:
+            self._record_risk_check(check)
+        
+        active = (OrderStatus.PENDING, OrderStatus.SUBMITTED, OrderStatus.PARTIALLY_FILLED)
+        requeued = 0
+        for order_id, order in saved["orders"].items():
+            state = saved["order_states"].get(order_id)
+            if state is None or state.status not in active or state.remaining_quantity <= 0:
+                continue
+            if order.algorithm in [ExecutionAlgorithm.TWAP, ExecutionAlgorithm.VWAP, ExecutionAlgorithm.ICEBERG]:
+                # Slices are sized from the recovered remaining quantity
+                self._start_algorithm(replace(order, created_at=datetime.now()))
+            else:
+                self.order_queue.push(order)
+            requeued += 1
+        if saved["orders"]:
+            logger.info(f"Recovered {len(saved['orders'])} orders from {self.db.db_path}, {requeued} re-queued")
+    
+    def is_persisted(self, order_id: str) -> bool:
+        """True once the order and its latest state are committed to disk."""
+        return self.db.durable_seq >= self._journal_seq.get(order_id, 0)
+    
+    def wait_persisted(self, order_id: str, timeout: Optional[float] = None) -> bool:
+        """Durable acknowledgement: block until the order survives a restart."""
+        return self.db.wait_durable(self._journal_seq.get(order_id, 0), timeout)
+    
+    def shutdown(self, timeout: float = 10):
+        """Stop executing and make every journaled event durable."""
+        self.execution_engine_active = False
+        self.order_queue.close()
+        self.db.close(timeout)
+    
     def start_market_data_simulation(self):
-        """Start market data simulation."""
+        """Start market data simulation.
+
+        The simulated feed produces Bybit-style orderbook snapshot/delta
+        messages, so the local books are maintained exactly as they would be
+        from the exchange WebSocket.
+        """
         def simulate_market_data():
-            symbols = ["BTCUSDT", "ETHUSDT", "ADAUSDT", "DOTUSDT", "LINKUSDT"]
-            base_prices = {"BTCUSDT": 45000, "ETHUSDT": 3000, "ADAUSDT": 1.5, "DOTUSDT": 25, "LINKUSDT": 15}
-            
             while True:
-                for symbol in symbols:
-                    base_price = base_prices[symbol]
-                    price_change = np.random.uniform(-0.02, 0.02)  # ±2% change
-                    last_price = base_price * (1 + price_change)
-                    spread = last_price * 0.001  # 0.1% spread
-                    
-                    self.market_data[symbol] = MarketData(
-                        symbol=symbol,
-                        bid_price=last_price - spread/2,
-                        ask_price=last_price + spread/2,
-                        bid_size=np.random.uniform(10, 100),
-                        ask_size=np.random.uniform(10, 100),
-                        last_price=last_price,
-                        volume=np.random.uniform(1000, 10000),
-                        timestamp=datetime.now()
-                    )
-                
+                self.simulate_market_tick(list(self.SIMULATED_BASE_PRICES))
                 time_module.sleep(1)  # Update every second
         
         market_thread = threading.Thread(target=simulate_market_data, daemon=True)
         market_thread.start()
     
+    SIMULATED_BASE_PRICES = {"BTCUSDT": 45000, "ETHUSDT": 3000, "ADAUSDT": 1.5, "DOTUSDT": 25, "LINKUSDT": 15}
+    
+    def simulate_market_tick(self, symbols: List[str]):
+        """Apply one simulated book update per symbol and requote the paper venue."""
+        for symbol in symbols:
+            base_price = self.SIMULATED_BASE_PRICES.get(symbol, 100)
+            price_change = np.random.uniform(-0.02, 0.02)  # ±2% change
+            last_price = base_price * (1 + price_change)
+            
+            self._simulated_update_ids[symbol] += 1
+            self.order_books.on_message(
+                self._simulated_book_message(symbol, last_price, self._simulated_update_ids[symbol])
+            )
+            self._refresh_market_data(symbol, last_price, volume=np.random.uniform(1000, 10000))
+            self._refresh_liquidity(symbol)
+    
+    def _simulated_book_message(self, symbol: str, last_price: float, update_id: int,
+                                levels: int = 20) -> Dict[str, Any]:
+        """Build an orderbook snapshot (first tick) or delta message around ``last_price``."""
+        tick = last_price * 0.0001
+        half_spread = last_price * 0.0005  # 0.1% spread
+        bids = {round(last_price - half_spread - i * tick, 8): np.random.uniform(5, 50) for i in range(levels)}
+        asks = {round(last_price + half_spread + i * tick, 8): np.random.uniform(5, 50) for i in range(levels)}
+        
+        book = self.order_books.book(symbol)
+        if not book.synced:
+            msg_type = "snapshot"
+        else:
+            msg_type = "delta"
+            # Levels that moved away are removed with size 0
+            for price, _ in book.bid_depth(len(book.bids)):
+                bids.setdefault(price, 0)
+            for price, _ in book.ask_depth(len(book.asks)):
+                asks.setdefault(price, 0)
+        
+        return {
+            "topic": f"orderbook.{levels}.{symbol}",
+            "type": msg_type,
+            "ts": int(time_module.time() * 1000),
+            "data": {
+                "s": symbol,
+                "b": [[str(p), str(q)] for p, q in bids.items()],
+                "a": [[str(p), str(q)] for p, q in asks.items()],
+                "u": update_id,
+            },
+        }
+    
+    def _refresh_market_data(self, symbol: str, last_price: float, volume: float):
+        """Update the MarketData top-of-book from the local order book."""
+        book = self.order_books.get(symbol)
+        if book is None:
+            return
+        with book.lock:
+            best_bid, best_ask = book.best_bid(), book.best_ask()
+        if best_bid is None or best_ask is None:
+            return
+        self.market_data[symbol] = MarketData(
+            symbol=symbol,
+            bid_price=best_bid[0],
+            ask_price=best_ask[0],
+            bid_size=best_bid[1],
+            ask_size=best_ask[1],
+            last_price=last_price,
+            volume=volume,
+            timestamp=datetime.now()
+        )
+    
+    def _refresh_liquidity(self, symbol: str, levels: int = 20):
+        """Replace the simulated market maker's quotes in the matching engine with the current book.
+
+        New quotes that cross our resting orders trade against them, which is
+        how resting GTC orders get filled as the market moves.
+        """
+        book = self.order_books.get(symbol)
+        if book is None:
+            return
+        with book.lock:
+            bids = book.bid_depth(levels).to_list()
+            asks = book.ask_depth(levels).to_list()
+        with self._matching_lock:
+            engine = self.matching_engine(symbol)
+            for order_id in self._liquidity_orders.pop(symbol, []):
+                engine.cancel(order_id)
+            quotes = self._liquidity_orders[symbol]
+            for side, side_levels in (("buy", bids), ("sell", asks)):
+                for price, size in side_levels:
+                    order_id = f"LP-{symbol}-{next(self._liquidity_ids)}"
+                    report = engine.submit(order_id, side, size, price=price)
+                    if report.trades:
+                        self._apply_match(report)
+                    if engine.has_order(order_id):
+                        quotes.append(order_id)
+    
     def start_execution_engine(self):
-        """Start order execution engine."""
+        """Start order execution engine.
+
+        The engine blocks on the scheduler until the next order is due, so a
+        burst of submissions is worked off immediately and TWAP/VWAP slices
+        fire at their scheduled times.
+        """
         def execute_orders():
             while self.execution_engine_active:
+                order = self.order_queue.pop(timeout=1.0)
+                if order is None:
+                    continue
                 try:
-                    if self.order_queue:
-                        order = self.order_queue.popleft()
-                        
-                        # Check if order is still valid
-                        if order.order_id in self.order_states:
-                            order_state = self.order_states[order.order_id]
-                            if order_state.status in [OrderStatus.PENDING, OrderStatus.SUBMITTED, OrderStatus.PARTIALLY_FILLED]:
-                                execution = self.simulate_execution(order)
-                                if execution:
-                                    logger.info(f"Executed {execution.quantity} of {order.symbol} at {execution.price}")
-                    
-                    time_module.sleep(0.5)  # Execute every 0.5 seconds
+                    self._execute_scheduled(order)
                 except Exception as e:
                     logger.error(f"Execution engine error: {e}")
-                    time_module.sleep(1)
         
         execution_thread = threading.Thread(target=execute_orders, daemon=True)
         execution_thread.start()
     
-    def get_order_book(self, symbol: str) -> Dict[str, Any]:
-        """Get current order book for symbol."""
-        if symbol not in self.market_data:
-            return {}
-        
-        market = self.market_data[symbol]
-        
-        # Simulate order book depth
-        bids = []
-        asks = []
+    def _execute_scheduled(self, order: OrderRequest):
+        """Send a due order to its matching engine, where any GTC remainder rests."""
+        active = self.ACTIVE_STATUSES
+        order_state = self.order_states.get(order.order_id)
+        if order_state is None or order_state.status not in active:
+            self._on_child_done(order.order_id)
+            return
+        parent_state = self.order_states.get(order.parent_order_id) if order.parent_order_id else None
+        if parent_state is not None and parent_state.status not in active:
+            self.update_order_status(order.order_id, OrderStatus.CANCELLED, "Parent order no longer active")
+            self._on_child_done(order.order_id)
+            return
+        if order.valid_until and datetime.now() > order.valid_until:
+            self.update_order_status(order.order_id, OrderStatus.EXPIRED, "Order expired before execution")
+            self._on_child_done(order.order_id)
+            return
+        if order.symbol not in self.market_data:
+            # No feed for this market yet: try again shortly
+            self.order_queue.push(order, release_at=time_module.time() + self.retry_interval)
+            return
         
-        for i in range(10):
-            bid_price = market.bid_price - (i * market.bid_price * 0.0001)
-            ask_price = market.ask_price + (i * market.ask_price * 0.0001)
-            
-            bids.append([bid_price, np.random.uniform(5, 50)])
-            asks.append([ask_price, np.random.uniform(5, 50)])
+        execution = self.simulate_execution(order)
+        if execution:
+            logger.info(f"Executed {execution.quantity} of {order.symbol} at {execution.price}")
+    
+    def get_order_book(self, symbol: str, depth: int = 10) -> Dict[str, Any]:
+        """Get current order book for symbol from the local book."""
+        book = self.order_books.get(symbol)
+        if book is None:
+            return {}
         
-        return {
-            'symbol': symbol,
-            'bids': bids,
-            'asks': asks,
-            'timestamp': market.timestamp
-        }
+        snapshot = book.snapshot(depth)
+        snapshot['timestamp'] = self.market_data[symbol].timestamp if symbol in self.market_data else datetime.now()
+        return snapshot
 
 # Initialize OMS
 @st.cache_resource
@@ -754,8 +1884,7 @@ def main():
             """, unsafe_allow_html=True)
         
         with col2:
-            active_orders = len([o for o in oms.order_states.values() 
-                               if o.status in [OrderStatus.PENDING, OrderStatus.SUBMITTED, OrderStatus.PARTIALLY_FILLED]])
+            active_orders = sum(oms.blotter.status_counts[status] for status in oms.ACTIVE_STATUSES)
             st.markdown(f"""
             <div class="order-card">
                 <h3>Active Orders</h3>
@@ -764,7 +1893,7 @@ def main():
             """, unsafe_allow_html=True)
         
         with col3:
-            total_executions = len(oms.executions)
+            total_executions = oms.execution_totals["count"]
             st.markdown(f"""
             <div class="order-card">
                 <h3>Total Executions</h3>
@@ -773,7 +1902,7 @@ def main():
             """, unsafe_allow_html=True)
         
         with col4:
-            total_volume = sum(ex.quantity * ex.price for ex in oms.executions)
+            total_volume = oms.execution_totals["notional"]
             st.markdown(f"""
             <div class="order-card">
                 <h3>Total Volume</h3>
@@ -784,11 +1913,8 @@ def main():
         # Order status chart
         st.subheader("📈 Order Status Distribution")
         
-        if oms.order_states:
-            status_counts = {}
-            for state in oms.order_states.values():
-                status = state.status.value
-                status_counts[status] = status_counts.get(status, 0) + 1
+        if len(oms.blotter):
+            status_counts = {status.value: count for status, count in oms.blotter.status_counts.items() if count}
             
             fig_status = px.pie(
                 values=list(status_counts.values()),
@@ -801,11 +1927,10 @@ def main():
         st.subheader("📋 Recent Orders")
         
         if oms.orders:
-            recent_orders = list(oms.orders.values())[-10:]  # Last 10 orders
+            recent_orders = oms.query_orders(top_level_only=True, limit=10).rows  # Last 10 orders
             orders_data = []
             
-            for order in recent_orders:
-                state = oms.order_states.get(order.order_id)
+            for order, state in recent_orders:
                 orders_data.append({
                     'Order ID': order.order_id[:8] + "...",
                     'Symbol': order.symbol,
@@ -1073,15 +2198,15 @@ def main():
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            risk_checks_passed = len([rc for rc in oms.risk_checks if rc.status == "passed"])
+            risk_checks_passed = oms.risk_check_counts["passed"]
             st.metric("Risk Checks Passed", risk_checks_passed)
         
         with col2:
-            risk_checks_failed = len([rc for rc in oms.risk_checks if rc.status == "failed"])
+            risk_checks_failed = oms.risk_check_counts["failed"]
             st.metric("Risk Checks Failed", risk_checks_failed)
         
         with col3:
-            total_exposure = sum(abs(pos) * 50000 for pos in oms.risk_manager.positions.values())
+            total_exposure = oms.risk_manager.gross_exposure
             st.metric("Total Exposure", f"${total_exposure:,.0f}")
         
         with col4:
@@ -1122,7 +2247,7 @@ def main():
         st.subheader("📋 Recent Risk Checks")
         
         if oms.risk_checks:
-            recent_checks = oms.risk_checks[-20:]  # Last 20 checks
+            recent_checks = oms.risk_checks.recent(20)  # Last 20 checks
             
             for check in recent_checks:
                 status_class = "risk-pass" if check.status == "passed" else "risk-fail"
@@ -1146,12 +2271,13 @@ def main():
             st.subheader("📊 Execution Performance")
             
             # Calculate metrics
-            total_volume = sum(ex.quantity * ex.price for ex in oms.executions)
-            total_commission = sum(ex.commission for ex in oms.executions)
+            totals = oms.execution_totals
+            total_volume = totals["notional"]
+            total_commission = totals["commission"]
             avg_commission_rate = (total_commission / total_volume * 100) if total_volume > 0 else 0
             
             # VWAP calculation
-            vwap = total_volume / sum(ex.quantity for ex in oms.executions) if oms.executions else 0
+            vwap = total_volume / totals["quantity"] if totals["quantity"] else 0
             
             col1, col2, col3, col4 = st.columns(4)
             
@@ -1167,18 +2293,18 @@ def main():
             # Fill rate analysis
             st.subheader("📈 Fill Rate Analysis")
             
+            # Most recent filled orders and slices, straight from the status index
+            filled_rows = oms.query_orders(status=[OrderStatus.FILLED, OrderStatus.PARTIALLY_FILLED], limit=1000).rows
             fill_rates = []
-            for order_id, state in oms.order_states.items():
-                if state.status in [OrderStatus.FILLED, OrderStatus.PARTIALLY_FILLED]:
-                    order = oms.orders[order_id]
-                    fill_rate = (state.filled_quantity / order.quantity) * 100
-                    fill_rates.append({
-                        'Order ID': order_id[:8] + "...",
-                        'Symbol': order.symbol,
-                        'Algorithm': order.algorithm.value.upper(),
-                        'Fill Rate': f"{fill_rate:.1f}%",
-                        'Status': state.status.value.title()
-                    })
+            for order, state in filled_rows:
+                fill_rate = (state.filled_quantity / order.quantity) * 100
+                fill_rates.append({
+                    'Order ID': order.order_id[:8] + "...",
+                    'Symbol': order.symbol,
+                    'Algorithm': order.algorithm.value.upper(),
+                    'Fill Rate': f"{fill_rate:.1f}%",
+                    'Status': state.status.value.title()
+                })
             
             if fill_rates:
                 df_fills = pd.DataFrame(fill_rates)
@@ -1186,15 +2312,13 @@ def main():
                 
                 # Fill rate by algorithm
                 algo_fill_rates = {}
-                for order_id, state in oms.order_states.items():
-                    if state.status in [OrderStatus.FILLED, OrderStatus.PARTIALLY_FILLED]:
-                        order = oms.orders[order_id]
-                        algo = order.algorithm.value
-                        fill_rate = (state.filled_quantity / order.quantity) * 100
+                for order, state in filled_rows:
+                    algo = order.algorithm.value
+                    fill_rate = (state.filled_quantity / order.quantity) * 100
                         
-                        if algo not in algo_fill_rates:
-                            algo_fill_rates[algo] = []
-                        algo_fill_rates[algo].append(fill_rate)
+                    if algo not in algo_fill_rates:
+                        algo_fill_rates[algo] = []
+                    algo_fill_rates[algo].append(fill_rate)
                 
                 # Calculate average fill rates
                 avg_fill_rates = {algo: np.mean(rates) for algo, rates in algo_fill_rates.items()}
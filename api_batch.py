@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+api_batch.py
+------------
+One round trip for a whole dashboard page.
+
+A batch lists resources by name, each with optional parameters:
+
+    POST /api/batch
+    {"resources": ["portfolio", "trading_statistics",
+                   {"name": "orderbook", "params": {"symbol": "BTCUSDT", "depth": 5}, "key": "btc_book"}]}
+
+The server maps each name to a whitelisted GET endpoint. Identical
+requests are collapsed, and the rest are dispatched concurrently inside the
+Flask app, through the same before/after-request hooks and response cache
+as normal HTTP calls. Two pages asking for /api/portfolio within its TTL
+therefore share one data-manager call. The reply holds one status/data pair
+per key.
+
+``fetch_batch`` is the client side used by the Streamlit dashboards.
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import requests
+from flask import url_for
+from werkzeug.routing import BuildError
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 20
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="api-batch")
+
+
+class BatchError(ValueError):
+    """Malformed batch request"""
+
+
+@dataclass
+class BatchItem:
+    key: str
+    name: str
+    params: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, spec: Union[str, Dict[str, Any]]) -> "BatchItem":
+        if isinstance(spec, str):
+            return cls(spec, spec)
+        if not isinstance(spec, dict) or "name" not in spec:
+            raise BatchError(f"Invalid batch entry: {spec!r}")
+        params = spec.get("params") or {}
+        if not isinstance(params, dict):
+            raise BatchError(f"params of {spec['name']} must be an object")
+        return cls(spec.get("key") or spec["name"], spec["name"], params)
+
+    def signature(self) -> str:
+        return f"{self.name}:{json.dumps(self.params, sort_keys=True, default=str)}"
+
+
+def parse_batch(payload: Any) -> List[BatchItem]:
+    """Accepts ``{"resources": [...]}`` or a bare list"""
+    specs = payload.get("resources") if isinstance(payload, dict) else payload
+    if not isinstance(specs, list) or not specs:
+        raise BatchError("Expected a non-empty list of resources")
+    if len(specs) > MAX_BATCH_SIZE:
+        raise BatchError(f"At most {MAX_BATCH_SIZE} resources per batch")
+    items = [BatchItem.parse(spec) for spec in specs]
+    keys = [item.key for item in items]
+    if len(set(keys)) != len(keys):
+        raise BatchError("Duplicate keys in batch; give repeated resources distinct keys")
+    return items
+
+
+def _dispatch(app, endpoint: str, params: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+    with app.test_request_context():
+        path = url_for(endpoint, **params)
+    with app.test_request_context(path, headers=headers):
+        response = app.full_dispatch_request()
+    data = response.get_json(silent=True)
+    return {"status": response.status_code, "data": data}
+
+
+def run_batch(app, items: Iterable[BatchItem], resources: Dict[str, str], timeout: float = 10.0,
+              headers: Optional[Dict[str, str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Run ``items`` concurrently against ``app``; returns ``{key: {"status", "data"}}``.
+
+    ``resources`` maps batch names to endpoint names. Unknown names get 404,
+    bad parameters 400, and anything not done within ``timeout`` 504.
+    """
+    # Forward only what affects the response body, never the client's caching headers
+    headers = {k: v for k, v in (headers or {}).items() if k.lower() in ("authorization", "accept-language")}
+    results: Dict[str, Dict[str, Any]] = {}
+    futures = {}
+    keys_by_signature: Dict[str, List[str]] = {}
+    for item in items:
+        endpoint = resources.get(item.name)
+        if endpoint is None:
+            results[item.key] = {"status": 404, "error": f"Unknown resource: {item.name}"}
+            continue
+        signature = item.signature()
+        if signature not in keys_by_signature:
+            keys_by_signature[signature] = []
+            futures[signature] = _executor.submit(_dispatch, app, endpoint, item.params, headers)
+        keys_by_signature[signature].append(item.key)
+
+    done, _ = wait(futures.values(), timeout=timeout)
+    for signature, future in futures.items():
+        if future not in done:
+            result = {"status": 504, "error": "Timed out"}
+        else:
+            try:
+                result = future.result()
+            except BuildError as e:
+                result = {"status": 400, "error": f"Bad parameters: {e}"}
+            except Exception as e:
+                logger.error(f"Batch resource {signature} failed: {e}")
+                result = {"status": 500, "error": str(e)}
+        for key in keys_by_signature[signature]:
+            results[key] = result
+    return results
+
+
+def fetch_batch(base_url: str, resources: List[Union[str, Dict[str, Any]]], timeout: float = 10.0,
+                session: Optional[requests.Session] = None) -> Dict[str, Any]:
+    """
+    Client helper: one POST to /api/batch, returning ``{key: data}``.
+
+    Resources that failed map to None, so callers can keep their per-resource
+    fallbacks. Raises ``requests.RequestException`` if the batch call itself fails.
+    """
+    http = session or requests
+    response = http.post(f"{base_url.rstrip('/')}/api/batch", json={"resources": resources, "timeout": timeout},
+                         timeout=timeout + 2)
+    response.raise_for_status()
+    results = response.json().get("results", {})
+    return {key: (result.get("data") if result.get("status") == 200 else None) for key, result in results.items()}
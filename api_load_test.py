@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+api_load_test.py
+----------------
+Load generator for the dashboard API (enhanced_dashboard_api.py).
+
+Each virtual user stands in for one open dashboard. It keeps its own
+keep-alive session and polls endpoints drawn from a weighted mix modelled
+on what the Streamlit apps request. The harness reports throughput, error
+rate and p50/p95/p99 latency per endpoint. Results are appended to
+tests/performance/history/benchmark_history.json in the same
+{name, timestamp, metrics} format as the other benchmarks, and checked
+against the previous run.
+
+Run against a live API:
+    python api_load_test.py --base-url http://localhost:5001 --concurrency 20 --duration 60
+
+Run fully offline, with the API in-process and exchange traffic replayed:
+    python api_load_test.py --start-api --replay data/recordings/bybit.jsonl.gz
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FILE = Path("tests/performance/history/benchmark_history.json")
+
+# (path, relative weight) as polled by the dashboards
+DEFAULT_REQUEST_MIX: List[Tuple[str, int]] = [
+    ("/api/portfolio", 30),
+    ("/api/trading/status", 10),
+    ("/api/trading/statistics", 8),
+    ("/api/environment/status", 8),
+    ("/api/bot/alerts", 8),
+    ("/api/risk/metrics", 8),
+    ("/api/system/validation", 6),
+    ("/api/bot/activity", 5),
+    ("/api/bot/performance", 5),
+    ("/health", 5),
+    ("/api/analytics/performance", 4),
+    ("/api/analytics/market-data", 4),
+    ("/core/status", 4),
+    ("/api/bot/logs", 3),
+]
+
+
+@dataclass
+class LoadTestConfig:
+    base_url: str = "http://localhost:5001"
+    concurrency: int = 10
+    duration: float = 30.0  # seconds
+    max_requests: Optional[int] = None  # stop early after this many requests in total
+    think_time: float = 0.0  # pause between one user's requests
+    timeout: float = 30.0
+    seed: int = 0
+    mix: List[Tuple[str, int]] = field(default_factory=lambda: list(DEFAULT_REQUEST_MIX))
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def _latency_summary(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "mean_ms": (sum(ordered) / len(ordered) * 1000) if ordered else 0.0,
+        "max_ms": (ordered[-1] * 1000) if ordered else 0.0,
+    }
+
+
+class LoadTestRun:
+    """Collects samples from the virtual users of one run"""
+
+    def __init__(self, config: LoadTestConfig):
+        self.config = config
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.status_codes: Dict[int, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._issued = 0
+        self.elapsed = 0.0
+
+    def _take_ticket(self) -> bool:
+        with self._lock:
+            if self.config.max_requests is not None and self._issued >= self.config.max_requests:
+                return False
+            self._issued += 1
+            return True
+
+    def _record(self, path: str, latency: float, status: Optional[int]):
+        with self._lock:
+            self.latencies[path].append(latency)
+            if status is None or status >= 400:
+                self.errors[path] += 1
+            self.status_codes[status or 0] += 1
+
+    def _virtual_user(self, user_id: int, deadline: float):
+        rng = random.Random(self.config.seed * 1000 + user_id)
+        paths = [path for path, _ in self.config.mix]
+        weights = [weight for _, weight in self.config.mix]
+        with requests.Session() as session:
+            while time.perf_counter() < deadline and self._take_ticket():
+                path = rng.choices(paths, weights)[0]
+                started = time.perf_counter()
+                try:
+                    response = session.get(self.config.base_url + path, timeout=self.config.timeout)
+                    response.content  # include body transfer in the latency
+                    status = response.status_code
+                except requests.exceptions.RequestException:
+                    status = None
+                self._record(path, time.perf_counter() - started, status)
+                if self.config.think_time:
+                    time.sleep(self.config.think_time)
+
+    def run(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        deadline = started + self.config.duration
+        users = [threading.Thread(target=self._virtual_user, args=(i, deadline), name=f"load-user-{i}", daemon=True)
+                 for i in range(self.config.concurrency)]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        self.elapsed = time.perf_counter() - started
+        return self.metrics()
+
+    def metrics(self) -> Dict[str, Any]:
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        total = len(all_latencies)
+        errors = sum(self.errors.values())
+        return {
+            "concurrency": self.config.concurrency,
+            "duration_s": self.elapsed,
+            "requests": total,
+            "throughput_rps": total / self.elapsed if self.elapsed else 0.0,
+            "error_rate": errors / total if total else 0.0,
+            **_latency_summary(all_latencies),
+            "status_codes": {str(code): count for code, count in sorted(self.status_codes.items())},
+            "endpoints": {
+                path: {
+                    "requests": len(values),
+                    "errors": self.errors.get(path, 0),
+                    "error_rate": self.errors.get(path, 0) / len(values),
+                    **_latency_summary(values),
+                }
+                for path, values in sorted(self.latencies.items())
+            },
+        }
+
+
+def run_load_test(config: LoadTestConfig) -> Dict[str, Any]:
+    logger.info(f"Load test: {config.concurrency} users for {config.duration}s against {config.base_url}")
+    return LoadTestRun(config).run()
+
+
+def load_history(path: Path = HISTORY_FILE) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def append_history(metrics: Dict[str, Any], name: str = "api_load", path: Path = HISTORY_FILE) -> Dict[str, Any]:
+    entry = {"name": name, "timestamp": datetime.now().isoformat(), "metrics": metrics}
+    history = load_history(path)
+    history.append(entry)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2)
+    return entry
+
+
+def find_regressions(metrics: Dict[str, Any], history: List[Dict[str, Any]], name: str = "api_load",
+                     tolerance: float = 0.25, min_latency_ms: float = 5.0) -> List[str]:
+    """
+    Compare against the most recent earlier run with the same name and concurrency.
+
+    Flags endpoints whose p95 grew by more than ``tolerance`` (ignoring
+    endpoints faster than ``min_latency_ms``), plus any rise in error rate.
+    """
+    previous = [entry for entry in history if entry.get("name") == name
+                and entry.get("metrics", {}).get("concurrency") == metrics.get("concurrency")]
+    if not previous:
+        return []
+    baseline = previous[-1]["metrics"]
+    regressions = []
+    for path, current in metrics.get("endpoints", {}).items():
+        before = baseline.get("endpoints", {}).get(path)
+        if not before:
+            continue
+        if current["p95_ms"] > max(min_latency_ms, before["p95_ms"] * (1 + tolerance)):
+            regressions.append(f"{path}: p95 {before['p95_ms']:.1f} ms -> {current['p95_ms']:.1f} ms")
+        if current["error_rate"] > before["error_rate"] + 0.01:
+            regressions.append(f"{path}: error rate {before['error_rate']:.2%} -> {current['error_rate']:.2%}")
+    if metrics["throughput_rps"] < baseline.get("throughput_rps", 0) * (1 - tolerance):
+        regressions.append(f"throughput {baseline['throughput_rps']:.1f} -> {metrics['throughput_rps']:.1f} req/s")
+    return regressions
+
+
+def serve_app_in_thread(app: Any, host: str = "127.0.0.1", port: int = 0):
+    """Serve a Flask app from a background thread; returns (server, base_url)"""
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="load-test-api", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def print_report(metrics: Dict[str, Any]):
+    print(f"\n{metrics['requests']} requests in {metrics['duration_s']:.1f}s "
+          f"({metrics['throughput_rps']:.1f} req/s, {metrics['concurrency']} users), "
+          f"error rate {metrics['error_rate']:.2%}")
+    print(f"{'endpoint':40} {'n':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for path, stats in metrics["endpoints"].items():
+        print(f"{path:40} {stats['requests']:6d} {stats['errors']:5d} "
+              f"{stats['p50_ms']:9.1f} {stats['p95_ms']:9.1f} {stats['p99_ms']:9.1f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the dashboard API")
+    parser.add_argument("--base-url", default="http://localhost:5001")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--max-requests", type=int)
+    parser.add_argument("--think-time", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--name", default="api_load", help="history entry name")
+    parser.add_argument("--history", default=str(HISTORY_FILE))
+    parser.add_argument("--no-history", action="store_true")
+    parser.add_argument("--start-api", action="store_true", help="serve enhanced_dashboard_api in-process")
+    parser.add_argument("--replay", help="recording to serve from a local exchange stand-in")
+    parser.add_argument("--replay-speed", type=float, default=1.0)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    replay = None
+    if args.replay:
+        # Must happen before the API module creates its exchange clients
+        from exchange_replay import ReplayServer, use_replay_server
+        replay = ReplayServer(args.replay, speed=args.replay_speed).start()
+        use_replay_server(replay)
+
+    api_server = None
+    base_url = args.base_url
+    if args.start_api:
+        Path("logs").mkdir(exist_ok=True)
+        import enhanced_dashboard_api
+        api_server, base_url = serve_app_in_thread(enhanced_dashboard_api.app)
+
+    config = LoadTestConfig(base_url=base_url, concurrency=args.concurrency, duration=args.duration,
+                            max_requests=args.max_requests, think_time=args.think_time, seed=args.seed)
+    try:
+        metrics = run_load_test(config)
+    finally:
+        if api_server is not None:
+            api_server.shutdown()
+        if replay is not None:
+            replay.stop()
+
+    print_report(metrics)
+    history_path = Path(args.history)
+    regressions = find_regressions(metrics, load_history(history_path), args.name)
+    if not args.no_history:
+        append_history(metrics, args.name, history_path)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+api_metrics.py
+--------------
+Request and outbound-call instrumentation in Prometheus text format.
+
+The module has a small thread-safe registry of counters, gauges and
+histograms, rendered in the text exposition format (version 0.0.4) that
+Prometheus scrapes. It has no dependency on prometheus_client.
+
+- ``instrument_app(app)`` adds Flask hooks that record, for each route
+  template, latency, in-flight requests, 4xx/5xx counts and request and
+  response sizes. A ``/metrics`` endpoint then just returns ``render()``.
+- ``instrument_exchange_client()`` subscribes to the pooled exchange HTTP
+  client's timing hook, which covers every BybitConnector request.
+- ``@timed_call("name")`` times ProductionDataManager calls, cache hits
+  included, so slow data paths show up next to slow exchange endpoints.
+"""
+
+import bisect
+import functools
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], Any]] = None
+
+    def set(self, value: float, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def set_function(self, function: Callable[[], Any]):
+        """Read the value(s) at scrape time: a number, or {label value tuple: number}"""
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                current = self._function()
+            except Exception as e:
+                logger.debug(f"Gauge {self.name} callback failed: {e}")
+                return []
+            items = sorted(current.items()) if isinstance(current, dict) else [((), current)]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (last slot is +Inf only), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: Any):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels: Any) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered with a different shape")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Process-wide registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+        return _registry
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render() -> str:
+    return get_metrics_registry().render()
+
+
+def instrument_app(app, registry: Optional[MetricsRegistry] = None, skip_paths: Iterable[str] = ("/metrics",)):
+    """
+    Record latency, in-flight requests, errors and payload sizes for every route of ``app``.
+
+    Flask runs after_request hooks in reverse order of registration. Call this
+    before setting up other response hooks (compression, caching) so that
+    latency and response size cover their work too.
+    """
+    from flask import g, request
+
+    registry = registry or get_metrics_registry()
+    latency = registry.histogram("http_request_duration_seconds", "Time to build the response",
+                                 ["method", "route", "status"])
+    in_flight = registry.gauge("http_requests_in_flight", "Requests currently being handled", ["route"])
+    errors = registry.counter("http_request_errors_total", "Responses with status >= 400", ["route", "status"])
+    request_size = registry.histogram("http_request_size_bytes", "Request body size", ["route"], SIZE_BUCKETS)
+    response_size = registry.histogram("http_response_size_bytes", "Response body size as sent", ["route"],
+                                       SIZE_BUCKETS)
+    skip = set(skip_paths)
+
+    def route_label() -> str:
+        # The rule template keeps label cardinality bounded (/api/x/<symbol>, not every symbol)
+        return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+    @app.before_request
+    def _start_timer():
+        if request.path in skip:
+            return
+        g._metrics_route = route_label()
+        g._metrics_started = time.perf_counter()
+        in_flight.inc(route=g._metrics_route)
+        request_size.observe(request.content_length or 0, route=g._metrics_route)
+
+    @app.after_request
+    def _record(response):
+        route = g.get("_metrics_route")
+        if route is None:
+            return response
+        status = str(response.status_code)
+        latency.observe(time.perf_counter() - g._metrics_started, method=request.method, route=route, status=status)
+        if response.status_code >= 400:
+            errors.inc(route=route, status=status)
+        if not response.is_streamed:
+            response_size.observe(response.calculate_content_length() or 0, route=route)
+        return response
+
+    @app.teardown_request
+    def _finish(exc):
+        route = g.pop("_metrics_route", None)
+        if route is None:
+            return
+        in_flight.dec(route=route)
+        if exc is not None:
+            # after_request is skipped when a view raises past the error handlers
+            errors.inc(route=route, status="500")
+
+    return app
+
+
+def instrument_exchange_client(client: Any = None, registry: Optional[MetricsRegistry] = None):
+    """Time every request made through the pooled exchange HTTP client"""
+    if client is None:
+        from exchange_http_client import get_exchange_http_client
+        client = get_exchange_http_client()
+    registry = registry or get_metrics_registry()
+    latency = registry.histogram("exchange_request_duration_seconds", "Outbound exchange HTTP request latency",
+                                 ["method", "endpoint", "status"])
+    failures = registry.counter("exchange_request_errors_total",
+                                "Outbound exchange requests that failed or returned >= 400", ["method", "endpoint"])
+
+    def hook(method: str, url: str, status_code: Optional[int], elapsed: float, error: Optional[BaseException]):
+        endpoint = urlparse(url).path or "/"
+        latency.observe(elapsed, method=method, endpoint=endpoint, status=str(status_code or "error"))
+        if error is not None or (status_code or 0) >= 400:
+            failures.inc(method=method, endpoint=endpoint)
+
+    client.add_timing_hook(hook)
+    return hook
+
+
+def timed_call(name: str, registry: Optional[MetricsRegistry] = None) -> Callable:
+    """Decorator timing a data-manager call under ``method=name``"""
+
+    def decorator(fn):
+        reg = registry or get_metrics_registry()
+        latency = reg.histogram("data_manager_call_duration_seconds",
+                                "ProductionDataManager call latency, cache hits included", ["method"])
+        failures = reg.counter("data_manager_call_errors_total", "ProductionDataManager calls that raised",
+                               ["method"])
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                failures.inc(method=name)
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started, method=name)
+
+        return wrapper
+
+    return decorator
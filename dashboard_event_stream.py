@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+dashboard_event_stream.py
+-------------------------
+Server-Sent Events push channel between the dashboard API and the dashboards.
+
+Every dashboard used to poll the API on a timer, and each Streamlit rerun
+repeated the same REST calls. Here the API polls each data source once
+(portfolio, tickers, alerts, bot status, system metrics) no matter how many
+dashboards are open. The EventHub keeps the latest payload per topic and
+records an event only when a payload actually changes, carrying just the
+changed top-level keys. Clients connect to ``/api/stream?topics=...``, get a
+snapshot of the topics they asked for, and then only deltas.
+DashboardStreamClient is the reading side for Streamlit pages. It keeps a
+merged local copy of each topic, which pages read instead of calling the API.
+"""
+
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 15  # seconds between keep-alive comments on an idle stream
+
+
+@dataclass
+class StreamEvent:
+    id: int
+    topic: str
+    kind: str  # "snapshot" or "delta"
+    data: Any
+    removed: Optional[List[str]] = None
+
+    def to_sse(self) -> str:
+        body = {"kind": self.kind, "data": self.data}
+        if self.removed:
+            body["removed"] = self.removed
+        return f"id: {self.id}\nevent: {self.topic}\ndata: {json.dumps(body, default=str)}\n\n"
+
+
+class EventHub:
+    """Latest state per topic plus a bounded log of change events"""
+
+    def __init__(self, history_size: int = 512):
+        self._state: Dict[str, Any] = {}
+        self._events: deque = deque(maxlen=history_size)
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._cond = threading.Condition()
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def publish(self, topic: str, payload: Any) -> Optional[StreamEvent]:
+        """Record ``payload`` as the new state of ``topic``; returns None if nothing changed"""
+        with self._cond:
+            previous = self._state.get(topic)
+            if previous == payload:
+                return None
+            if isinstance(previous, dict) and isinstance(payload, dict):
+                changed = {k: v for k, v in payload.items() if previous.get(k) != v}
+                removed = [k for k in previous if k not in payload]
+                event = StreamEvent(next(self._ids), topic, "delta", changed, removed or None)
+            else:
+                event = StreamEvent(next(self._ids), topic, "snapshot", payload)
+            self._state[topic] = payload
+            self._events.append(event)
+            self._last_id = event.id
+            self._cond.notify_all()
+            return event
+
+    def snapshot(self, topics: Optional[Iterable[str]] = None) -> List[StreamEvent]:
+        """Full current state of ``topics`` as snapshot events stamped with the latest id"""
+        with self._cond:
+            wanted = self._state.keys() if topics is None else [t for t in topics if t in self._state]
+            return [StreamEvent(self._last_id, topic, "snapshot", self._state[topic]) for topic in wanted]
+
+    def events_after(self, last_id: int, topics: Optional[set] = None,
+                     timeout: Optional[float] = None) -> Tuple[Optional[List[StreamEvent]], int]:
+        """
+        Events in ``topics`` newer than ``last_id``, waiting up to ``timeout`` for one.
+
+        Returns ``(events, seen_id)``. ``seen_id`` is the newest event id
+        covered by the answer, so the caller resumes from it without skipping
+        anything published meanwhile. ``events`` is None when ``last_id`` has
+        already fallen out of the history; the caller should then resend
+        snapshots. Events in other topics do not end the wait.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._events and last_id < self._events[0].id - 1:
+                    return None, self._last_id
+                events = [e for e in self._events if e.id > last_id and (topics is None or e.topic in topics)]
+                if events:
+                    return events, self._last_id
+                last_id = self._last_id
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return [], last_id
+                self._cond.wait(remaining)
+
+
+class PollingSource:
+    """Calls ``fetch`` every ``interval`` seconds and publishes the result to the hub"""
+
+    def __init__(self, topic: str, fetch: Callable[[], Any], interval: float):
+        self.topic = topic
+        self.fetch = fetch
+        self.interval = interval
+
+
+class EventProducer:
+    """Runs one polling thread per source, shared by every connected client"""
+
+    def __init__(self, hub: EventHub, sources: Iterable[PollingSource] = ()):
+        self.hub = hub
+        self.sources: List[PollingSource] = list(sources)
+        self._started = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def add_source(self, source: PollingSource):
+        self.sources.append(source)
+        if self._started:
+            self._start_source(source)
+
+    def start(self):
+        """Start polling; safe to call on every client connect"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for source in self.sources:
+            self._start_source(source)
+
+    def stop(self):
+        self._stop.set()
+
+    def _start_source(self, source: PollingSource):
+        def poll():
+            while not self._stop.is_set():
+                try:
+                    self.hub.publish(source.topic, source.fetch())
+                except Exception as e:
+                    logger.warning(f"Stream source {source.topic} failed: {e}")
+                self._stop.wait(source.interval)
+
+        threading.Thread(target=poll, name=f"stream-source-{source.topic}", daemon=True).start()
+
+
+def sse_stream(hub: EventHub, topics: Optional[Iterable[str]] = None, last_event_id: Optional[int] = None,
+               heartbeat: float = HEARTBEAT_INTERVAL) -> Iterator[str]:
+    """SSE text stream: snapshot (unless resuming) followed by deltas and heartbeats"""
+    wanted = set(topics) if topics else None
+    yield "retry: 3000\n\n"
+    if last_event_id is None or last_event_id > hub.last_id:
+        # Fresh client, or an id from before an API restart
+        last_id = hub.last_id
+        for event in hub.snapshot(wanted):
+            yield event.to_sse()
+    else:
+        last_id = last_event_id
+    while True:
+        events, seen_id = hub.events_after(last_id, wanted, timeout=heartbeat)
+        if events is None:
+            # Too far behind to replay deltas; start over from the current state
+            last_id = hub.last_id
+            for event in hub.snapshot(wanted):
+                yield event.to_sse()
+            continue
+        last_id = seen_id
+        if not events:
+            # Only after ``heartbeat`` seconds without an event in the wanted topics
+            yield ": keep-alive\n\n"
+            continue
+        for event in events:
+            yield event.to_sse()
+
+
+class DashboardStreamClient:
+    """
+    Background SSE reader holding the latest state of each subscribed topic.
+
+    ``get(topic)`` never blocks and returns None until the first snapshot
+    arrives, so pages can fall back to a REST call in that case.
+    """
+
+    def __init__(self, base_url: str, topics: Iterable[str], reconnect_delay: float = 3.0):
+        self.url = f"{base_url.rstrip('/')}/api/stream"
+        self.topics = list(topics)
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+        self.version = 0  # increments on every applied event
+        self._state: Dict[str, Any] = {}
+        self._updated: Dict[str, float] = {}
+        self._last_id: Optional[str] = None
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="dashboard-stream", daemon=True)
+        self._thread.start()
+
+    def get(self, topic: str, default: Any = None) -> Any:
+        with self._cond:
+            return self._state.get(topic, default)
+
+    def age(self, topic: str) -> Optional[float]:
+        """Seconds since ``topic`` last changed, or None if never received"""
+        updated = self._updated.get(topic)
+        return time.time() - updated if updated else None
+
+    def wait_for_update(self, since_version: int, timeout: float) -> bool:
+        """Block until something changes after ``since_version`` (True) or ``timeout`` passes (False)"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.version > since_version, timeout)
+
+    def close(self):
+        self._stop.set()
+
+    def apply(self, topic: str, body: Dict[str, Any]):
+        with self._cond:
+            if body.get("kind") == "delta" and isinstance(self._state.get(topic), dict):
+                merged = dict(self._state[topic])
+                merged.update(body.get("data") or {})
+                for key in body.get("removed") or ():
+                    merged.pop(key, None)
+                self._state[topic] = merged
+            else:
+                self._state[topic] = body.get("data")
+            self._updated[topic] = time.time()
+            self.version += 1
+            self._cond.notify_all()
+
+    def _run(self):
+        while not self._stop.is_set():
+            headers = {"Accept": "text/event-stream"}
+            if self._last_id:
+                headers["Last-Event-ID"] = self._last_id
+            try:
+                with requests.get(self.url, params={"topics": ",".join(self.topics)}, headers=headers,
+                                  stream=True, timeout=(5, HEARTBEAT_INTERVAL * 2)) as response:
+                    response.raise_for_status()
+                    self.connected = True
+                    self._consume(response.iter_lines(decode_unicode=True))
+            except Exception as e:
+                logger.debug(f"Dashboard stream disconnected: {e}")
+            self.connected = False
+            self._stop.wait(self.reconnect_delay)
+
+    def _consume(self, lines: Iterable[str]):
+        event_id, topic, data = None, None, []
+        for line in lines:
+            if self._stop.is_set():
+                return
+            if line:
+                if line.startswith(":"):
+                    continue
+                name, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if name == "id":
+                    event_id = value
+                elif name == "event":
+                    topic = value
+                elif name == "data":
+                    data.append(value)
+                continue
+            # Blank line ends an event
+            if topic and data:
+                try:
+                    self.apply(topic, json.loads("\n".join(data)))
+                except ValueError:
+                    logger.debug(f"Bad stream event for {topic}")
+            if event_id:
+                self._last_id = event_id
+            event_id, topic, data = None, None, []
@@ -172,7 +172,7 @@ class DataExportImportSystem:
                 'recipients': []
             }
         }
-      def get_trading_data(self, start_date: str, end_date: str) -> pd.DataFrame:
+    def get_trading_data(self, start_date: str, end_date: str) -> pd.DataFrame:
         """Get trading data from API or real production data"""
         try:
             # Try to get real trading data from production if available
@@ -214,18 +214,13 @@ class DataExportImportSystem:
     def fetch_real_trading_data(self, start_date: str, end_date: str) -> pd.DataFrame:
         """Fetch real trading data from Bybit API"""
         try:
-            import sys
-            sys.path.append(str(Path(__file__).parent / "ZoL0-master"))
-            from data.data.market_data_fetcher import MarketDataFetcher
+            from historical_data_downloader import HistoricalDataDownloader
             
             # Use production API if enabled
             use_testnet = not bool(os.getenv("BYBIT_PRODUCTION_ENABLED", "").lower() == "true")
             
-            fetcher = MarketDataFetcher(
-                api_key=os.getenv("BYBIT_API_KEY"),
-                api_secret=os.getenv("BYBIT_API_SECRET"),
-                use_testnet=use_testnet
-            )
+            # Pages the full range instead of truncating to one 1000-candle request
+            downloader = HistoricalDataDownloader(use_testnet=use_testnet)
             
             # Get historical data for multiple symbols
             symbols = ['BTCUSDT', 'ETHUSDT', 'ADAUSDT']
@@ -233,13 +228,10 @@ class DataExportImportSystem:
             
             for symbol in symbols:
                 try:
-                    # Calculate the number of days for data fetching
                     start_dt = datetime.strptime(start_date, '%Y-%m-%d')
                     end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-                    days = (end_dt - start_dt).days
-                    limit = min(days * 24, 1000)  # Max 1000 data points
                     
-                    df = fetcher.fetch_data(symbol=symbol, interval="1h", limit=limit)
+                    df = downloader.download(symbol=symbol, interval="1h", start=start_dt, end=end_dt)
                     
                     if df is not None and not df.empty:
                         # Transform the OHLCV data into trade-like format for export
@@ -15,6 +15,9 @@ from datetime import datetime, timedelta
 from pathlib import Path
 import psutil
 
+from api_batch import fetch_batch
+from log_tail_service import get_log_tail
+
 st.set_page_config(
     page_title="ZoL0 Bot Activity Monitor", 
     page_icon="🤖", 
@@ -162,17 +165,11 @@ class BotActivityMonitor:
     def get_component_health(self):
         """Pobierz szczegółowy status komponentów"""
         try:
-            # System validation
-            validation_response = requests.get(f"{self.api_base_url}/api/system/validation", timeout=5)
-            validation_data = validation_response.json() if validation_response.status_code == 200 else {}
-            
-            # Core status
-            core_response = requests.get(f"{self.api_base_url}/core/status", timeout=5)
-            core_data = core_response.json() if core_response.status_code == 200 else {}
-            
-            # AI Models
-            ai_response = requests.get(f"{self.api_base_url}/core/ai-models", timeout=5)
-            ai_data = ai_response.json() if ai_response.status_code == 200 else {}
+            # System validation, core status and AI models in one batched request
+            batch = fetch_batch(self.api_base_url, ["system_validation", "core_status", "ai_models"], timeout=5)
+            validation_data = batch.get("system_validation") or {}
+            core_data = batch.get("core_status") or {}
+            ai_data = batch.get("ai_models") or {}
             
             return {
                 "validation": validation_data.get("validation", {}),
@@ -183,28 +180,11 @@ class BotActivityMonitor:
         except Exception as e:
             return {"error": str(e)}
     
-    def get_recent_logs(self, log_file="logs/enhanced_dashboard_api.log", lines=50):
-        """Pobierz ostatnie logi"""
+    def get_recent_logs(self, log_file="logs/enhanced_dashboard_api.log", lines=20, level=None):
+        """Pobierz ostatnie logi (odczyt od końca pliku, bez wczytywania całości)"""
         try:
-            log_path = Path(log_file)
-            if log_path.exists():
-                with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    lines_list = f.readlines()
-                    recent_lines = lines_list[-lines:] if len(lines_list) > lines else lines_list
-                    
-                    logs = []
-                    for line in recent_lines:
-                        if line.strip():
-                            # Parse log line
-                            parts = line.strip().split(' ', 3)
-                            if len(parts) >= 4:
-                                logs.append({
-                                    "timestamp": f"{parts[0]} {parts[1]}",
-                                    "level": parts[2].strip('[]'),
-                                    "message": parts[3] if len(parts) > 3 else ""
-                                })
-                    return logs[-20:]  # Return last 20 logs
-            return []
+            entries = get_log_tail(log_file).tail(lines, level=level)
+            return [{"timestamp": e.timestamp, "level": e.level, "message": e.message} for e in entries]
         except Exception as e:
             return [{"timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 
                     "level": "ERROR", 
@@ -8,12 +8,18 @@ import os
 import sys
 import json
 import logging
-import psutil
 import asyncio
 from datetime import datetime, timedelta
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from pathlib import Path
 
+import api_metrics
+from api_batch import BatchError, parse_batch, run_batch
+from log_tail_service import get_log_tail, parse_query_time
+from response_cache import ResponseCache
+from dashboard_event_stream import EventHub, EventProducer, PollingSource, sse_stream
+from system_metrics_sampler import get_system_metrics_sampler
+
 # Ensure production environment variables are set
 os.environ["BYBIT_PRODUCTION_CONFIRMED"] = "true"
 os.environ["BYBIT_PRODUCTION_ENABLED"] = "true"
@@ -38,6 +44,11 @@ except ImportError as e:
     ApiClient = None
 
 app = Flask(__name__)
+# Metryki przed cache, żeby mierzyć też kompresję i rozmiar wysłanej odpowiedzi
+api_metrics.instrument_app(app)
+api_metrics.instrument_exchange_client()
+# Memoizacja odpowiedzi, ETag/304 i kompresja gzip/brotli
+response_cache = ResponseCache(app)
 
 # Global ProductionDataManager instance - initialized once at startup
 _production_data_manager = None
@@ -47,9 +58,10 @@ def get_production_data_manager():
     global _production_data_manager
     if _production_data_manager is None:
         try:
-            from production_data_manager import ProductionDataManager
+            # Reuse the module-level instance; its connector warms up in the background
+            from production_data_manager import get_production_data
             logger.info("Initializing global ProductionDataManager...")
-            _production_data_manager = ProductionDataManager()
+            _production_data_manager = get_production_data()
             logger.info("Global ProductionDataManager initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize ProductionDataManager: {e}")
@@ -57,12 +69,13 @@ def get_production_data_manager():
     return _production_data_manager
 
 # Konfiguracja logowania
+API_LOG_FILE = "logs/enhanced_dashboard_api.log"
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
     handlers=[
         logging.StreamHandler(),
-        logging.FileHandler("logs/enhanced_dashboard_api.log")
+        logging.FileHandler(API_LOG_FILE)
     ]
 )
 logger = logging.getLogger(__name__)
@@ -285,20 +298,22 @@ class CoreSystemAPI:
     def _get_system_metrics(self):
         """Metryki systemowe"""
         try:
+            sample = system_sampler.latest()
             return {
-                "cpu_percent": psutil.cpu_percent(interval=0.1),
+                "cpu_percent": sample.cpu_percent,
                 "memory": {
-                    "percent": psutil.virtual_memory().percent,
-                    "available": psutil.virtual_memory().available,
-                    "total": psutil.virtual_memory().total
+                    "percent": sample.memory_percent,
+                    "available": sample.memory_available,
+                    "total": sample.memory_total
                 },
                 "disk": {
-                    "percent": psutil.disk_usage('C:' if os.name == 'nt' else '/').percent,
-                    "free": psutil.disk_usage('C:' if os.name == 'nt' else '/').free,
-                    "total": psutil.disk_usage('C:' if os.name == 'nt' else '/').total
+                    "percent": sample.disk_percent,
+                    "free": sample.disk_free,
+                    "total": sample.disk_total
                 },
-                "processes": len(psutil.pids()),
-                "boot_time": psutil.boot_time(),
+                "processes": sample.process_count,
+                "boot_time": system_sampler.boot_time,
+                "sampled_at": datetime.fromtimestamp(sample.timestamp).isoformat(),
                 "timestamp": datetime.now().isoformat()
             }
         except Exception as e:
@@ -308,6 +323,8 @@ class CoreSystemAPI:
             }
 
 # Inicjalizacja API
+# Metryki systemowe próbkowane w tle - endpointy nie wołają psutil bezpośrednio
+system_sampler = get_system_metrics_sampler()
 core_api = CoreSystemAPI()
 
 # === ENDPOINTS ===
@@ -326,6 +343,8 @@ def index():
             "/core/ai-models",
             "/core/system-metrics",
             "/core/health",
+            "/api/system/metrics",
+            "/api/system/metrics/history",
             "/api/trading-signals",
             "/api/portfolio",
             "/api/environment/status",
@@ -348,6 +367,7 @@ def simple_health():
     })
 
 @app.route('/core/status')
+@response_cache.cached(ttl=5)
 def core_status():
     """Pełny status systemu core"""
     try:
@@ -358,6 +378,7 @@ def core_status():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/core/strategies')
+@response_cache.cached(ttl=5)
 def strategies_status():
     """Status strategii tradingowych"""
     try:
@@ -368,6 +389,7 @@ def strategies_status():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/core/ai-models')
+@response_cache.cached(ttl=5)
 def ai_models_status():
     """Status modeli AI"""
     try:
@@ -378,6 +400,7 @@ def ai_models_status():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/core/system-metrics')
+@response_cache.cached(ttl=5)
 def system_metrics():
     """Metryki systemowe"""
     try:
@@ -387,6 +410,43 @@ def system_metrics():
         logger.error(f"Error getting system metrics: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/system/metrics')
+@response_cache.cached(ttl=1)
+def api_system_metrics():
+    """Latest system metrics in the format used by the master control dashboard"""
+    try:
+        sample = system_sampler.latest()
+        uptime = timedelta(seconds=int(system_sampler.uptime_seconds()))
+        return jsonify({
+            "system_uptime": f"{uptime.days}d {uptime.seconds // 3600}h {uptime.seconds % 3600 // 60}m",
+            "cpu_usage": sample.cpu_percent,
+            "memory_usage": sample.memory_percent,
+            "disk_usage": sample.disk_percent,
+            "process_memory_mb": sample.process_rss / 1024 / 1024,
+            "window_1m": system_sampler.window(60),
+            "sampled_at": datetime.fromtimestamp(sample.timestamp).isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Error getting system metrics: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/system/metrics/history')
+def api_system_metrics_history():
+    """Short metric history for sparkline charts"""
+    try:
+        seconds = request.args.get('seconds', 300, type=float)
+        metrics = request.args.get('metrics', 'cpu_percent,memory_percent,disk_percent').split(',')
+        return jsonify({
+            "success": True,
+            "interval": system_sampler.interval,
+            "history": system_sampler.history(seconds, metrics)
+        })
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting system metrics history: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/core/health')
 def health_check():
     """Sprawdzenie zdrowia systemu"""
@@ -453,6 +513,7 @@ def trading_signals():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/portfolio')
+@response_cache.cached(ttl=2)
 def portfolio_status():
     """Status portfela - realne dane jeśli dostępne, fallback do symulacji"""
     try:
@@ -539,6 +600,7 @@ def portfolio_status():
             "connection_status": {"status": "exception"}        })
 
 @app.route('/api/environment/status')
+@response_cache.cached(ttl=5)
 def environment_status():
     """Pobierz aktualny status środowiska"""
     try:
@@ -692,6 +754,7 @@ def stop_trading():
         }), 500
 
 @app.route('/api/trading/status')
+@response_cache.cached(ttl=2)
 def trading_status():
     """Pobierz status Trading Engine"""
     try:
@@ -727,6 +790,7 @@ def trading_status():
         }), 500
 
 @app.route('/api/system/validation')
+@response_cache.cached(ttl=10)
 def system_validation():
     """Walidacja systemu przed przełączeniem na produkcję"""
     try:
@@ -787,6 +851,7 @@ def system_validation():
         }), 500
 
 @app.route('/api/bot/activity')
+@response_cache.cached(ttl=5)
 def get_bot_activity():
     """Get current bot activity and operations"""
     try:
@@ -829,6 +894,7 @@ def get_bot_activity():
         }), 500
 
 @app.route('/api/bot/performance')
+@response_cache.cached(ttl=5)
 def get_bot_performance():
     """Get bot performance metrics"""
     try:
@@ -866,31 +932,29 @@ def get_bot_performance():
 
 @app.route('/api/bot/logs')
 def get_bot_logs():
-    """Get recent bot logs"""
+    """Get recent bot logs (tail of the API log, optionally filtered or for a time range)"""
     try:
-        logs = []
-        log_file = "logs/enhanced_dashboard_api.log"
-        
-        if os.path.exists(log_file):
-            with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-                recent_lines = lines[-50:] if len(lines) > 50 else lines
-                
-                for line in recent_lines:
-                    if line.strip():
-                        parts = line.strip().split(' ', 3)
-                        if len(parts) >= 4:
-                            logs.append({
-                                "timestamp": f"{parts[0]} {parts[1]}",
-                                "level": parts[2].strip('[]'),
-                                "message": parts[3] if len(parts) > 3 else ""
-                            })
+        limit = max(1, min(request.args.get('limit', 20, type=int), 1000))
+        level = request.args.get('level')
+        contains = request.args.get('q')
+        since = request.args.get('since')
+        until = request.args.get('until')
+        until = parse_query_time(until) if until else None
+        
+        log_tail = get_log_tail(API_LOG_FILE)
+        if since:
+            logs = log_tail.between(parse_query_time(since), until, limit=limit, level=level, contains=contains)
+        else:
+            logs = log_tail.tail(limit, level=level, contains=contains, until=until)
         
         return jsonify({
             "success": True,
-            "logs": logs[-20:]  # Return last 20 logs
+            "logs": [entry.to_dict() for entry in logs],
+            "next_offset": log_tail.size()
         })
         
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Invalid parameter: {e}"}), 400
     except Exception as e:
         logger.error(f"Error getting bot logs: {e}")
         return jsonify({
@@ -898,15 +962,41 @@ def get_bot_logs():
             "error": str(e)
         }), 500
 
+@app.route('/api/bot/logs/follow')
+def follow_bot_logs():
+    """Server-Sent Events with new log entries; resumes from Last-Event-ID or ?offset="""
+    offset = request.headers.get('Last-Event-ID', type=int)
+    if offset is None:
+        offset = request.args.get('offset', type=int)
+    level = request.args.get('level')
+    contains = request.args.get('q')
+    
+    def generate():
+        yield "retry: 3000\n\n"
+        idle_polls = 0
+        for entries, resume in get_log_tail(API_LOG_FILE).follow(offset, level=level, contains=contains):
+            if entries:
+                idle_polls = 0
+                yield f"id: {resume}\nevent: logs\ndata: {json.dumps([e.to_dict() for e in entries])}\n\n"
+            else:
+                idle_polls += 1
+                if idle_polls % 30 == 0:  # ~15 s at the default poll interval
+                    yield ": keep-alive\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.route('/api/bot/alerts')
+@response_cache.cached(ttl=2)
 def get_bot_alerts():
     """Get current system alerts"""
     try:
         alerts = []
         
-        # Check system resources
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory_percent = psutil.virtual_memory().percent
+        # Check system resources (latest background sample)
+        sample = system_sampler.latest()
+        cpu_percent = sample.cpu_percent
+        memory_percent = sample.memory_percent
         
         if cpu_percent > 80:
             alerts.append({
@@ -960,6 +1050,7 @@ def internal_error(error):
 # === ADVANCED ANALYTICS ENDPOINTS ===
 
 @app.route('/api/analytics/performance')
+@response_cache.cached(ttl=10)
 def get_advanced_performance():
     """Get detailed performance analytics"""
     try:
@@ -1041,6 +1132,7 @@ def get_advanced_performance():
         }), 500
 
 @app.route('/api/risk/metrics')
+@response_cache.cached(ttl=5)
 def get_risk_metrics():
     """Get advanced risk management metrics"""
     try:
@@ -1070,9 +1162,10 @@ def get_risk_metrics():
             "tracking_error": 4.5
         }
         
-        # Add system resource risks
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory_percent = psutil.virtual_memory().percent
+        # Add system resource risks (latest background sample)
+        sample = system_sampler.latest()
+        cpu_percent = sample.cpu_percent
+        memory_percent = sample.memory_percent
         
         risk_metrics.update({
             "system_cpu_usage": cpu_percent,
@@ -1095,6 +1188,7 @@ def get_risk_metrics():
         }), 500
 
 @app.route('/api/analytics/market-data')
+@response_cache.cached(ttl=2)
 def get_market_data():
     """Get real-time market data and analysis"""
     try:
@@ -1152,6 +1246,7 @@ def get_market_data():
         }), 500
 
 @app.route('/api/analytics/strategy-performance')
+@response_cache.cached(ttl=10)
 def get_strategy_performance():
     """Get detailed strategy performance breakdown"""
     try:
@@ -1239,14 +1334,14 @@ def get_strategy_performance():
         }), 500
 
 @app.route('/api/trading/statistics')
+@response_cache.cached(ttl=5)
 def trading_statistics():
     """Zwraca statystyki tradingowe - realne jeśli dostępne, fallback do przykładowych"""
     try:
         # Spróbuj pobrać realne statystyki z ProductionDataManager
         try:
-            from production_data_manager import ProductionDataManager
-            manager = ProductionDataManager()
-            if manager.is_production and manager.api_key and manager.api_secret:
+            manager = get_production_data_manager()
+            if manager and manager.is_production and manager.api_key and manager.api_secret:
                 stats = manager.get_trading_stats()  # Musi być zaimplementowane w managerze
                 if stats and isinstance(stats, dict):
                     return jsonify(stats)
@@ -1266,6 +1361,133 @@ def trading_statistics():
         logger.error(f"Error getting trading statistics: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/market/orderbook/<symbol>')
+def market_order_book(symbol):
+    """Order book levels from the local WebSocket-maintained book"""
+    try:
+        depth = min(request.args.get('depth', 10, type=int), 200)
+        manager = get_production_data_manager()
+        if manager is None:
+            return jsonify({"success": False, "error": "ProductionDataManager unavailable"}), 503
+        book = manager.get_order_book(symbol.upper(), depth)
+        local = manager.order_books.get(symbol.upper())
+        if local is not None:
+            with local.lock:
+                book["microprice"] = local.microprice()
+                book["imbalance"] = local.imbalance(depth)
+        return jsonify(book)
+    except Exception as e:
+        logger.error(f"Error getting order book for {symbol}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+# Nazwy zasobów dostępnych w /api/batch -> endpointy GET
+BATCH_RESOURCES = {
+    "portfolio": "portfolio_status",
+    "environment_status": "environment_status",
+    "trading_status": "trading_status",
+    "trading_statistics": "trading_statistics",
+    "system_validation": "system_validation",
+    "system_metrics": "api_system_metrics",
+    "core_status": "core_status",
+    "core_strategies": "strategies_status",
+    "ai_models": "ai_models_status",
+    "core_system_metrics": "system_metrics",
+    "bot_activity": "get_bot_activity",
+    "bot_performance": "get_bot_performance",
+    "bot_logs": "get_bot_logs",
+    "bot_alerts": "get_bot_alerts",
+    "analytics_performance": "get_advanced_performance",
+    "strategy_performance": "get_strategy_performance",
+    "risk_metrics": "get_risk_metrics",
+    "market_data": "get_market_data",
+    "orderbook": "market_order_book",
+}
+
+@app.route('/api/batch', methods=['GET', 'POST'])
+def batch_resources():
+    """Several resources in one request, computed concurrently"""
+    try:
+        if request.method == 'POST':
+            payload = request.get_json(silent=True) or {}
+        else:
+            payload = {"resources": [r for r in request.args.get('resources', '').split(',') if r]}
+        items = parse_batch(payload)
+        timeout = min(float(payload.get("timeout", 10)) if isinstance(payload, dict) else 10.0, 30.0)
+        results = run_batch(app, items, BATCH_RESOURCES, timeout=timeout, headers=dict(request.headers))
+        return jsonify({
+            "success": True,
+            "results": results,
+            "timestamp": datetime.now().isoformat()
+        })
+    except BatchError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error running batch: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+STREAM_TICKER_SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT"]
+TICKER_FIELDS = ("lastPrice", "bid1Price", "ask1Price", "price24hPcnt", "volume24h")
+
+def _view_payload(view):
+    """Run an endpoint function in-process and return its JSON body without volatile timestamps"""
+    with app.test_request_context():
+        payload = app.make_response(view()).get_json()
+    return _strip_timestamps(payload)
+
+def _strip_timestamps(value):
+    # Timestamps change on every poll and would turn each poll into a delta
+    if isinstance(value, dict):
+        return {k: _strip_timestamps(v) for k, v in value.items() if k != "timestamp"}
+    if isinstance(value, list):
+        return [_strip_timestamps(v) for v in value]
+    return value
+
+def _stream_tickers():
+    manager = get_production_data_manager()
+    if manager is None:
+        return {}
+    tickers = {}
+    for symbol in STREAM_TICKER_SYMBOLS:
+        result = manager.get_market_data(symbol)
+        rows = (result.get("result") or result.get("data") or {}).get("list") or [{}]
+        tickers[symbol] = {field: rows[0].get(field) for field in TICKER_FIELDS if field in rows[0]}
+    return tickers
+
+def _stream_system():
+    sample = system_sampler.latest()
+    return {
+        "cpu_usage": sample.cpu_percent,
+        "memory_usage": sample.memory_percent,
+        "disk_usage": sample.disk_percent,
+    }
+
+# Jeden wątek na źródło danych, niezależnie od liczby podłączonych dashboardów
+event_hub = EventHub()
+event_producer = EventProducer(event_hub, [
+    PollingSource("portfolio", lambda: _view_payload(portfolio_status), interval=5),
+    PollingSource("bot_status", lambda: _view_payload(trading_status), interval=5),
+    PollingSource("alerts", lambda: _view_payload(get_bot_alerts), interval=5),
+    PollingSource("tickers", _stream_tickers, interval=5),
+    PollingSource("system", _stream_system, interval=system_sampler.interval),
+])
+
+@app.route('/api/stream')
+def event_stream():
+    """Server-Sent Events: snapshot of the requested topics, then deltas as they change"""
+    topics = [t for t in request.args.get('topics', '').split(',') if t] or None
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    event_producer.start()
+    return Response(
+        stream_with_context(sse_stream(event_hub, topics, last_event_id)),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Latency, error and payload metrics in Prometheus text format"""
+    return Response(api_metrics.render(), content_type=api_metrics.CONTENT_TYPE)
+
 @app.route('/api/cache/init')
 def init_cache():
     """Initialize cache by fetching fresh data - for troubleshooting"""
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+exchange_http_client.py
+-----------------------
+Pooled keep-alive HTTP client shared by every exchange call in the process.
+
+A bare ``requests.get`` opens a new TCP+TLS connection each time. This module
+keeps one ``requests.Session`` with a per-host connection pool, a retry and
+backoff policy for idempotent requests, and timing hooks that observers
+(metrics, recorders) can subscribe to. Components either call the client
+directly or share its session (``install_on_connector`` hands it to a
+BybitConnector instance, which already routes its v5 calls through
+``self.session``).
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 10  # seconds
+# 429 is deliberately absent: rate limiting is handled by the token bucket and
+# request scheduler, which must see every 429 and spend budget on each retry
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+# Called as hook(method, url, status_code, elapsed_seconds, error); status_code is
+# None and error is set when the request raised before a response arrived
+TimingHook = Callable[[str, str, Optional[int], float, Optional[BaseException]], None]
+
+
+class ExchangeHTTPClient:
+    """requests.Session wrapper with connection pooling, retries and timing hooks"""
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 32,
+                 max_retries: int = 3, backoff_factor: float = 0.3,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self._timing_hooks: List[TimingHook] = []
+        self._hooks_lock = threading.Lock()
+
+        # Only idempotent methods are retried automatically; an order POST
+        # must never be replayed behind the caller's back
+        retry_policy = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(["GET", "HEAD", "OPTIONS", "DELETE"]),
+            # urllib3 retries any 429/503 carrying Retry-After when this is on,
+            # forcelist or not, sleeping the caller's thread outside the budget
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,  # number of hosts kept in the pool
+            pool_maxsize=pool_maxsize,  # keep-alive connections per host
+            max_retries=retry_policy,
+        )
+
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+        # Fires for every response through the session, including requests
+        # made by components that were handed the session directly
+        self.session.hooks["response"].append(self._on_response)
+
+    def add_timing_hook(self, hook: TimingHook):
+        """Register a callback invoked after every request"""
+        with self._hooks_lock:
+            if hook not in self._timing_hooks:
+                self._timing_hooks.append(hook)
+
+    def remove_timing_hook(self, hook: TimingHook):
+        with self._hooks_lock:
+            if hook in self._timing_hooks:
+                self._timing_hooks.remove(hook)
+
+    def _emit(self, method: str, url: str, status_code: Optional[int], elapsed: float,
+              error: Optional[BaseException] = None):
+        for hook in list(self._timing_hooks):
+            try:
+                hook(method, url, status_code, elapsed, error)
+            except Exception as e:
+                logger.debug(f"HTTP timing hook failed: {e}")
+
+    def _on_response(self, response: requests.Response, *args, **kwargs):
+        request = response.request
+        self._emit(request.method, request.url, response.status_code, response.elapsed.total_seconds())
+        return response
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """Send a request over the pooled session, applying the default timeout"""
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            self._emit(method.upper(), url, None, time.perf_counter() - started, e)
+            raise
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_client: Optional[ExchangeHTTPClient] = None
+_client_lock = threading.Lock()
+
+
+def get_exchange_http_client() -> ExchangeHTTPClient:
+    """Process-wide pooled client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ExchangeHTTPClient()
+        return _client
+
+
+def install_on_connector(connector: Any, client: Optional[ExchangeHTTPClient] = None) -> Any:
+    """Make a BybitConnector (or anything with a ``session`` attribute) use the pooled session"""
+    client = client or get_exchange_http_client()
+    previous = getattr(connector, "session", None)
+    if previous is not None and getattr(previous, "proxies", None):
+        # A proxied connector keeps its own session rather than leaking proxies to everyone
+        logger.info("Connector uses proxies, keeping its dedicated session")
+        return connector
+    if previous is not None and previous is not client.session:
+        try:
+            previous.close()
+        except Exception:
+            pass
+    connector.session = client.session
+    return connector
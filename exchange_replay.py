@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+exchange_replay.py
+------------------
+Record exchange traffic and replay it from a local stand-in Bybit server.
+
+TrafficRecorder captures REST responses (through the pooled HTTP client's
+session) and raw WebSocket frames (through a multiplexer frame tap) into one
+gzip-compressed JSON-lines file. ReplayServer serves that file on localhost.
+It answers REST paths with the recorded bodies and streams the recorded
+frames to WebSocket clients that subscribe to their topics, at real time or
+N times faster. It can inject latency, 5xx errors and 429 rate limits from a
+seeded random generator, so a run is reproducible.
+
+Point the in-tree clients at a server with ``use_replay_server(server)``,
+which sets BYBIT_REST_BASE_URL and BYBIT_WS_BASE_URL. From the shell:
+
+    python exchange_replay.py serve traffic.jsonl.gz --speed 10 --rate-limit-rate 0.02
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that change on every call and must not affect matching
+VOLATILE_PARAMS = {"timestamp", "sign", "recv_window", "recvWindow", "api_key"}
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _request_key(method: str, url: str) -> Tuple[str, str, str]:
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query) if k not in VOLATILE_PARAMS)
+    return method.upper(), parts.path, urlencode(query)
+
+
+class TrafficRecorder:
+    """Appends REST exchanges and WebSocket frames to a gzip JSON-lines file"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = gzip.open(self.path, "at", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.count = 0
+
+    def _write(self, entry: Dict[str, Any]):
+        entry["t"] = round(time.monotonic() - self._started, 6)
+        line = json.dumps(entry, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self.count += 1
+
+    def record_rest(self, method: str, url: str, status: int, body: str, elapsed: float):
+        method, path, query = _request_key(method, url)
+        self._write({"k": "rest", "m": method, "p": path, "q": query, "s": status,
+                     "l": round(elapsed, 6), "b": body})
+
+    def record_frame(self, url: str, raw: Union[str, bytes]):
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        self._write({"k": "ws", "p": urlsplit(url).path, "f": raw})
+
+    def on_response(self, response, *args, **kwargs):
+        """requests response hook"""
+        try:
+            self.record_rest(response.request.method, response.request.url, response.status_code,
+                             response.text, response.elapsed.total_seconds())
+        except Exception as e:
+            logger.debug(f"Could not record response: {e}")
+        return response
+
+    def attach_http_client(self, client: Any):
+        """Record every response going through an ExchangeHTTPClient (or a bare Session)"""
+        session = getattr(client, "session", client)
+        session.hooks["response"].append(self.on_response)
+
+    def attach_multiplexer(self, multiplexer: Any):
+        multiplexer.add_frame_tap(self.record_frame)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@dataclass
+class RestEntry:
+    status: int
+    body: str
+    latency: float
+
+
+@dataclass
+class FrameEntry:
+    offset: float
+    frame: str
+    topic: Optional[str]
+
+
+@dataclass
+class Recording:
+    rest: Dict[Tuple[str, str, str], List[RestEntry]] = field(default_factory=lambda: defaultdict(list))
+    rest_by_path: Dict[Tuple[str, str], List[RestEntry]] = field(default_factory=lambda: defaultdict(list))
+    frames: Dict[str, List[FrameEntry]] = field(default_factory=lambda: defaultdict(list))
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "Recording":
+        recording = cls()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of an interrupted recording
+                if entry["k"] == "rest":
+                    item = RestEntry(entry["s"], entry["b"], entry.get("l", 0.0))
+                    recording.rest[(entry["m"], entry["p"], entry["q"])].append(item)
+                    recording.rest_by_path[(entry["m"], entry["p"])].append(item)
+                else:
+                    try:
+                        topic = json.loads(entry["f"]).get("topic")
+                    except ValueError:
+                        topic = None
+                    recording.frames[entry["p"]].append(FrameEntry(entry["t"], entry["f"], topic))
+        for frames in recording.frames.values():
+            frames.sort(key=lambda item: item.offset)
+        return recording
+
+
+def _encode_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    header = bytearray([0x80 | opcode])
+    n = len(payload)
+    if n < 126:
+        header.append(n)
+    elif n < 65536:
+        header.append(126)
+        header += struct.pack(">H", n)
+    else:
+        header.append(127)
+        header += struct.pack(">Q", n)
+    return bytes(header) + payload
+
+
+def _read_frame(rfile) -> Optional[Tuple[int, bytes]]:
+    head = rfile.read(2)
+    if len(head) < 2:
+        return None
+    opcode, length = head[0] & 0x0F, head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", rfile.read(8))[0]
+    mask = rfile.read(4) if head[1] & 0x80 else None
+    payload = rfile.read(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.headers.get("Upgrade", "").lower() == "websocket":
+            self.server.replay._serve_websocket(self)
+        else:
+            self.server.replay._serve_rest(self)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+        self.server.replay._serve_rest(self)
+
+    do_DELETE = do_POST
+
+
+class ReplayServer:
+    """Local HTTP + WebSocket server answering from a recording"""
+
+    def __init__(self, recording: Union[Recording, str, Path], host: str = "127.0.0.1", port: int = 0,
+                 speed: float = 1.0, latency_ms: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, seed: int = 0, loop: bool = False):
+        self.recording = recording if isinstance(recording, Recording) else Recording.load(recording)
+        self.speed = speed
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.loop = loop
+        self.stats = {"rest": 0, "errors": 0, "rate_limited": 0, "not_recorded": 0, "frames": 0}
+
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._cursors: Dict[Any, int] = defaultdict(int)
+        self._stopping = threading.Event()
+        self._sockets = set()
+        self._httpd = ThreadingHTTPServer((host, port), _ReplayHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.replay = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def ws_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"ws://{host}:{port}"
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="exchange-replay", daemon=True)
+        self._thread.start()
+        logger.info(f"Replay server on {self.base_url} (speed x{self.speed})")
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        for sock in list(self._sockets):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ------------------------------------------------------------------ REST
+
+    def _fault(self) -> Optional[int]:
+        with self._rng_lock:
+            roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 503
+        return None
+
+    def _next_rest(self, method: str, url: str) -> Optional[RestEntry]:
+        key = _request_key(method, url)
+        entries = self.recording.rest.get(key)
+        if not entries:
+            key = key[:2]
+            entries = self.recording.rest_by_path.get(key)
+        if not entries:
+            return None
+        # Cycle through the recorded answers in order, deterministically
+        with self._rng_lock:
+            index = self._cursors[key]
+            self._cursors[key] = index + 1
+        return entries[index % len(entries)]
+
+    def _serve_rest(self, handler: BaseHTTPRequestHandler):
+        self.stats["rest"] += 1
+        entry = self._next_rest(handler.command, handler.path)
+        delay = self.latency_ms / 1000 + (entry.latency / self.speed if entry else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+        fault = self._fault()
+        headers = {}
+        if fault == 429:
+            self.stats["rate_limited"] += 1
+            status, body = 429, json.dumps({"retCode": 10006, "retMsg": "Too many visits!"})
+            headers["Retry-After"] = "1"
+        elif fault:
+            self.stats["errors"] += 1
+            status, body = fault, json.dumps({"retCode": 10016, "retMsg": "Injected server error"})
+        elif entry is None:
+            self.stats["not_recorded"] += 1
+            status, body = 404, json.dumps({"retCode": 10001, "retMsg": f"Not recorded: {handler.path}"})
+        else:
+            status, body = entry.status, entry.body
+
+        payload = body.encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    # ------------------------------------------------------------- WebSocket
+
+    def _serve_websocket(self, handler: BaseHTTPRequestHandler):
+        key = handler.headers.get("Sec-WebSocket-Key", "")
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+        handler.send_response(101, "Switching Protocols")
+        handler.send_header("Upgrade", "websocket")
+        handler.send_header("Connection", "Upgrade")
+        handler.send_header("Sec-WebSocket-Accept", accept)
+        handler.end_headers()
+        handler.wfile.flush()
+        handler.close_connection = True
+
+        sock = handler.connection
+        self._sockets.add(sock)
+        send_lock = threading.Lock()
+        subscribed = set()
+        first_subscribe = threading.Event()
+        closed = threading.Event()
+
+        def send(payload: bytes, opcode: int = 0x1):
+            with send_lock:
+                handler.wfile.write(_encode_frame(payload, opcode))
+                handler.wfile.flush()
+
+        def read_client():
+            try:
+                while not closed.is_set():
+                    frame = _read_frame(handler.rfile)
+                    if frame is None or frame[0] == 0x8:
+                        break
+                    opcode, payload = frame
+                    if opcode == 0x9:
+                        send(payload, 0xA)
+                        continue
+                    if opcode != 0x1:
+                        continue
+                    request = json.loads(payload)
+                    op, args = request.get("op"), request.get("args") or []
+                    if op == "subscribe":
+                        subscribed.update(args)
+                        first_subscribe.set()
+                    elif op == "unsubscribe":
+                        subscribed.difference_update(args)
+                    reply = {"success": True, "ret_msg": "pong" if op == "ping" else "",
+                             "op": "pong" if op == "ping" else op, "req_id": request.get("req_id", "")}
+                    send(json.dumps(reply).encode())
+            except (OSError, ValueError):
+                pass
+            finally:
+                closed.set()
+
+        reader = threading.Thread(target=read_client, name="replay-ws-reader", daemon=True)
+        reader.start()
+
+        frames = self.recording.frames.get(urlsplit(handler.path).path, [])
+        try:
+            first_subscribe.wait(5)
+            while frames and not closed.is_set() and not self._stopping.is_set():
+                started, first = time.monotonic(), frames[0].offset
+                for item in frames:
+                    wait = (item.offset - first) / self.speed - (time.monotonic() - started)
+                    if wait > 0 and closed.wait(wait):
+                        break
+                    if item.topic in subscribed:
+                        send(item.frame.encode("utf-8"))
+                        self.stats["frames"] += 1
+                if not self.loop:
+                    break
+            closed.wait()  # keep the connection open until the client leaves
+        except OSError:
+            pass
+        finally:
+            closed.set()
+            self._sockets.discard(sock)
+
+
+def use_replay_server(server: ReplayServer):
+    """Point the in-tree REST and WebSocket clients at ``server``"""
+    os.environ["BYBIT_REST_BASE_URL"] = server.base_url
+    os.environ["BYBIT_WS_BASE_URL"] = server.ws_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded Bybit traffic from a local server")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="serve a recording")
+    serve.add_argument("recording")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--speed", type=float, default=1.0)
+    serve.add_argument("--latency-ms", type=float, default=0.0)
+    serve.add_argument("--error-rate", type=float, default=0.0)
+    serve.add_argument("--rate-limit-rate", type=float, default=0.0)
+    serve.add_argument("--seed", type=int, default=0)
+    serve.add_argument("--loop", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = ReplayServer(args.recording, args.host, args.port, args.speed, args.latency_ms,
+                          args.error_rate, args.rate_limit_rate, args.seed, args.loop).start()
+    print(f"BYBIT_REST_BASE_URL={server.base_url}")
+    print(f"BYBIT_WS_BASE_URL={server.ws_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+exchange_request_scheduler.py
+-----------------------------
+Non-blocking request scheduler for exchange calls.
+
+BybitConnector paces itself by sleeping in the caller's thread: a fixed 50 ms
+before every request, and up to 300 s when it has been rate limited. The
+scheduler replaces that with a queue. Callers submit a request and get a
+Future back immediately (or a TryLater answer if they do not want to queue).
+A dispatcher thread sends queued requests as soon as the shared rate budget
+allows, highest-priority lane first, so order placement and cancels overtake
+dashboard reads. Rate-limit answers from the exchange pause the budget and
+re-queue the request instead of blocking whoever made the call.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, Optional, Union
+
+from rate_budget import TokenBucket, get_exchange_rate_budget
+
+logger = logging.getLogger(__name__)
+
+# Bybit retCodes meaning "slow down"
+RATE_LIMIT_RET_CODES = {10006, 10018}
+
+
+class RequestLane(Enum):
+    """Dispatch priority; lower value is sent first"""
+    ORDERS = 0        # order placement and cancels
+    ACCOUNT = 1       # balances, positions, order status
+    MARKET_DATA = 2   # tickers, klines, order books
+    DASHBOARD = 3     # UI refreshes that can always wait
+
+
+@dataclass
+class TryLater:
+    """Returned by try_submit instead of queueing when the request cannot go out soon"""
+    retry_after: float
+    reason: str
+
+
+@dataclass(order=True)
+class _QueuedRequest:
+    priority: int
+    sequence: int
+    fn: Callable = field(compare=False)
+    args: tuple = field(compare=False)
+    kwargs: dict = field(compare=False)
+    future: Future = field(compare=False)
+    lane: RequestLane = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+class ExchangeRequestScheduler:
+    """Priority queue of exchange requests dispatched under a shared token bucket"""
+
+    def __init__(self, rate_budget: Optional[TokenBucket] = None, max_workers: int = 8,
+                 max_queue: int = 1000, max_rate_limit_retries: int = 3,
+                 rate_limit_backoff: float = 1.0):
+        self.rate_budget = rate_budget or get_exchange_rate_budget()
+        self.max_queue = max_queue
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.rate_limit_backoff = rate_limit_backoff
+
+        self._queue = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="exchange-request")
+        self._running = True
+        self.stats = {"submitted": 0, "dispatched": 0, "rate_limited": 0, "rejected": 0}
+
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="exchange-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, fn: Callable, *args: Any, lane: RequestLane = RequestLane.DASHBOARD,
+               **kwargs: Any) -> Future:
+        """Queue a call and return its Future; never waits for the rate budget"""
+        future = Future()
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.stats["rejected"] += 1
+                future.set_exception(RuntimeError("Exchange request queue is full"))
+                return future
+            self._push(_QueuedRequest(lane.value, next(self._sequence), fn, args, kwargs, future, lane))
+            self.stats["submitted"] += 1
+        return future
+
+    def try_submit(self, fn: Callable, *args: Any, lane: RequestLane = RequestLane.DASHBOARD,
+                   max_delay: float = 0.0, **kwargs: Any) -> Union[Future, TryLater]:
+        """Queue a call only if it is expected to go out within ``max_delay`` seconds"""
+        estimated = self.estimated_delay(lane)
+        if estimated > max_delay:
+            with self._cond:
+                self.stats["rejected"] += 1
+            return TryLater(retry_after=estimated, reason="rate budget exhausted")
+        return self.submit(fn, *args, lane=lane, **kwargs)
+
+    def call(self, fn: Callable, *args: Any, lane: RequestLane = RequestLane.DASHBOARD,
+             timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """Submit and wait for the result"""
+        return self.submit(fn, *args, lane=lane, **kwargs).result(timeout=timeout)
+
+    def estimated_delay(self, lane: RequestLane) -> float:
+        """Rough wait before a new request in ``lane`` would be dispatched"""
+        with self._cond:
+            ahead = sum(1 for item in self._queue if item.priority <= lane.value)
+        return self.rate_budget.wait_time(ahead + 1)
+
+    def queue_depth(self) -> Dict[str, int]:
+        with self._cond:
+            depth = {lane.name: 0 for lane in RequestLane}
+            for item in self._queue:
+                depth[item.lane.name] += 1
+            return depth
+
+    def shutdown(self, wait: bool = True):
+        with self._cond:
+            self._running = False
+            pending, self._queue = self._queue, []
+            self._cond.notify_all()
+        for item in pending:
+            item.future.cancel()
+        self._workers.shutdown(wait=wait)
+
+    def _push(self, item: _QueuedRequest):
+        heapq.heappush(self._queue, item)
+        self._cond.notify()
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                wait = self.rate_budget.wait_time()
+                if wait > 0:
+                    # Woken early if something new arrives; re-evaluate then
+                    self._cond.wait(wait)
+                    continue
+                if not self.rate_budget.try_acquire():
+                    continue
+                item = heapq.heappop(self._queue)
+            if item.future.set_running_or_notify_cancel():
+                with self._cond:
+                    self.stats["dispatched"] += 1
+                self._workers.submit(self._run, item)
+
+    def _run(self, item: _QueuedRequest):
+        try:
+            result = item.fn(*item.args, **item.kwargs)
+        except Exception as e:
+            if self._is_rate_limited(e) and self._requeue(item):
+                return
+            item.future.set_exception(e)
+            return
+        if self._is_rate_limited(result) and self._requeue(item):
+            return
+        item.future.set_result(result)
+
+    def _requeue(self, item: _QueuedRequest) -> bool:
+        """Pause the budget and put a rate-limited request back at the front of its lane"""
+        with self._cond:
+            self.stats["rate_limited"] += 1
+        item.attempts += 1
+        if item.attempts > self.max_rate_limit_retries:
+            return False
+        self.rate_budget.block_for(self.rate_limit_backoff * 2 ** (item.attempts - 1))
+        # A fresh future is needed because the running one cannot go back to pending
+        retry = _QueuedRequest(item.priority, -next(self._sequence), item.fn, item.args, item.kwargs,
+                               Future(), item.lane, item.attempts)
+        retry.future.add_done_callback(lambda f: _copy_future(f, item.future))
+        with self._cond:
+            if not self._running:
+                return False
+            self._push(retry)
+        logger.warning(f"Exchange rate limit hit, re-queued {getattr(item.fn, '__name__', item.fn)} "
+                       f"(attempt {item.attempts})")
+        return True
+
+    @staticmethod
+    def _is_rate_limited(outcome: Any) -> bool:
+        if isinstance(outcome, dict):
+            return outcome.get("retCode") in RATE_LIMIT_RET_CODES
+        response = getattr(outcome, "response", None)
+        return getattr(response, "status_code", None) == 429
+
+
+def _copy_future(source: Future, target: Future):
+    if source.cancelled():
+        # The original is already running and can no longer be cancelled
+        target.set_exception(CancelledError())
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+# Connector methods that must never wait behind reads
+ORDER_METHODS = {"place_order", "cancel_order", "amend_order", "cancel_all_orders"}
+ACCOUNT_METHODS = {"get_account_balance", "get_wallet_balance", "get_positions", "get_order_status"}
+MARKET_DATA_METHODS = {"get_server_time", "get_ticker", "get_klines", "get_order_book"}
+# Only these hit the REST API; everything else (WebSocket subscriptions, helpers) is called directly
+REST_METHODS = ORDER_METHODS | ACCOUNT_METHODS | MARKET_DATA_METHODS
+
+
+class ScheduledConnector:
+    """
+    Proxy that routes BybitConnector calls through the scheduler.
+
+    Calling one of ``REST_METHODS`` keeps the connector's blocking signature
+    (the call waits for its own result only); any other attribute is the
+    connector's own. ``submit`` returns a Future and ``try_submit`` may
+    return TryLater. The connector's own fixed sleeps are disabled on the
+    wrapped instance because the scheduler now owns pacing.
+    """
+
+    def __init__(self, connector: Any, scheduler: Optional["ExchangeRequestScheduler"] = None,
+                 default_lane: RequestLane = RequestLane.MARKET_DATA, timeout: Optional[float] = 30):
+        self._connector = connector
+        self._scheduler = scheduler or get_exchange_scheduler()
+        self._default_lane = default_lane
+        self._timeout = timeout
+        for pacing_method in ("_apply_rate_limit", "_handle_rate_limit"):
+            if hasattr(connector, pacing_method):
+                setattr(connector, pacing_method, lambda *a, **kw: None)
+
+    @property
+    def connector(self) -> Any:
+        return self._connector
+
+    def lane_for(self, method_name: str) -> RequestLane:
+        if method_name in ORDER_METHODS:
+            return RequestLane.ORDERS
+        if method_name in ACCOUNT_METHODS and self._default_lane != RequestLane.DASHBOARD:
+            return RequestLane.ACCOUNT
+        return self._default_lane
+
+    def submit(self, method_name: str, *args: Any, lane: Optional[RequestLane] = None, **kwargs: Any) -> Future:
+        method = getattr(self._connector, method_name)
+        return self._scheduler.submit(method, *args, lane=lane or self.lane_for(method_name), **kwargs)
+
+    def try_submit(self, method_name: str, *args: Any, lane: Optional[RequestLane] = None,
+                   max_delay: float = 0.0, **kwargs: Any) -> Union[Future, TryLater]:
+        method = getattr(self._connector, method_name)
+        return self._scheduler.try_submit(method, *args, lane=lane or self.lane_for(method_name),
+                                          max_delay=max_delay, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._connector, name)
+        if name not in REST_METHODS or not callable(attribute):
+            return attribute
+
+        def scheduled(*args, **kwargs):
+            return self.submit(name, *args, **kwargs).result(timeout=self._timeout)
+
+        scheduled.__name__ = name
+        return scheduled
+
+
+_scheduler: Optional[ExchangeRequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_exchange_scheduler() -> ExchangeRequestScheduler:
+    """Process-wide scheduler sharing the exchange rate budget"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ExchangeRequestScheduler()
+        return _scheduler
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+historical_data_downloader.py
+-----------------------------
+Parallel paginated download of Bybit kline history.
+
+The /v5/market/kline endpoint returns at most 1000 candles per request, so
+long ranges have to be paged. HistoricalDataDownloader splits [start, end]
+into page-sized time windows, fetches the windows concurrently while drawing
+from the shared exchange rate budget, then merges the pages into a single
+DataFrame de-duplicated by timestamp. Every completed page is appended to a
+checkpoint file, so an interrupted download resumes with the missing pages
+only.
+"""
+
+import json
+import logging
+import numbers
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import requests
+
+from exchange_http_client import get_exchange_http_client
+from kline_parser import KLINE_FIELDS, klines_to_arrays, loads
+from rate_budget import TokenBucket, get_exchange_rate_budget
+
+logger = logging.getLogger(__name__)
+
+BYBIT_BASE_URL = "https://api.bybit.com"
+BYBIT_TESTNET_URL = "https://api-testnet.bybit.com"
+KLINE_ENDPOINT = "/v5/market/kline"
+MAX_PAGE_SIZE = 1000
+
+KLINE_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume", "turnover"]
+
+_MINUTE_MS = 60 * 1000
+
+# Bybit interval code -> candle length in milliseconds
+BYBIT_INTERVAL_MS = {
+    "1": _MINUTE_MS,
+    "3": 3 * _MINUTE_MS,
+    "5": 5 * _MINUTE_MS,
+    "15": 15 * _MINUTE_MS,
+    "30": 30 * _MINUTE_MS,
+    "60": 60 * _MINUTE_MS,
+    "120": 120 * _MINUTE_MS,
+    "240": 240 * _MINUTE_MS,
+    "360": 360 * _MINUTE_MS,
+    "720": 720 * _MINUTE_MS,
+    "D": 24 * 60 * _MINUTE_MS,
+    "W": 7 * 24 * 60 * _MINUTE_MS,
+}
+
+TimeLike = Union[int, float, str, datetime, pd.Timestamp]
+
+
+def to_bybit_interval(interval: str) -> str:
+    """Convert dashboard-style intervals ("1m", "1h", "1d") to Bybit codes ("1", "60", "D")"""
+    if interval in BYBIT_INTERVAL_MS:
+        return interval
+    if interval.endswith("m"):
+        return interval[:-1]
+    if interval.endswith("h"):
+        return str(int(interval[:-1]) * 60)
+    if interval.lower() in ("1d", "d"):
+        return "D"
+    if interval.lower() in ("1w", "w"):
+        return "W"
+    raise ValueError(f"Unsupported interval: {interval}")
+
+
+def interval_to_ms(interval: str) -> int:
+    """Candle length in milliseconds for a dashboard-style or Bybit interval"""
+    code = to_bybit_interval(interval)
+    if code not in BYBIT_INTERVAL_MS:
+        raise ValueError(f"Unsupported interval: {interval}")
+    return BYBIT_INTERVAL_MS[code]
+
+
+def to_milliseconds(value: TimeLike) -> int:
+    """Epoch milliseconds for a datetime, date string or epoch (s or ms) number"""
+    # numbers.Real also covers NumPy scalars (e.g. a value taken from a timestamp column),
+    # which pd.Timestamp would otherwise read as nanoseconds
+    if isinstance(value, numbers.Real):
+        # Treat small numbers as seconds
+        return int(value if value > 1e11 else value * 1000)
+    return int(pd.Timestamp(value).value // 1_000_000)
+
+
+def plan_windows(start_ms: int, end_ms: int, interval_ms: int,
+                 page_size: int = MAX_PAGE_SIZE) -> List[Tuple[int, int]]:
+    """Split [start_ms, end_ms] into inclusive windows of at most ``page_size`` candles"""
+    if end_ms < start_ms:
+        return []
+    span = interval_ms * page_size
+    windows = []
+    window_start = start_ms - (start_ms % interval_ms)
+    while window_start <= end_ms:
+        window_end = min(end_ms, window_start + span - 1)
+        windows.append((window_start, window_end))
+        window_start += span
+    return windows
+
+
+class DownloadCheckpoint:
+    """Append-only JSON-lines file of completed pages for one download"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[Tuple[int, int], List[list]]:
+        """Completed pages keyed by window; a torn last line from a crash is ignored"""
+        pages = {}
+        if not self.path.exists():
+            return pages
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                pages[tuple(entry["window"])] = entry["rows"]
+        return pages
+
+    def append(self, window: Tuple[int, int], rows: List[list]):
+        line = json.dumps({"window": list(window), "rows": rows}, separators=(",", ":"))
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def remove(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class HistoricalDataDownloader:
+    """Downloads arbitrary kline ranges by fetching page-sized windows in parallel"""
+
+    def __init__(self, use_testnet: bool = False, category: str = "spot",
+                 page_size: int = MAX_PAGE_SIZE, max_workers: Optional[int] = None,
+                 rate_budget: Optional[TokenBucket] = None,
+                 checkpoint_dir: Union[str, Path] = "data/cache/klines",
+                 session: Optional[requests.Session] = None,
+                 timeout: float = 10, max_retries: int = 3, base_url: Optional[str] = None):
+        # BYBIT_REST_BASE_URL points downloads at another host, e.g. a local replay server
+        self.base_url = (base_url or os.getenv("BYBIT_REST_BASE_URL")
+                         or (BYBIT_TESTNET_URL if use_testnet else BYBIT_BASE_URL))
+        self.category = category
+        self.page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        self.rate_budget = rate_budget or get_exchange_rate_budget()
+        # Enough workers to keep the rate budget saturated while requests are in flight
+        self.max_workers = max_workers or max(2, self.rate_budget.capacity)
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.session = session or get_exchange_http_client().session
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def _checkpoint_for(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> DownloadCheckpoint:
+        name = f"{self.category}_{symbol}_{interval}_{start_ms}_{end_ms}.jsonl"
+        return DownloadCheckpoint(self.checkpoint_dir / name)
+
+    def fetch_window(self, symbol: str, interval: str, window: Tuple[int, int]) -> List[list]:
+        """Fetch one page of raw kline rows for an inclusive [start, end] window"""
+        params = {
+            "category": self.category,
+            "symbol": symbol,
+            "interval": interval,
+            "start": window[0],
+            "end": window[1],
+            "limit": self.page_size,
+        }
+        url = f"{self.base_url}{KLINE_ENDPOINT}"
+
+        for attempt in range(1, self.max_retries + 1):
+            self.rate_budget.acquire()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                if response.status_code == 429:
+                    retry_after = float(response.headers.get("Retry-After", 1))
+                    self.rate_budget.block_for(retry_after)
+                    logger.warning(f"Kline page {window} rate limited, backing off {retry_after}s")
+                    continue
+                response.raise_for_status()
+                data = loads(response.content)
+                if data.get("retCode") == 10006:  # Bybit: too many visits
+                    self.rate_budget.block_for(1.0)
+                    continue
+                if data.get("retCode") != 0:
+                    raise RuntimeError(f"Bybit kline error {data.get('retCode')}: {data.get('retMsg')}")
+                return data.get("result", {}).get("list", [])
+            except (requests.exceptions.RequestException, ValueError, RuntimeError) as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"Kline page {window} failed (attempt {attempt}/{self.max_retries}): {e}")
+                time.sleep(0.5 * 2 ** (attempt - 1))
+
+        raise RuntimeError(f"Kline page {window} still rate limited after {self.max_retries} attempts")
+
+    def download(self, symbol: str, interval: str, start: TimeLike, end: TimeLike,
+                 resume: bool = True, keep_checkpoint: bool = False) -> pd.DataFrame:
+        """
+        Download all candles for ``symbol`` between ``start`` and ``end`` (inclusive).
+
+        Returns a DataFrame with KLINE_COLUMNS sorted by timestamp, with
+        ``timestamp`` converted to datetime like MarketDataFetcher.fetch_data.
+        Raises if any page still fails after retries; pages fetched so far
+        stay in the checkpoint so calling again only fetches the rest.
+        """
+        bybit_interval = to_bybit_interval(interval)
+        start_ms, end_ms = to_milliseconds(start), to_milliseconds(end)
+        windows = plan_windows(start_ms, end_ms, BYBIT_INTERVAL_MS[bybit_interval], self.page_size)
+
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        checkpoint = self._checkpoint_for(symbol, bybit_interval, start_ms, end_ms)
+        pages = checkpoint.load() if resume else {}
+        if not resume:
+            checkpoint.remove()
+        pending = [w for w in windows if w not in pages]
+
+        if pages:
+            logger.info(f"Resuming {symbol} {interval} download: {len(pages)}/{len(windows)} pages cached")
+
+        errors = []
+        if pending:
+            started = time.time()
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending)),
+                                    thread_name_prefix="kline-page") as pool:
+                futures = {pool.submit(self.fetch_window, symbol, bybit_interval, w): w for w in pending}
+                for future in as_completed(futures):
+                    window = futures[future]
+                    try:
+                        rows = future.result()
+                    except Exception as e:
+                        errors.append((window, e))
+                        continue
+                    pages[window] = rows
+                    checkpoint.append(window, rows)
+            elapsed = time.time() - started
+            logger.info(f"Fetched {len(pending) - len(errors)} kline pages for {symbol} in {elapsed:.2f}s "
+                        f"({(len(pending) - len(errors)) / max(elapsed, 1e-9):.1f} req/s)")
+
+        if errors:
+            window, error = errors[0]
+            raise RuntimeError(f"{len(errors)} kline pages failed for {symbol}, first {window}: {error}")
+
+        df = self._merge_pages(pages.values(), start_ms, end_ms)
+        if not keep_checkpoint:
+            checkpoint.remove()
+        return df
+
+    @staticmethod
+    def _merge_pages(pages, start_ms: int, end_ms: int) -> pd.DataFrame:
+        """Concatenate pages, drop rows outside the range and duplicates by timestamp"""
+        rows = [row for page in pages for row in page]
+        if not rows:
+            return pd.DataFrame(columns=KLINE_COLUMNS)
+
+        timestamps, values = klines_to_arrays(rows)
+        in_range = (timestamps >= start_ms) & (timestamps <= end_ms)
+        timestamps, values = timestamps[in_range], values[in_range]
+
+        order = np.argsort(timestamps, kind="stable")
+        timestamps, values = timestamps[order], values[order]
+        # Keep the last copy of a timestamp that appears on two pages
+        last = np.append(timestamps[1:] != timestamps[:-1], True) if len(timestamps) else timestamps.astype(bool)
+
+        df = pd.DataFrame(values[last], columns=KLINE_FIELDS, copy=False)
+        df.insert(0, "timestamp", pd.to_datetime(timestamps[last], unit="ms"))
+        return df
+
+
+def download_history(symbol: str, interval: str, start: TimeLike, end: TimeLike,
+                     use_testnet: Optional[bool] = None, **kwargs) -> pd.DataFrame:
+    """Convenience wrapper using the production/testnet switch from the environment"""
+    if use_testnet is None:
+        use_testnet = os.getenv("BYBIT_PRODUCTION_ENABLED", "").lower() != "true"
+    return HistoricalDataDownloader(use_testnet=use_testnet, **kwargs).download(symbol, interval, start, end)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+kline_parser.py
+---------------
+Direct-to-NumPy parsing of Bybit /v5/market/kline responses.
+
+MarketDataFetcher.fetch_data builds a dict with six ``float()`` calls per row,
+makes a DataFrame from the list of dicts, sorts it and only then converts the
+timestamps. Here the ``result.list`` rows go straight into one preallocated
+float64 block, which NumPy fills with its C string-to-float conversion. The
+timestamp column becomes int64 milliseconds, and the DataFrame wraps
+reversed views of the block (Bybit returns newest first), so sorting never
+copies. orjson is used to decode the body when it is installed.
+"""
+
+import json
+from typing import Any, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+KLINE_FIELDS = ["open", "high", "low", "close", "volume", "turnover"]
+
+
+def loads(raw: Union[bytes, str]) -> Any:
+    """Decode JSON with orjson when available, falling back to the standard library"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def klines_to_arrays(rows: Sequence[Sequence[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert raw kline rows to ``(timestamps_ms int64[n], values float64[n, 6])``.
+
+    Rows keep the API order; values columns follow KLINE_FIELDS and a missing
+    turnover column is filled with 0.
+    """
+    n = len(rows)
+    block = np.zeros((n, 7), dtype=np.float64)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), block[:, 1:]
+    width = len(rows[0])
+    if width >= 7:
+        block[:] = rows if width == 7 else [row[:7] for row in rows]
+    else:
+        block[:, :width] = rows
+    # Millisecond epochs are < 2**53, so the float64 round trip is exact
+    return block[:, 0].astype(np.int64), block[:, 1:]
+
+
+def klines_to_frame(rows: Sequence[Sequence[str]], newest_first: bool = True) -> pd.DataFrame:
+    """
+    DataFrame with ``timestamp`` (datetime64) and KLINE_FIELDS, oldest candle first.
+
+    Bybit lists candles newest first; pass ``newest_first=False`` for rows
+    that are already chronological.
+    """
+    timestamps, values = klines_to_arrays(rows)
+    if newest_first:
+        timestamps, values = timestamps[::-1], values[::-1]
+    df = pd.DataFrame(values, columns=KLINE_FIELDS, copy=False)
+    df.insert(0, "timestamp", pd.to_datetime(timestamps, unit="ms"))
+    return df
+
+
+def parse_kline_response(raw: Union[bytes, str, dict]) -> pd.DataFrame:
+    """Parse a whole kline response body (bytes, text or already-decoded dict)"""
+    data = raw if isinstance(raw, dict) else loads(raw)
+    rows: List[list] = (data.get("result") or {}).get("list") or []
+    return klines_to_frame(rows)
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+local_order_book.py
+-------------------
+Local L2 order book maintained from Bybit WebSocket snapshot and delta messages.
+
+BybitConnector._process_orderbook_update turns every message into fresh lists
+of ``[float, float]``, and consumers then poll ``get_order_book`` over REST.
+LocalOrderBook keeps each side as two parallel price-sorted arrays and applies
+the ``orderbook.{depth}.{symbol}`` stream in place: a binary search per level
+change, best bid/ask read from the end of the arrays, and depth views that
+index into the live arrays instead of copying them. Update ids are checked so
+a missed delta marks the book out of sync until the next snapshot; deltas
+arriving in the meantime are dropped.
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SequenceGapError(Exception):
+    """A delta arrived that does not follow the last applied update id"""
+
+
+class BookSide:
+    """
+    One side of the book as parallel ``keys``/``sizes`` arrays sorted ascending.
+
+    Bids use the price as key and asks the negated price, so on both sides the
+    best level is the last element. Top-of-book churn therefore inserts and
+    deletes near the end of the arrays, where list shifts are cheapest.
+    """
+
+    __slots__ = ("is_bid", "keys", "sizes")
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self.keys: List[float] = []
+        self.sizes: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _key(self, price: float) -> float:
+        return price if self.is_bid else -price
+
+    def price_at(self, level: int) -> float:
+        """Price of the ``level``-th best level (0 = best)"""
+        key = self.keys[-1 - level]
+        return key if self.is_bid else -key
+
+    def size_at(self, level: int) -> float:
+        return self.sizes[-1 - level]
+
+    def set_level(self, price: float, size: float):
+        """Insert, replace or (size 0) delete a price level"""
+        key = self._key(price)
+        keys = self.keys
+        i = bisect_left(keys, key)
+        found = i < len(keys) and keys[i] == key
+        if size == 0:
+            if found:
+                del keys[i]
+                del self.sizes[i]
+        elif found:
+            self.sizes[i] = size
+        else:
+            keys.insert(i, key)
+            self.sizes.insert(i, size)
+
+    def replace(self, levels: Iterable[Tuple[float, float]]):
+        """Load a full snapshot"""
+        pairs = sorted((self._key(p), s) for p, s in levels if s != 0)
+        self.keys = [k for k, _ in pairs]
+        self.sizes = [s for _, s in pairs]
+
+    def size_for_price(self, price: float) -> float:
+        key = self._key(price)
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.sizes[i]
+        return 0.0
+
+
+class DepthView:
+    """
+    Read-only view of the best ``depth`` levels of one side, best first.
+
+    The view indexes straight into the book's arrays, so it reflects later
+    updates and costs nothing to create. Read it on the thread that applies
+    updates or while holding ``LocalOrderBook.lock``; use
+    ``LocalOrderBook.snapshot`` for a stable copy.
+    """
+
+    __slots__ = ("_side", "_depth")
+
+    def __init__(self, side: BookSide, depth: int):
+        self._side = side
+        self._depth = depth
+
+    def __len__(self) -> int:
+        return min(self._depth, len(self._side))
+
+    def __getitem__(self, level: int) -> Tuple[float, float]:
+        if level < 0:
+            level += len(self)
+        if not 0 <= level < len(self):
+            raise IndexError("depth level out of range")
+        return self._side.price_at(level), self._side.size_at(level)
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        for level in range(len(self)):
+            yield self[level]
+
+    def total_size(self) -> float:
+        n = len(self)
+        return sum(self._side.sizes[len(self._side.sizes) - n:]) if n else 0.0
+
+    def to_list(self) -> List[List[float]]:
+        return [[price, size] for price, size in self]
+
+
+class LocalOrderBook:
+    """L2 book for one symbol built from Bybit ``orderbook`` topic messages"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.update_id: Optional[int] = None
+        self.seq: Optional[int] = None
+        self.timestamp: Optional[int] = None  # exchange ms timestamp of the last message
+        self.synced = False
+        self.resync_pending = False  # a gap was reported; waiting for its snapshot
+        self.lock = threading.RLock()
+
+    # ------------------------------------------------------------------ updates
+
+    def apply_snapshot(self, bids: Iterable, asks: Iterable, update_id: Optional[int] = None,
+                       seq: Optional[int] = None, timestamp: Optional[int] = None):
+        with self.lock:
+            self.bids.replace((float(p), float(s)) for p, s in bids)
+            self.asks.replace((float(p), float(s)) for p, s in asks)
+            self.update_id = update_id
+            self.seq = seq
+            self.timestamp = timestamp
+            self.synced = True
+            self.resync_pending = False
+
+    def apply_delta(self, bids: Iterable, asks: Iterable, update_id: Optional[int] = None,
+                    seq: Optional[int] = None, timestamp: Optional[int] = None) -> bool:
+        """
+        Apply changed levels (size "0" deletes a level).
+
+        Returns False for a stale or duplicate delta, which is ignored. Raises
+        SequenceGapError once when ``update_id`` skips ahead (or a delta comes
+        before any snapshot); later deltas are dropped, returning False, until
+        the next snapshot.
+        """
+        with self.lock:
+            if not self.synced:
+                if self.resync_pending:
+                    return False
+                self.resync_pending = True
+                raise SequenceGapError(f"{self.symbol}: delta received before snapshot")
+            if update_id is not None and self.update_id is not None:
+                if update_id <= self.update_id:
+                    return False
+                if update_id != self.update_id + 1:
+                    self.synced = False
+                    self.resync_pending = True
+                    raise SequenceGapError(
+                        f"{self.symbol}: expected update {self.update_id + 1}, got {update_id}"
+                    )
+            set_bid = self.bids.set_level
+            for price, size in bids:
+                set_bid(float(price), float(size))
+            set_ask = self.asks.set_level
+            for price, size in asks:
+                set_ask(float(price), float(size))
+            self.update_id = update_id
+            if seq is not None:
+                self.seq = seq
+            self.timestamp = timestamp
+            return True
+
+    def apply_message(self, message: Dict[str, Any]) -> bool:
+        """Apply a decoded Bybit v5 ``orderbook`` WebSocket message"""
+        data = message.get("data") or {}
+        timestamp = message.get("ts")
+        update_id = data.get("u")
+        # Bybit sends u == 1 as a snapshot after a service restart
+        if message.get("type") == "snapshot" or update_id == 1:
+            self.apply_snapshot(data.get("b", ()), data.get("a", ()), update_id, data.get("seq"), timestamp)
+            return True
+        return self.apply_delta(data.get("b", ()), data.get("a", ()), update_id, data.get("seq"), timestamp)
+
+    # ------------------------------------------------------------------- reads
+
+    def best_bid(self) -> Optional[Tuple[float, float]]:
+        side = self.bids
+        return (side.keys[-1], side.sizes[-1]) if side.keys else None
+
+    def best_ask(self) -> Optional[Tuple[float, float]]:
+        side = self.asks
+        return (-side.keys[-1], side.sizes[-1]) if side.keys else None
+
+    def mid_price(self) -> Optional[float]:
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
+
+    def spread(self) -> Optional[float]:
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def microprice(self) -> Optional[float]:
+        """Top-of-book price weighted towards the side with less resting size"""
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return None
+        total = bid[1] + ask[1]
+        if total <= 0:
+            return (bid[0] + ask[0]) / 2
+        return (bid[0] * ask[1] + ask[0] * bid[1]) / total
+
+    def imbalance(self, depth: int = 1) -> Optional[float]:
+        """(bid size - ask size) / total over the best ``depth`` levels, in [-1, 1]"""
+        bid_size = self.bid_depth(depth).total_size()
+        ask_size = self.ask_depth(depth).total_size()
+        total = bid_size + ask_size
+        if total <= 0:
+            return None
+        return (bid_size - ask_size) / total
+
+    def bid_depth(self, depth: int) -> DepthView:
+        return DepthView(self.bids, depth)
+
+    def ask_depth(self, depth: int) -> DepthView:
+        return DepthView(self.asks, depth)
+
+    def size_at(self, price: float, is_bid: bool) -> float:
+        return (self.bids if is_bid else self.asks).size_for_price(price)
+
+    def snapshot(self, depth: int = 10) -> Dict[str, Any]:
+        """Copy of the top ``depth`` levels in the ``get_order_book`` response format"""
+        with self.lock:
+            return {
+                "symbol": self.symbol,
+                "bids": self.bid_depth(depth).to_list(),
+                "asks": self.ask_depth(depth).to_list(),
+                "timestamp": self.timestamp,
+                "update_id": self.update_id,
+                "synced": self.synced,
+                "source": "local_book",
+            }
+
+
+class OrderBookManager:
+    """
+    Routes ``orderbook`` topic messages to per-symbol LocalOrderBooks.
+
+    ``on_message`` matches the connector's WebSocket callback signature. When a
+    sequence gap is detected the optional ``resync`` callback is invoked with
+    the symbol (e.g. to resubscribe, which makes Bybit send a fresh snapshot),
+    once per gap: deltas that follow are dropped until that snapshot arrives.
+    """
+
+    def __init__(self, resync: Optional[Callable[[str], None]] = None):
+        self.books: Dict[str, LocalOrderBook] = {}
+        self.resync = resync
+        self.gap_count = 0
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[LocalOrderBook], None]] = []
+        self._stream_readers: Dict[str, Any] = {}  # symbol -> multiplexer TopicReader
+
+    def book(self, symbol: str) -> LocalOrderBook:
+        book = self.books.get(symbol)
+        if book is None:
+            with self._lock:
+                book = self.books.setdefault(symbol, LocalOrderBook(symbol))
+        return book
+
+    def get(self, symbol: str) -> Optional[LocalOrderBook]:
+        """Book for ``symbol`` if it has been synced from a snapshot"""
+        book = self.books.get(symbol)
+        return book if book is not None and book.synced else None
+
+    def add_listener(self, listener: Callable[[LocalOrderBook], None]):
+        """Called with the book after each applied update"""
+        self._listeners.append(listener)
+
+    def on_message(self, message: Dict[str, Any]):
+        topic = message.get("topic", "")
+        symbol = (message.get("data") or {}).get("s") or topic.rsplit(".", 1)[-1]
+        if not symbol:
+            return
+        book = self.book(symbol)
+        try:
+            applied = book.apply_message(message)
+        except SequenceGapError as e:
+            self.gap_count += 1
+            logger.warning(f"Order book out of sync: {e}")
+            if self.resync:
+                try:
+                    self.resync(symbol)
+                except Exception as resync_error:
+                    logger.error(f"Order book resync for {symbol} failed: {resync_error}")
+            return
+        if applied:
+            for listener in self._listeners:
+                try:
+                    listener(book)
+                except Exception as e:
+                    logger.debug(f"Order book listener failed: {e}")
+
+    def subscribe(self, connector: Any, symbols: Iterable[str]):
+        """Subscribe the connector's orderbook stream for ``symbols`` into this manager"""
+        for symbol in symbols:
+            self.book(symbol)
+            connector.subscribe_to_orderbook(symbol, self.on_message)
+
+    def subscribe_stream(self, multiplexer: Any, symbols: Iterable[str], depth: int = 50):
+        """
+        Feed the books from a shared WebSocketMultiplexer.
+
+        If a consumer falls far enough behind that its ring overwrites deltas,
+        the update id check catches the gap. The topic is then resubscribed
+        once for a fresh snapshot and the consumer skips its stale backlog, so
+        it reads forward to that snapshot instead of replaying old deltas.
+        """
+        if self.resync is None:
+            def resync(symbol: str):
+                reader = self._stream_readers.get(symbol)
+                if reader is not None:
+                    reader.skip_to_latest()
+                multiplexer.resubscribe(f"orderbook.{depth}.{symbol}")
+            self.resync = resync
+        for symbol in symbols:
+            self.book(symbol)
+            self._stream_readers[symbol] = multiplexer.add_callback(f"orderbook.{depth}.{symbol}", self.on_message)
+
+    @staticmethod
+    def resubscriber(connector: Any, depth: int = 50) -> Callable[[str], None]:
+        """Resync callback that resubscribes the topic so the exchange sends a new snapshot"""
+        def resync(symbol: str):
+            topic = f"orderbook.{depth}.{symbol}"
+            callback = connector.ws_callbacks.get(topic)
+            connector.unsubscribe_from_topic(topic)
+            if callback is not None:
+                connector.subscribe_to_orderbook(symbol, callback)
+        return resync
+
+    def status(self) -> Dict[str, Any]:
+        now_ms = int(time.time() * 1000)
+        return {
+            symbol: {
+                "synced": book.synced,
+                "update_id": book.update_id,
+                "levels": [len(book.bids), len(book.asks)],
+                "age_ms": now_ms - book.timestamp if book.timestamp else None,
+            }
+            for symbol, book in list(self.books.items())
+        }
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+log_tail_service.py
+-------------------
+Constant-cost access to the tail of the API's text logs.
+
+``/api/bot/logs`` and ``BotActivityMonitor.get_recent_logs`` used to call
+``readlines()`` on the whole log to show its last 20 lines.
+
+LogTail reads backwards from EOF in fixed-size blocks and stops as soon as it
+has enough matching entries, so the cost depends on how far back the answer
+lies, not on the file size. Time-range queries binary-search the file by
+seeking. Every probe is remembered as a (timestamp, offset) checkpoint in a
+sorted index, so later queries start from a narrow window. ``follow`` polls
+the file from a byte offset and yields new entries as they are written. It
+handles truncation and rotation.
+
+Lines follow the API's logging format, ``2025-06-01 12:00:00,123 [LEVEL] message``.
+Lines without a timestamp, such as tracebacks, belong to the entry above them.
+Log timestamps are naive local time; ``parse_query_time`` converts query
+times with an offset (e.g. ``...Z``) to match.
+"""
+
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LINE_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:,\d{1,6})?) \[(\w+)\] ?(.*)$")
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+
+
+@dataclass
+class LogEntry:
+    timestamp: str
+    level: str
+    message: str
+    offset: int  # byte offset of the entry's first line
+
+    @property
+    def time(self) -> datetime:
+        return parse_timestamp(self.timestamp)
+
+    def to_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+def parse_timestamp(value: str) -> datetime:
+    base, _, millis = value.partition(",")
+    parsed = datetime.strptime(base, "%Y-%m-%d %H:%M:%S")
+    return parsed.replace(microsecond=int(millis.ljust(6, "0"))) if millis else parsed
+
+
+def parse_query_time(value: str) -> datetime:
+    """ISO time from a query string, as naive local time to compare with log timestamps"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def parse_line(line: str, offset: int = 0) -> Optional[LogEntry]:
+    match = LINE_PATTERN.match(line)
+    if not match:
+        return None
+    return LogEntry(match.group(1), match.group(2), match.group(3), offset)
+
+
+class LogFilter:
+    """Minimum level and case-insensitive substring match"""
+
+    def __init__(self, level: Optional[str] = None, contains: Optional[str] = None):
+        self.min_level = LEVELS.get(level.upper(), 0) if level else 0
+        self.contains = contains.lower() if contains else None
+
+    def __call__(self, entry: LogEntry) -> bool:
+        if self.min_level and LEVELS.get(entry.level, 0) < self.min_level:
+            return False
+        return self.contains is None or self.contains in entry.message.lower()
+
+
+class LogTail:
+    """Backward block reads, a checkpoint index and follow mode for one log file"""
+
+    def __init__(self, path: str, block_size: int = 64 * 1024, max_scan_bytes: int = 16 * 1024 * 1024):
+        self.path = path
+        self.block_size = block_size
+        self.max_scan_bytes = max_scan_bytes  # bound on work for filters that rarely match
+        self._index: List[Tuple[datetime, int]] = []
+        self._identity: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def _stat(self) -> Optional[os.stat_result]:
+        try:
+            return os.stat(self.path)
+        except OSError:
+            return None
+
+    def _check_rotation(self, stat: os.stat_result):
+        # A new inode or a shrunk file invalidates every checkpoint
+        identity = (stat.st_ino, stat.st_dev)
+        with self._lock:
+            if identity != self._identity or (self._index and self._index[-1][1] >= stat.st_size):
+                self._index = []
+                self._identity = identity
+
+    def _lines_backward(self, f, end: int) -> Iterator[Tuple[int, bytes]]:
+        """(offset, line) pairs from ``end`` towards the start of the file"""
+        pos, buffer, scanned = end, b"", 0
+        while pos > 0 and scanned < self.max_scan_bytes:
+            size = min(self.block_size, pos)
+            pos -= size
+            f.seek(pos)
+            buffer = f.read(size) + buffer
+            scanned += size
+            lines = buffer.split(b"\n")
+            buffer = lines[0]  # possibly cut mid-line; completed by the next block
+            cursor = pos + len(buffer) + 1
+            starts = []
+            for line in lines[1:]:
+                starts.append(cursor)
+                cursor += len(line) + 1
+            for start, line in zip(reversed(starts), reversed(lines[1:])):
+                yield start, line
+        if pos == 0 and buffer:
+            yield 0, buffer
+
+    def tail(self, limit: int = 20, level: Optional[str] = None, contains: Optional[str] = None,
+             until: Optional[datetime] = None) -> List[LogEntry]:
+        """Newest ``limit`` entries matching the filters, returned oldest first"""
+        if not os.path.exists(self.path):
+            return []
+        matches = LogFilter(level, contains)
+        entries: List[LogEntry] = []
+        continuation: List[str] = []
+        with open(self.path, "rb") as f:
+            end = os.fstat(f.fileno()).st_size
+            for offset, raw in self._lines_backward(f, end):
+                line = raw.decode("utf-8", errors="ignore").rstrip("\r")
+                entry = parse_line(line, offset)
+                if entry is None:
+                    if line.strip():
+                        continuation.append(line)
+                    continue
+                if continuation:
+                    entry.message += "\n" + "\n".join(reversed(continuation))
+                    continuation = []
+                if until is not None and entry.time > until:
+                    continue
+                if matches(entry):
+                    entries.append(entry)
+                    if len(entries) >= limit:
+                        break
+        entries.reverse()
+        return entries
+
+    def _entry_at(self, f, offset: int, end: int) -> Optional[Tuple[datetime, int]]:
+        """Timestamp and start of the first entry at or after ``offset``"""
+        f.seek(offset)
+        if offset:
+            f.readline()  # skip the partial line we landed in
+        while f.tell() < end:
+            start = f.tell()
+            entry = parse_line(f.readline().decode("utf-8", errors="ignore").rstrip("\r\n"), start)
+            if entry is not None:
+                return entry.time, start
+        return None
+
+    def offset_for(self, when: datetime) -> int:
+        """Byte offset of the first entry logged at or after ``when``"""
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._check_rotation(stat)
+            end = stat.st_size
+            with self._lock:
+                # Narrow the search window with checkpoints from earlier queries
+                i = bisect.bisect_left(self._index, (when, -1))
+                lo = self._index[i - 1][1] if i > 0 else 0
+                hi = self._index[i][1] if i < len(self._index) else end
+            while hi - lo > self.block_size:
+                mid = (lo + hi) // 2
+                probe = self._entry_at(f, mid, hi)
+                if probe is None:
+                    hi = mid
+                    continue
+                with self._lock:
+                    bisect.insort(self._index, probe)
+                if probe[0] < when:
+                    lo = probe[1] + 1
+                else:
+                    hi = mid
+            # Linear scan of the final window
+            f.seek(lo)
+            if lo:
+                f.readline()
+            while f.tell() < end:
+                start = f.tell()
+                entry = parse_line(f.readline().decode("utf-8", errors="ignore").rstrip("\r\n"), start)
+                if entry is not None and entry.time >= when:
+                    return start
+            return end
+
+    def between(self, since: datetime, until: Optional[datetime] = None, limit: int = 500,
+                level: Optional[str] = None, contains: Optional[str] = None) -> List[LogEntry]:
+        """Entries logged in [since, until], oldest first, at most ``limit``"""
+        matches = LogFilter(level, contains)
+        entries: List[LogEntry] = []
+        start = self.offset_for(since)
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            current: Optional[LogEntry] = None
+            for raw in f:
+                offset = start
+                start += len(raw)
+                line = raw.decode("utf-8", errors="ignore").rstrip("\r\n")
+                entry = parse_line(line, offset)
+                if entry is None:
+                    if current is not None and line.strip():
+                        current.message += "\n" + line
+                    continue
+                if until is not None and entry.time > until:
+                    break
+                if len(entries) >= limit:
+                    break
+                current = entry if matches(entry) else None
+                if current is not None:
+                    entries.append(current)
+        return entries
+
+    def follow(self, offset: Optional[int] = None, poll_interval: float = 0.5, level: Optional[str] = None,
+               contains: Optional[str] = None,
+               stop: Optional[threading.Event] = None) -> Iterator[Tuple[List[LogEntry], int]]:
+        """
+        Yield ``(entries, resume_offset)`` for entries written after ``offset`` (default: EOF).
+
+        An idle poll yields an empty list, so callers can send heartbeats.
+        ``resume_offset`` is where a reconnecting reader should pick up
+        without losing or repeating entries.
+        """
+        matches = LogFilter(level, contains)
+        stat = self._stat()
+        identity = (stat.st_ino, stat.st_dev) if stat is not None else None
+        position = (stat.st_size if stat is not None else 0) if offset is None else offset
+        partial = b""
+        pending: Optional[LogEntry] = None
+        while stop is None or not stop.is_set():
+            stat = self._stat()
+            size = stat.st_size if stat is not None else 0
+            current = (stat.st_ino, stat.st_dev) if stat is not None else None
+            # A rotated-in file can already be as long as the old one, so compare identities too
+            if size < position or (current is not None and current != identity):
+                logger.info(f"{self.path} was truncated or rotated; following from the start")
+                position, partial, pending = 0, b"", None
+            identity = current
+            batch: List[LogEntry] = []
+            if size > position:
+                with open(self.path, "rb") as f:
+                    f.seek(position)
+                    data = partial + f.read(size - position)
+                line_offset = position - len(partial)
+                lines = data.split(b"\n")
+                partial = lines.pop()
+                for raw in lines:
+                    line = raw.decode("utf-8", errors="ignore").rstrip("\r")
+                    entry = parse_line(line, line_offset)
+                    line_offset += len(raw) + 1
+                    if entry is None:
+                        if pending is not None and line.strip():
+                            pending.message += "\n" + line
+                        continue
+                    if pending is not None and matches(pending):
+                        batch.append(pending)
+                    pending = entry
+                position = size
+            elif pending is not None:
+                # Nothing new since the last poll, so the held entry is complete
+                if matches(pending):
+                    batch.append(pending)
+                pending = None
+            resume = pending.offset if pending is not None else position - len(partial)
+            yield batch, resume
+            if not batch:
+                if stop is not None:
+                    stop.wait(poll_interval)
+                else:
+                    time.sleep(poll_interval)
+
+
+_tails: Dict[str, LogTail] = {}
+_tails_lock = threading.Lock()
+
+
+def get_log_tail(path: str) -> LogTail:
+    """Shared LogTail per file, so the checkpoint index survives between requests"""
+    path = os.path.abspath(path)
+    with _tails_lock:
+        if path not in _tails:
+            _tails[path] = LogTail(path)
+        return _tails[path]
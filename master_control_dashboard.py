@@ -29,6 +29,8 @@ from typing import Dict, List, Any
 import yaml
 import logging
 
+from api_batch import fetch_batch
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -166,33 +168,17 @@ class MasterControlDashboard:
         # Try to get real data from APIs
         real_data = {}
         
-        # Get portfolio data from main API
+        # Portfolio and trading statistics in one batched request
         try:
             # Zmieniono port 5000 na 5001, aby zawsze korzystać z Enhanced Dashboard API
-            portfolio_response = requests.get("http://localhost:5001/api/portfolio", timeout=10)
-            if portfolio_response.status_code == 200:
-                portfolio_data = portfolio_response.json()
-                real_data['main_portfolio'] = portfolio_data
-        except Exception as e:
-            logger.warning(f"Failed to get main portfolio data: {e}")
-        
-        # Get enhanced portfolio data
-        try:
-            enhanced_response = requests.get("http://localhost:5001/api/portfolio", timeout=10)
-            if enhanced_response.status_code == 200:
-                enhanced_data = enhanced_response.json()
-                real_data['enhanced_portfolio'] = enhanced_data
-        except Exception as e:
-            logger.warning(f"Failed to get enhanced portfolio data: {e}")
-        
-        # Get trading statistics
-        try:
-            stats_response = requests.get("http://localhost:5001/api/trading/statistics", timeout=10)
-            if stats_response.status_code == 200:
-                stats_data = stats_response.json()
-                real_data['trading_stats'] = stats_data
+            batch = fetch_batch("http://localhost:5001", ["portfolio", "trading_statistics"], timeout=10)
+            if batch.get("portfolio") is not None:
+                real_data['main_portfolio'] = batch["portfolio"]
+                real_data['enhanced_portfolio'] = batch["portfolio"]
+            if batch.get("trading_statistics") is not None:
+                real_data['trading_stats'] = batch["trading_statistics"]
         except Exception as e:
-            logger.warning(f"Failed to get trading statistics: {e}")
+            logger.warning(f"Failed to get portfolio and trading statistics: {e}")
         
         # Build metrics from real data if available
         if real_data:
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+matching_engine.py
+------------------
+In-memory price-time-priority limit order book matching engine.
+
+OrderManagementSystem.simulate_execution used to fill against a single
+random top-of-book quote with a random partial quantity. MatchingEngine
+keeps a real book per symbol instead. Each side is a heap of price keys
+(``price`` for asks, ``-price`` for bids, so the best level is always
+``heap[0]``) over a dict of price levels. Each level is a FIFO deque of
+resting orders. Finding the best level, adding a level and matching one
+maker are all O(log n). Emptied levels and cancelled orders are removed
+lazily when they reach the front.
+
+Supported order types are market, limit, stop (triggers a market order),
+stop_limit and iceberg. Time in force is GTC, IOC or FOK. An iceberg shows
+``display_quantity`` at a time. When the shown part is filled, it is
+refreshed from the hidden remainder and goes to the back of the queue.
+Stops trigger on the last trade price, and trades caused by a triggered
+stop can trigger further stops.
+
+The engine is single-threaded and deterministic: the same sequence of
+calls always yields the same trades. Callers that share an engine between
+threads must hold their own lock.
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+EPSILON = 1e-12  # quantities below this are treated as zero
+
+ORDER_TYPES = ("market", "limit", "stop", "stop_limit", "iceberg")
+TIME_IN_FORCE = ("GTC", "IOC", "FOK", "DAY")
+
+
+class EngineOrder:
+    """An order as seen by the engine; the same object rests in the book"""
+
+    __slots__ = ("order_id", "is_buy", "order_type", "quantity", "price", "stop_price", "time_in_force",
+                 "display_quantity", "remaining", "visible", "filled", "active")
+
+    def __init__(self, order_id: str, is_buy: bool, order_type: str, quantity: float, price: Optional[float],
+                 stop_price: Optional[float], time_in_force: str, display_quantity: Optional[float]):
+        self.order_id = order_id
+        self.is_buy = is_buy
+        self.order_type = order_type
+        self.quantity = quantity
+        self.price = price
+        self.stop_price = stop_price
+        self.time_in_force = time_in_force
+        self.display_quantity = display_quantity
+        self.remaining = quantity
+        self.visible = quantity if display_quantity is None else min(display_quantity, quantity)
+        self.filled = 0.0
+        self.active = True
+
+
+class Trade:
+    __slots__ = ("trade_id", "symbol", "price", "quantity", "taker_id", "maker_id", "taker_is_buy")
+
+    def __init__(self, trade_id: int, symbol: str, price: float, quantity: float, taker_id: str, maker_id: str,
+                 taker_is_buy: bool):
+        self.trade_id = trade_id
+        self.symbol = symbol
+        self.price = price
+        self.quantity = quantity
+        self.taker_id = taker_id
+        self.maker_id = maker_id
+        self.taker_is_buy = taker_is_buy
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"Trade({self.trade_id}, {self.quantity}@{self.price}, taker={self.taker_id}, maker={self.maker_id})"
+
+
+class MatchReport:
+    """
+    Outcome of one ``submit`` call.
+
+    ``status`` describes the submitted order: filled, partially_filled or new
+    (resting), cancelled (IOC/market remainder), killed (FOK not fillable) or
+    pending (stop waiting for its trigger). ``trades`` holds every trade the
+    call caused, including trades of stops it triggered. ``expired`` lists
+    the ids whose unfilled remainder the engine dropped.
+    """
+
+    __slots__ = ("order_id", "status", "filled", "remaining", "trades", "expired")
+
+    def __init__(self, order_id: str):
+        self.order_id = order_id
+        self.status = "new"
+        self.filled = 0.0
+        self.remaining = 0.0
+        self.trades: List[Trade] = []
+        self.expired: List[str] = []
+
+
+class _Level:
+    __slots__ = ("price", "orders", "count", "quantity")
+
+    def __init__(self, price: float):
+        self.price = price
+        self.orders: Deque[EngineOrder] = deque()
+        self.count = 0  # live orders; the deque may also hold cancelled ones
+        self.quantity = 0.0  # total remaining, hidden iceberg quantity included
+
+
+class _BookSide:
+    """Price levels of one side, best level first in a lazily pruned heap"""
+
+    __slots__ = ("is_bid", "heap", "levels", "in_heap")
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self.heap: List[float] = []
+        self.levels: Dict[float, _Level] = {}
+        self.in_heap = set()
+
+    def key(self, price: float) -> float:
+        return -price if self.is_bid else price
+
+    def best(self) -> Optional[_Level]:
+        heap, levels = self.heap, self.levels
+        while heap:
+            level = levels.get(heap[0])
+            if level is not None:
+                return level
+            self.in_heap.discard(heapq.heappop(heap))
+        return None
+
+    def level(self, price: float) -> _Level:
+        key = self.key(price)
+        level = self.levels.get(key)
+        if level is None:
+            level = self.levels[key] = _Level(price)
+            if key not in self.in_heap:
+                # A stale heap entry for this price is reused rather than duplicated
+                self.in_heap.add(key)
+                heapq.heappush(self.heap, key)
+        return level
+
+    def drop(self, level: _Level):
+        self.levels.pop(self.key(level.price), None)
+
+    def iter_levels(self) -> Iterator[_Level]:
+        """Levels best first; O(n log n), used by FOK checks and depth snapshots"""
+        for key in sorted(self.levels):
+            yield self.levels[key]
+
+
+class MatchingEngine:
+    """Price-time-priority order book and matcher for one symbol"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = _BookSide(is_bid=True)
+        self.asks = _BookSide(is_bid=False)
+        self.last_price: Optional[float] = None
+        self._orders: Dict[str, EngineOrder] = {}  # resting orders
+        self._stops: Dict[str, EngineOrder] = {}  # stops waiting for their trigger
+        self._buy_stops: List[Tuple[float, int, EngineOrder]] = []  # (stop, seq): lowest trigger first
+        self._sell_stops: List[Tuple[float, int, EngineOrder]] = []  # (-stop, seq): highest trigger first
+        self._seq = itertools.count()
+        self._trade_ids = itertools.count(1)
+        self.trade_count = 0
+        self.volume = 0.0
+
+    # ------------------------------------------------------------------ orders
+
+    def submit(self, order_id: str, side: str, quantity: float, order_type: str = "limit",
+               price: Optional[float] = None, stop_price: Optional[float] = None, time_in_force: str = "GTC",
+               display_quantity: Optional[float] = None) -> MatchReport:
+        """Match an incoming order and rest, park or drop what is left of it"""
+        if order_id in self._orders or order_id in self._stops:
+            raise ValueError(f"Duplicate order id {order_id}")
+        if order_type not in ORDER_TYPES:
+            raise ValueError(f"Unsupported order type {order_type}")
+        if time_in_force not in TIME_IN_FORCE:
+            raise ValueError(f"Unsupported time in force {time_in_force}")
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive")
+        if order_type in ("limit", "stop_limit", "iceberg") and price is None:
+            raise ValueError(f"{order_type} order requires a price")
+        if order_type in ("stop", "stop_limit") and stop_price is None:
+            raise ValueError(f"{order_type} order requires a stop price")
+        if order_type == "iceberg" and not display_quantity:
+            raise ValueError("iceberg order requires a display quantity")
+
+        order = EngineOrder(order_id, side.lower() == "buy", order_type, quantity, price, stop_price,
+                            time_in_force, display_quantity if order_type == "iceberg" else None)
+        report = MatchReport(order_id)
+        if order_type in ("stop", "stop_limit") and not self._triggered(order):
+            self._stops[order_id] = order
+            stops, key = (self._buy_stops, stop_price) if order.is_buy else (self._sell_stops, -stop_price)
+            heapq.heappush(stops, (key, next(self._seq), order))
+            report.status = "pending"
+            report.remaining = quantity
+            return report
+
+        self._execute(order, report)
+        report.filled = order.filled
+        report.remaining = order.remaining if order.active else 0.0
+        if order.filled >= order.quantity - EPSILON:
+            report.status = "filled"
+        elif not order.active:
+            report.status = "killed" if order.time_in_force == "FOK" and order.filled == 0 else "cancelled"
+        else:
+            report.status = "partially_filled" if order.filled > 0 else "new"
+        self._trigger_stops(report)
+        return report
+
+    def cancel(self, order_id: str) -> bool:
+        """Cancel a resting order or pending stop; False if it is not live"""
+        stop = self._stops.pop(order_id, None)
+        if stop is not None:
+            stop.active = False  # its heap entry is skipped when reached
+            return True
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return False
+        order.active = False
+        side = self.bids if order.is_buy else self.asks
+        level = side.levels.get(side.key(order.price))
+        if level is not None:
+            level.count -= 1
+            level.quantity -= order.remaining
+            if level.count == 0:
+                side.drop(level)
+        return True
+
+    def has_order(self, order_id: str) -> bool:
+        return order_id in self._orders or order_id in self._stops
+
+    # ---------------------------------------------------------------- matching
+
+    def _execute(self, order: EngineOrder, report: MatchReport):
+        limit = None if order.order_type in ("market", "stop") else order.price
+        if order.time_in_force == "FOK" and not self._can_fill(order, limit):
+            order.active = False
+            report.expired.append(order.order_id)
+            return
+        self._match(order, limit, report)
+        if order.remaining <= EPSILON:
+            order.remaining = 0.0
+            order.active = False
+        elif limit is None or order.time_in_force in ("IOC", "FOK"):
+            order.active = False
+            report.expired.append(order.order_id)
+        else:
+            self._rest(order)
+
+    def _can_fill(self, order: EngineOrder, limit: Optional[float]) -> bool:
+        needed = order.quantity
+        for level in (self.asks if order.is_buy else self.bids).iter_levels():
+            if limit is not None and (level.price > limit if order.is_buy else level.price < limit):
+                break
+            needed -= level.quantity
+            if needed <= EPSILON:
+                return True
+        return False
+
+    def _match(self, taker: EngineOrder, limit: Optional[float], report: MatchReport):
+        book = self.asks if taker.is_buy else self.bids
+        is_buy = taker.is_buy
+        trades = report.trades
+        while taker.remaining > EPSILON:
+            level = book.best()
+            if level is None:
+                break
+            price = level.price
+            if limit is not None and (price > limit if is_buy else price < limit):
+                break
+            orders = level.orders
+            while orders and taker.remaining > EPSILON:
+                maker = orders[0]
+                if not maker.active:
+                    orders.popleft()
+                    continue
+                quantity = maker.visible if maker.visible < taker.remaining else taker.remaining
+                maker.visible -= quantity
+                maker.remaining -= quantity
+                maker.filled += quantity
+                taker.remaining -= quantity
+                taker.filled += quantity
+                level.quantity -= quantity
+                trades.append(Trade(next(self._trade_ids), self.symbol, price, quantity, taker.order_id,
+                                    maker.order_id, is_buy))
+                self.trade_count += 1
+                self.volume += quantity
+                if maker.visible <= EPSILON:
+                    orders.popleft()
+                    if maker.remaining > EPSILON:
+                        # Iceberg refresh: new visible slice loses time priority
+                        maker.visible = min(maker.display_quantity, maker.remaining)
+                        orders.append(maker)
+                    else:
+                        maker.remaining = 0.0
+                        maker.active = False
+                        level.count -= 1
+                        self._orders.pop(maker.order_id, None)
+            self.last_price = price
+            if level.count == 0:
+                book.drop(level)
+
+    def _rest(self, order: EngineOrder):
+        level = (self.bids if order.is_buy else self.asks).level(order.price)
+        level.orders.append(order)
+        level.count += 1
+        level.quantity += order.remaining
+        self._orders[order.order_id] = order
+
+    # ------------------------------------------------------------------- stops
+
+    def _triggered(self, order: EngineOrder) -> bool:
+        if self.last_price is None:
+            return False
+        return self.last_price >= order.stop_price if order.is_buy else self.last_price <= order.stop_price
+
+    def _trigger_stops(self, report: MatchReport):
+        while self.last_price is not None:
+            if self._buy_stops and self._buy_stops[0][0] <= self.last_price:
+                _, _, order = heapq.heappop(self._buy_stops)
+            elif self._sell_stops and -self._sell_stops[0][0] >= self.last_price:
+                _, _, order = heapq.heappop(self._sell_stops)
+            else:
+                return
+            if not order.active:
+                continue  # cancelled while pending
+            self._stops.pop(order.order_id, None)
+            logger.debug(f"{self.symbol}: stop {order.order_id} triggered at {self.last_price}")
+            self._execute(order, report)
+
+    # ------------------------------------------------------------------- reads
+
+    def best_bid(self) -> Optional[Tuple[float, float]]:
+        level = self.bids.best()
+        return (level.price, level.quantity) if level else None
+
+    def best_ask(self) -> Optional[Tuple[float, float]]:
+        level = self.asks.best()
+        return (level.price, level.quantity) if level else None
+
+    def depth(self, levels: int = 10) -> Dict[str, List[List[float]]]:
+        """Top ``levels`` price levels per side as [price, total quantity]"""
+        return {
+            "bids": [[level.price, level.quantity] for level in itertools.islice(self.bids.iter_levels(), levels)],
+            "asks": [[level.price, level.quantity] for level in itertools.islice(self.asks.iter_levels(), levels)],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "symbol": self.symbol,
+            "resting_orders": len(self._orders),
+            "bid_levels": len(self.bids.levels),
+            "ask_levels": len(self.asks.levels),
+            "pending_stops": len(self._stops),
+            "trades": self.trade_count,
+            "volume": self.volume,
+            "last_price": self.last_price,
+        }
+
+
+def benchmark(events: int = 200_000, seed: int = 7) -> Dict[str, float]:
+    """
+    Replay a random but reproducible order flow and measure events per second.
+
+    The flow is about 60% limit orders around the mid, 25% cancels, 10% IOC
+    and market orders and 5% stops and icebergs.
+    """
+    rng = random.Random(seed)
+    engine = MatchingEngine("BENCH")
+    mid, tick = 100.0, 0.01
+    flow = []
+    live: List[str] = []
+    for i in range(events):
+        roll = rng.random()
+        side = "buy" if rng.random() < 0.5 else "sell"
+        offset = rng.randint(1, 50) * tick
+        price = round(mid - offset if side == "buy" else mid + offset, 2)
+        if roll < 0.25 and live:
+            flow.append(("cancel", live.pop(rng.randrange(len(live)))))
+            continue
+        order_id = f"o{i}"
+        if roll < 0.85:
+            # Some limits cross the spread and trade
+            cross = rng.random() < 0.2
+            price = round(price + (60 * tick if side == "buy" else -60 * tick), 2) if cross else price
+            flow.append(("submit", order_id, side, rng.uniform(0.1, 5), "limit", price, None, "GTC", None))
+            live.append(order_id)
+        elif roll < 0.95:
+            order_type = "market" if rng.random() < 0.5 else "limit"
+            flow.append(("submit", order_id, side, rng.uniform(0.1, 5), order_type,
+                         None if order_type == "market" else mid, None, "IOC", None))
+        elif roll < 0.975:
+            stop = round(mid + 20 * tick if side == "buy" else mid - 20 * tick, 2)
+            flow.append(("submit", order_id, side, rng.uniform(0.1, 2), "stop", None, stop, "GTC", None))
+            live.append(order_id)
+        else:
+            flow.append(("submit", order_id, side, rng.uniform(5, 20), "iceberg", price, None, "GTC", 1.0))
+            live.append(order_id)
+
+    submit, cancel = engine.submit, engine.cancel
+    started = time.perf_counter()
+    for event in flow:
+        if event[0] == "cancel":
+            cancel(event[1])
+        else:
+            submit(*event[1:])
+    elapsed = time.perf_counter() - started
+    return {
+        "events": len(flow),
+        "seconds": elapsed,
+        "events_per_second": len(flow) / elapsed,
+        "trades": engine.trade_count,
+    }
+
+
+if __name__ == "__main__":
+    result = benchmark()
+    print(f"{result['events']} events in {result['seconds']:.3f}s "
+          f"({result['events_per_second']:,.0f} events/s, {result['trades']} trades)")
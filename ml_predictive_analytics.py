@@ -10,10 +10,11 @@ import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import json
+import os
 import requests
 import sqlite3
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -84,20 +85,16 @@ class MLPredictiveAnalytics:
     def fetch_real_trading_data(self):
         """Fetch real trading data from Bybit API for ML training"""
         try:
-            import sys
-            sys.path.append(str(Path(__file__).parent / "ZoL0-master"))
-            from data.data.market_data_fetcher import MarketDataFetcher
+            from historical_data_downloader import HistoricalDataDownloader, interval_to_ms
             
             # Use production API if enabled
             use_testnet = not bool(os.getenv("BYBIT_PRODUCTION_ENABLED", "").lower() == "true")
             
-            fetcher = MarketDataFetcher(
-                api_key=os.getenv("BYBIT_API_KEY"),
-                api_secret=os.getenv("BYBIT_API_SECRET"),
-                use_testnet=use_testnet
-            )
-              # Fetch historical data for ML training
-            df = fetcher.fetch_data(symbol="BTCUSDT", interval="1h", limit=1000)
+            # Fetch the last 1000 hourly candles for ML training over the pooled client
+            # Aware UTC time: the downloader reads naive datetimes as UTC, not local time
+            end = datetime.now(timezone.utc)
+            start = end - timedelta(milliseconds=999 * interval_to_ms("1h"))
+            df = HistoricalDataDownloader(use_testnet=use_testnet).download("BTCUSDT", "1h", start, end)
             
             if df is not None and not df.empty:
                 self.logger.info(f"Fetched {len(df)} real data points for ML training")
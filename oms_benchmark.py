@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+oms_benchmark.py
+----------------
+End-to-end throughput and latency benchmark for OrderManagementSystem.
+
+The OMS is created without its simulation threads and driven from a single
+loop: a seeded stream of mixed market/limit/TWAP/VWAP/iceberg orders over
+several symbols is submitted in batches, and after each batch every due
+order is run through the paper matching engine. VWAP schedules come from an
+offline volume profile service, so a run never downloads klines or writes a
+cache. Every few batches a market data tick is applied to each symbol so
+resting orders keep trading. Book updates are timed separately and excluded
+from execution throughput.
+
+Reported: submit latency percentiles (risk checks, journaling and
+scheduling included), the share of submit time spent in pre-trade risk
+checks, fills per second on the execution path and resident memory growth.
+Results are appended to tests/performance/history/benchmark_history.json,
+as api_load_test.py does, and a summary is written to the ``order_execution``
+category of benchmarks/benchmark_results.json.
+
+    python oms_benchmark.py --orders 20000 --symbols BTCUSDT ETHUSDT --fail-on-regression
+"""
+
+import argparse
+import gc
+import json
+import logging
+import random
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+from advanced_order_management_system import (
+    ExecutionAlgorithm, OrderManagementSystem, OrderPriority, OrderRequest, OrderSide, OrderType,
+)
+from api_load_test import HISTORY_FILE, append_history, load_history, percentile
+from volume_profile import offline_volume_profile_service
+
+logger = logging.getLogger(__name__)
+
+RESULTS_FILE = Path("benchmarks/benchmark_results.json")
+
+BASE_PRICES = {"BTCUSDT": 45000.0, "ETHUSDT": 3000.0, "ADAUSDT": 1.5, "DOTUSDT": 25.0, "LINKUSDT": 15.0}
+
+# order kind -> execution algorithm
+ORDER_ALGORITHMS: Dict[str, ExecutionAlgorithm] = {
+    "market": ExecutionAlgorithm.AGGRESSIVE,
+    "limit": ExecutionAlgorithm.AGGRESSIVE,
+    "twap": ExecutionAlgorithm.TWAP,
+    "vwap": ExecutionAlgorithm.VWAP,
+    "iceberg": ExecutionAlgorithm.ICEBERG,
+}
+
+# order kind -> relative weight
+DEFAULT_ORDER_MIX: Dict[str, int] = {"market": 4, "limit": 4, "twap": 1, "vwap": 1, "iceberg": 1}
+
+
+@dataclass
+class OMSBenchmarkConfig:
+    orders: int = 5000
+    symbols: List[str] = field(default_factory=lambda: list(BASE_PRICES))
+    mix: Dict[str, int] = field(default_factory=lambda: dict(DEFAULT_ORDER_MIX))
+    batch_size: int = 50  # orders submitted between two execution passes
+    tick_every: int = 10  # batches between market data ticks
+    min_notional: float = 100.0
+    max_notional: float = 2000.0
+    traders: int = 10
+    seed: int = 0
+    db_path: Optional[str] = None  # temporary database when unset
+
+    def __post_init__(self):
+        _check_mix(self.mix)
+
+
+def _check_mix(mix: Dict[str, int]):
+    unknown = sorted(set(mix) - set(ORDER_ALGORITHMS))
+    if unknown:
+        raise ValueError(f"Unknown order kinds in mix: {unknown}; expected some of {sorted(ORDER_ALGORITHMS)}")
+
+
+class OrderStream:
+    """Seeded generator of benchmark orders"""
+
+    def __init__(self, config: OMSBenchmarkConfig, prices: Dict[str, float]):
+        _check_mix(config.mix)  # the mix may have been replaced after the config was built
+        self.config = config
+        self.prices = prices
+        self.rng = random.Random(config.seed)
+        self.kinds = list(config.mix)
+        self.weights = [config.mix[kind] for kind in self.kinds]
+
+    def next_order(self) -> OrderRequest:
+        rng = self.rng
+        kind = rng.choices(self.kinds, self.weights)[0]
+        symbol = rng.choice(self.config.symbols)
+        side = rng.choice((OrderSide.BUY, OrderSide.SELL))
+        mid = self.prices[symbol]
+        quantity = round(rng.uniform(self.config.min_notional, self.config.max_notional) / mid, 6)
+        # Limits straddle the touch: some cross, some rest in the book
+        offset = rng.uniform(-0.002, 0.002) * (1 if side == OrderSide.BUY else -1)
+        price = None if kind == "market" else round(mid * (1 + offset), 8)
+        algorithm = ORDER_ALGORITHMS[kind]
+        return OrderRequest(
+            order_id=str(uuid.UUID(int=rng.getrandbits(128))),
+            symbol=symbol,
+            side=side,
+            order_type=OrderType.MARKET if kind == "market" else OrderType.LIMIT,
+            quantity=quantity,
+            price=price,
+            stop_price=None,
+            time_in_force="GTC",
+            algorithm=algorithm,
+            priority=OrderPriority.NORMAL,
+            parent_order_id=None,
+            client_order_id=f"bench-{kind}",
+            trader_id=f"t-{rng.randrange(self.config.traders)}",
+            created_at=datetime.now(),
+            valid_until=None,
+            min_quantity=None,
+            display_quantity=quantity / 5 if kind == "iceberg" else None,
+            metadata={"benchmark": kind},
+        )
+
+
+def _rss_mb() -> float:
+    return psutil.Process().memory_info().rss / 1024 / 1024
+
+
+def _summary_ms(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "mean_ms": (sum(ordered) / len(ordered) * 1000) if ordered else 0.0,
+        "max_ms": (ordered[-1] * 1000) if ordered else 0.0,
+    }
+
+
+class OMSBenchmark:
+    """Drives one OrderManagementSystem through a configured order stream"""
+
+    def __init__(self, config: OMSBenchmarkConfig):
+        self.config = config
+        self.submit_latencies: List[float] = []
+        self.risk_check_latencies: List[float] = []
+        self.execute_time = 0.0
+        self.market_data_time = 0.0
+        self.scheduled = 0
+        self.rejected = 0
+        self._update_id = 0
+
+    def _tick(self, oms: OrderManagementSystem, prices: Dict[str, float], rng: random.Random):
+        started = time.perf_counter()
+        self._update_id += 1
+        for symbol in self.config.symbols:
+            prices[symbol] = BASE_PRICES.get(symbol, 100.0) * (1 + rng.uniform(-0.002, 0.002))
+            oms.order_books.on_message(oms._simulated_book_message(symbol, prices[symbol], self._update_id))
+            oms._refresh_market_data(symbol, prices[symbol], volume=rng.uniform(1000, 10000))
+            oms._refresh_liquidity(symbol)
+        self.market_data_time += time.perf_counter() - started
+
+    def _timed_risk_checks(self, oms: OrderManagementSystem):
+        check = oms.risk_manager.pre_trade_risk_check
+        latencies = self.risk_check_latencies
+
+        def timed(order):
+            started = time.perf_counter()
+            try:
+                return check(order)
+            finally:
+                latencies.append(time.perf_counter() - started)
+
+        oms.risk_manager.pre_trade_risk_check = timed
+
+    def _drain(self, oms: OrderManagementSystem):
+        """Execute every order that is due now"""
+        started = time.perf_counter()
+        while True:
+            order = oms.order_queue.pop(timeout=0)
+            if order is None:
+                break
+            oms._execute_scheduled(order)
+            self.scheduled += 1
+        self.execute_time += time.perf_counter() - started
+
+    def run(self) -> Dict[str, Any]:
+        config = self.config
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = config.db_path or str(Path(tmp) / "oms_benchmark.db")
+            gc.collect()
+            initial_memory = _rss_mb()
+            oms = OrderManagementSystem(db_path=db_path, recover=False, start_threads=False,
+                                        volume_profiles=offline_volume_profile_service(Path(tmp) / "volume_profiles"))
+            # The stream measures the OMS, not how quickly it hits the daily volume limit
+            oms.risk_manager.risk_limits['max_daily_volume'] = float('inf')
+            self._timed_risk_checks(oms)
+            rng = random.Random(config.seed + 1)
+            prices = {symbol: BASE_PRICES.get(symbol, 100.0) for symbol in config.symbols}
+            stream = OrderStream(config, prices)
+            self._tick(oms, prices, rng)
+
+            started = time.perf_counter()
+            for number in range(config.orders):
+                order = stream.next_order()
+                submit_started = time.perf_counter()
+                ok, _ = oms.submit_order(order)
+                self.submit_latencies.append(time.perf_counter() - submit_started)
+                if not ok:
+                    self.rejected += 1
+                if (number + 1) % config.batch_size == 0 or number + 1 == config.orders:
+                    self._drain(oms)
+                    if (number + 1) % (config.batch_size * config.tick_every) == 0:
+                        self._tick(oms, prices, rng)
+                        self._drain(oms)
+            elapsed = time.perf_counter() - started
+
+            flush_started = time.perf_counter()
+            oms.shutdown()
+            flush_time = time.perf_counter() - flush_started
+            gc.collect()
+            final_memory = _rss_mb()
+            return self.metrics(oms, elapsed, flush_time, initial_memory, final_memory)
+
+    def metrics(self, oms: OrderManagementSystem, elapsed: float, flush_time: float,
+                initial_memory: float, final_memory: float) -> Dict[str, Any]:
+        config = self.config
+        fills = oms.execution_totals["count"]
+        submit_time = sum(self.submit_latencies)
+        risk_time = sum(self.risk_check_latencies)
+        return {
+            "orders": config.orders,
+            "symbols": list(config.symbols),
+            "mix": dict(config.mix),
+            "seed": config.seed,
+            "duration_s": elapsed,
+            "accepted": config.orders - self.rejected,
+            "rejected": self.rejected,
+            "orders_per_second": config.orders / elapsed if elapsed else 0.0,
+            "submit": _summary_ms(self.submit_latencies),
+            "risk_check": {
+                **_summary_ms(self.risk_check_latencies),
+                "share_of_submit": risk_time / submit_time if submit_time else 0.0,
+            },
+            "execution": {
+                "scheduled_orders": self.scheduled,
+                "fills": fills,
+                "filled_notional": oms.execution_totals["notional"],
+                "execute_s": self.execute_time,
+                "fills_per_second": fills / self.execute_time if self.execute_time else 0.0,
+                "market_data_s": self.market_data_time,
+                "db_flush_s": flush_time,
+            },
+            "memory": {
+                "initial_memory_mb": initial_memory,
+                "final_memory_mb": final_memory,
+                "memory_increase_mb": final_memory - initial_memory,
+                "kb_per_order": (final_memory - initial_memory) * 1024 / config.orders if config.orders else 0.0,
+            },
+        }
+
+
+def run_oms_benchmark(config: OMSBenchmarkConfig) -> Dict[str, Any]:
+    logger.info(f"OMS benchmark: {config.orders} orders over {len(config.symbols)} symbols, mix {config.mix}")
+    return OMSBenchmark(config).run()
+
+
+def find_regressions(metrics: Dict[str, Any], history: List[Dict[str, Any]], name: str = "oms",
+                     tolerance: float = 0.25) -> List[str]:
+    """Compare against the most recent earlier run with the same name, order count and mix"""
+    previous = [entry for entry in history if entry.get("name") == name
+                and entry.get("metrics", {}).get("orders") == metrics["orders"]
+                and entry.get("metrics", {}).get("mix") == metrics["mix"]]
+    if not previous:
+        return []
+    baseline = previous[-1]["metrics"]
+    regressions = []
+    for section, key in (("submit", "p95_ms"), ("submit", "p99_ms"), ("risk_check", "p95_ms")):
+        before, current = baseline[section][key], metrics[section][key]
+        if current > before * (1 + tolerance):
+            regressions.append(f"{section} {key} {before:.3f} -> {current:.3f}")
+    before, current = baseline["execution"]["fills_per_second"], metrics["execution"]["fills_per_second"]
+    if current < before * (1 - tolerance):
+        regressions.append(f"fills/s {before:.0f} -> {current:.0f}")
+    before, current = baseline["memory"]["kb_per_order"], metrics["memory"]["kb_per_order"]
+    if current > max(before * (1 + tolerance), 1.0):
+        regressions.append(f"memory {before:.2f} -> {current:.2f} KB/order")
+    return regressions
+
+
+def append_results(metrics: Dict[str, Any], path: Path = RESULTS_FILE):
+    """Add the run to the order_execution category of benchmark_results.json"""
+    results = {}
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            results = json.load(f)
+    orders = metrics["orders"]
+    results.setdefault("order_execution", {})[datetime.now().strftime("%Y%m%d_%H%M%S")] = {
+        f"orders_{orders}": {
+            "avg_time": metrics["duration_s"] / orders if orders else 0.0,
+            "orders_per_second": metrics["orders_per_second"],
+            "avg_latency": metrics["submit"]["mean_ms"] / 1000,
+            "fills_per_second": metrics["execution"]["fills_per_second"],
+        }
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+
+def print_report(metrics: Dict[str, Any]):
+    submit, risk, execution, memory = (metrics["submit"], metrics["risk_check"], metrics["execution"],
+                                       metrics["memory"])
+    print(f"\n{metrics['orders']} orders in {metrics['duration_s']:.2f}s ({metrics['orders_per_second']:.0f} orders/s), "
+          f"{metrics['rejected']} rejected")
+    print(f"submit      p50 {submit['p50_ms']:.3f} ms  p95 {submit['p95_ms']:.3f} ms  p99 {submit['p99_ms']:.3f} ms  "
+          f"max {submit['max_ms']:.3f} ms")
+    print(f"risk check  p50 {risk['p50_ms']:.3f} ms  p95 {risk['p95_ms']:.3f} ms  "
+          f"({risk['share_of_submit']:.0%} of submit time)")
+    print(f"execution   {execution['fills']} fills from {execution['scheduled_orders']} scheduled orders, "
+          f"{execution['fills_per_second']:.0f} fills/s")
+    print(f"memory      +{memory['memory_increase_mb']:.1f} MB ({memory['kb_per_order']:.2f} KB/order)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the order management system")
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--symbols", nargs="+", default=list(BASE_PRICES))
+    parser.add_argument("--mix", help='order kind weights as JSON, e.g. \'{"market": 1, "limit": 1}\'')
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--tick-every", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--name", default="oms", help="history entry name")
+    parser.add_argument("--history", default=str(HISTORY_FILE))
+    parser.add_argument("--results", default=str(RESULTS_FILE))
+    parser.add_argument("--no-history", action="store_true")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    # The OMS module configures INFO logging on import; per-fill log lines would dominate the timings
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    try:
+        config = OMSBenchmarkConfig(orders=args.orders, symbols=args.symbols, batch_size=args.batch_size,
+                                    tick_every=args.tick_every, seed=args.seed,
+                                    mix=json.loads(args.mix) if args.mix else dict(DEFAULT_ORDER_MIX))
+    except ValueError as e:
+        parser.error(str(e))
+    metrics = run_oms_benchmark(config)
+
+    print_report(metrics)
+    history_path = Path(args.history)
+    regressions = find_regressions(metrics, load_history(history_path), args.name)
+    if not args.no_history:
+        append_history(metrics, args.name, history_path)
+        append_results(metrics, Path(args.results))
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,12 +14,19 @@ import logging
 import asyncio
 import threading
 import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional, Callable
 import pandas as pd
 import requests
 from pathlib import Path
 
+from api_metrics import timed_call
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 try:
     from dotenv import load_dotenv
@@ -27,10 +34,6 @@ try:
 except ImportError:
     logger.warning("python-dotenv not available, using system environment variables")
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
 class ProductionDataManager:
     """Centralized manager for production API data"""
     def __init__(self):
@@ -67,11 +70,21 @@ class ProductionDataManager:
         self.last_reset = time.time()
         self.rate_limit = self.config.get("dashboard_configuration", {}).get("rate_limits", {}).get("requests_per_minute", 600)
         
-        # Initialize connector
+        # Local L2 books fed by the connector's orderbook WebSocket stream
+        from local_order_book import OrderBookManager
+        self.order_books = OrderBookManager()
+        self._book_subscriptions = set()
+        self._book_lock = threading.Lock()
+        
+        # Connector is warmed up in the background so that constructing the
+        # manager never blocks on imports or network round trips
         self.bybit_connector = None
-        self._initialize_connector()
+        self.connector_ready = threading.Event()
+        self.connector_init_timeout = self.config.get("dashboard_configuration", {}).get("timeout", 10)
+        self.health_check_interval = self.config.get("monitoring", {}).get("health_check_interval", 30)
+        self._start_connector_warmup()
         
-        # Start background health monitoring
+        # Start background health monitoring (first check runs after warm-up)
         self._start_health_monitor()
         
     def _load_config(self) -> Dict[str, Any]:
@@ -101,6 +114,22 @@ class ProductionDataManager:
                 "crypto": ["BTCUSDT", "ETHUSDT", "ADAUSDT", "DOTUSDT", "SOLUSDT"]
             }        }
         
+    def _start_connector_warmup(self):
+        """Import and construct the Bybit connector on a background thread"""
+        warmup_thread = threading.Thread(
+            target=self._initialize_connector, name="bybit-connector-warmup", daemon=True
+        )
+        warmup_thread.start()
+        
+    def _get_connector(self, timeout: Optional[float] = None):
+        """Return the connector, waiting up to ``timeout`` seconds for warm-up to finish"""
+        if not self.connector_ready.is_set():
+            wait_for = self.connector_init_timeout if timeout is None else timeout
+            if not self.connector_ready.wait(wait_for):
+                logger.warning(f"Bybit connector not ready after {wait_for}s, using fallback data")
+                return None
+        return self.bybit_connector
+        
     def _initialize_connector(self):
         """Initialize Bybit connector"""
         try:
@@ -109,20 +138,39 @@ class ProductionDataManager:
             sys.path.append(str(Path(__file__).parent / "ZoL0-master"))
             from data.execution.bybit_connector import BybitConnector
             
-            self.bybit_connector = BybitConnector(
+            connector = BybitConnector(
                 api_key=self.api_key,
                 api_secret=self.api_secret,
                 use_testnet=not self.is_production            )
             
-            # Test connection
+            # Route the connector's session-based calls through the shared keep-alive pool,
+            # and pace them with the shared scheduler instead of the connector's own sleeps
+            from exchange_http_client import install_on_connector
+            from exchange_request_scheduler import RequestLane, ScheduledConnector
+            self.bybit_connector = ScheduledConnector(
+                install_on_connector(connector), default_lane=RequestLane.DASHBOARD
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize Bybit connector: {e}")
+            self.connection_status["bybit"]["error"] = str(e)
+        finally:
+            # Callers waiting on readiness must be released even if the import failed
+            self.connector_ready.set()
+            
+        if self.bybit_connector is None:
+            return
+            
+        try:
+            # Test connection (also warms up the HTTP connection for the first real call)
             if self._test_connection():
                 self.connection_status["bybit"]["connected"] = True
                 logger.info(f"Connected to Bybit {'Production' if self.is_production else 'Testnet'} API")
             else:
                 logger.error("Failed to connect to Bybit API")
+            self.connection_status["bybit"]["last_check"] = datetime.now()
                 
         except Exception as e:
-            logger.error(f"Failed to initialize Bybit connector: {e}")
+            logger.error(f"Bybit connection test failed during warm-up: {e}")
             
     def _test_connection(self) -> bool:
         """Test API connection"""
@@ -141,6 +189,8 @@ class ProductionDataManager:
         """Start background health monitoring"""
         def health_check():
             while True:
+                # Warm-up already tested the connection, so defer the first check
+                time.sleep(self.health_check_interval)
                 try:
                     self.connection_status["bybit"]["connected"] = self._test_connection()
                     self.connection_status["bybit"]["last_check"] = datetime.now()
@@ -156,10 +206,8 @@ class ProductionDataManager:
                         
                 except Exception as e:
                     logger.error(f"Health check failed: {e}")
-                    
-                time.sleep(30)  # Check every 30 seconds
                 
-        health_thread = threading.Thread(target=health_check, daemon=True)
+        health_thread = threading.Thread(target=health_check, name="bybit-health-monitor", daemon=True)
         health_thread.start()
     
     def _cleanup_cache(self):
@@ -206,6 +254,7 @@ class ProductionDataManager:
         self.request_count += 1
         return True
     
+    @timed_call("get_account_balance")
     def get_account_balance(self, use_cache: bool = True) -> Dict[str, Any]:
         """Get account balance from production API"""
         # Use enhanced portfolio cache for balance data
@@ -222,32 +271,18 @@ class ProductionDataManager:
             return {"error": "Rate limit exceeded", "success": False}
         
         try:
-            if self.bybit_connector:                # Set timeout for this specific call
-                import signal
-                import threading
-                
-                result_container = {"result": None, "error": None}
-                
-                def get_balance():
-                    try:
-                        result_container["result"] = self.bybit_connector.get_account_balance()
-                    except Exception as e:
-                        result_container["error"] = str(e)
-                  # Run with timeout
-                thread = threading.Thread(target=get_balance)
-                thread.daemon = True
-                thread.start()
-                thread.join(timeout=10)  # 10 second timeout for balance (reduced for faster API response)
-                
-                if thread.is_alive():
+            connector = self._get_connector()
+            if connector:
+                # Queued through the request scheduler; wait at most 10 s for this read
+                try:
+                    result = connector.submit("get_account_balance").result(timeout=10)
+                except FutureTimeoutError:
                     logger.warning("Account balance call timed out after 10 seconds, using cache/fallback")
                     return self._get_fallback_balance()
-                
-                if result_container["error"]:
-                    logger.error(f"Account balance error: {result_container['error']}")
+                except Exception as e:
+                    logger.error(f"Account balance error: {e}")
                     return self._get_fallback_balance()
                 
-                result = result_container["result"]
                 if result and result.get("retCode") == 0:
                     # Transform Bybit API response to dashboard-compatible format
                     transformed_result = self._transform_bybit_balance_response(result)
@@ -273,6 +308,7 @@ class ProductionDataManager:
         """Get portfolio balance - alias for get_account_balance for compatibility"""
         return self.get_account_balance(use_cache)
     
+    @timed_call("get_market_data")
     def get_market_data(self, symbol: str = "BTCUSDT", use_cache: bool = True) -> Dict[str, Any]:
         """Get market data for a symbol"""
         cache_key = f"market_data_{symbol}"
@@ -285,8 +321,9 @@ class ProductionDataManager:
             return {"error": "Rate limit exceeded", "success": False}
             
         try:
-            if self.bybit_connector:
-                result = self.bybit_connector.get_ticker(symbol)
+            connector = self._get_connector()
+            if connector:
+                result = connector.get_ticker(symbol)
                 
                 # Bybit API returns retCode: 0 for success
                 if result.get("retCode") == 0:
@@ -306,6 +343,7 @@ class ProductionDataManager:
         # Return fallback data
         return self._get_fallback_market_data(symbol)
         
+    @timed_call("get_historical_data")
     def get_historical_data(self, symbol: str = "BTCUSDT", interval: str = "1h", 
                           limit: int = 100, use_cache: bool = True) -> pd.DataFrame:
         """Get historical OHLCV data"""
@@ -320,19 +358,26 @@ class ProductionDataManager:
             logger.warning("Rate limit exceeded for historical data")
             return pd.DataFrame()
             
-        try:
-            # Use market data fetcher
-            import sys
-            sys.path.append(str(Path(__file__).parent / "ZoL0-master"))
-            from data.data.market_data_fetcher import MarketDataFetcher
+        if limit > 1000:
+            # One kline request is capped at 1000 candles; page longer histories.
+            # Windows are inclusive, so ``limit`` candles span (limit - 1) intervals
+            from historical_data_downloader import interval_to_ms
+            end_ms = int(time.time() * 1000)
+            start_ms = end_ms - (limit - 1) * interval_to_ms(interval)
+            df = self.get_historical_range(symbol, interval, start_ms, end_ms, use_cache)
+            if not df.empty:
+                self._cache_data(cache_key, df)
+                return df
+            return self._get_fallback_historical_data(symbol, interval, limit)
             
-            fetcher = MarketDataFetcher(
-                api_key=self.api_key,
-                api_secret=self.api_secret,
-                use_testnet=not self.is_production
-            )
+        try:
+            # Single-page download over the pooled client (kline data needs no signing)
+            from historical_data_downloader import HistoricalDataDownloader, interval_to_ms
             
-            df = fetcher.fetch_data(symbol=symbol, interval=interval, limit=limit)
+            end_ms = int(time.time() * 1000)
+            start_ms = end_ms - (limit - 1) * interval_to_ms(interval)
+            downloader = HistoricalDataDownloader(use_testnet=not self.is_production)
+            df = downloader.download(symbol, interval, start_ms, end_ms, resume=False)
             
             if df is not None and not df.empty:
                 # Add metadata
@@ -350,6 +395,69 @@ class ProductionDataManager:
               # Return fallback data
         return self._get_fallback_historical_data(symbol, interval, limit)
         
+    @timed_call("get_historical_range")
+    def get_historical_range(self, symbol: str, interval: str, start: Any, end: Any,
+                             use_cache: bool = True) -> pd.DataFrame:
+        """Get OHLCV data for an arbitrary time range, paging past the 1000-candle API limit"""
+        cache_key = f"historical_range_{symbol}_{interval}_{start}_{end}"
+        
+        if use_cache and self._is_cache_valid(cache_key):
+            return self.data_cache[cache_key]
+            
+        try:
+            from historical_data_downloader import HistoricalDataDownloader
+            
+            downloader = HistoricalDataDownloader(use_testnet=not self.is_production)
+            df = downloader.download(symbol, interval, start, end)
+            
+            df.attrs["data_source"] = "production_api" if self.is_production else "testnet_api"
+            df.attrs["timestamp"] = datetime.now().isoformat()
+            df.attrs["symbol"] = symbol
+            
+            self._cache_data(cache_key, df)
+            return df
+            
+        except Exception as e:
+            logger.error(f"Failed to download historical range for {symbol}: {e}")
+            
+        return pd.DataFrame()
+        
+    @timed_call("get_order_book")
+    def get_order_book(self, symbol: str = "BTCUSDT", depth: int = 10) -> Dict[str, Any]:
+        """Get order book levels from the local WebSocket-maintained book
+        
+        The first call for a symbol subscribes its orderbook stream; until the
+        initial snapshot arrives the levels come from one REST request.
+        """
+        book = self.order_books.get(symbol)
+        if book is not None:
+            return book.snapshot(depth)
+        
+        self._subscribe_order_book(symbol)
+        connector = self._get_connector()
+        if not connector:
+            return {"symbol": symbol, "bids": [], "asks": [], "success": False, "error": "Connector unavailable"}
+        
+        try:
+            return connector.get_order_book(symbol, limit=depth)
+        except Exception as e:
+            logger.error(f"Failed to get order book for {symbol}: {e}")
+            return {"symbol": symbol, "bids": [], "asks": [], "success": False, "error": str(e)}
+    
+    def _subscribe_order_book(self, symbol: str):
+        with self._book_lock:
+            if symbol in self._book_subscriptions:
+                return
+            self._book_subscriptions.add(symbol)
+        try:
+            # All symbols share one public spot stream connection
+            from websocket_multiplexer import get_multiplexer, public_stream_url
+            multiplexer = get_multiplexer(public_stream_url("spot", use_testnet=not self.is_production))
+            self.order_books.subscribe_stream(multiplexer, [symbol])
+        except Exception as e:
+            logger.warning(f"Order book stream unavailable for {symbol}: {e}")
+    
+    @timed_call("get_positions")
     def get_positions(self, use_cache: bool = True) -> Dict[str, Any]:
         """Get current positions"""
         cache_key = "positions"
@@ -363,8 +471,9 @@ class ProductionDataManager:
             return {"error": "Rate limit exceeded", "success": False}
         
         try:
-            if self.bybit_connector:
-                result = self.bybit_connector.get_positions()
+            connector = self._get_connector()
+            if connector:
+                result = connector.get_positions()
                 
                 # Bybit API returns retCode: 0 for success
                 if result.get("retCode") == 0:
@@ -382,6 +491,7 @@ class ProductionDataManager:
         # Return fallback data
         return self._get_fallback_positions()
         
+    @timed_call("get_trading_stats")
     def get_trading_stats(self, use_cache: bool = True) -> Dict[str, Any]:
         """Get comprehensive trading statistics"""
         try:
@@ -405,6 +515,7 @@ class ProductionDataManager:
             logger.error(f"Failed to get trading stats: {e}")
             return self._get_fallback_trading_stats()
             
+    @timed_call("get_multiple_symbols_data")
     def get_multiple_symbols_data(self, symbols: List[str], use_cache: bool = True) -> Dict[str, Any]:
         """Get market data for multiple symbols"""
         results = {}
@@ -421,6 +532,7 @@ class ProductionDataManager:
             "timestamp": datetime.now().isoformat(),
             "environment": "production" if self.is_production else "testnet"        }
         
+    @timed_call("get_enhanced_portfolio_details")
     def get_enhanced_portfolio_details(self, use_cache: bool = True) -> Dict[str, Any]:
         """Get enhanced portfolio details with comprehensive information"""
         try:
@@ -769,6 +881,8 @@ class ProductionDataManager:
         return {
             "environment": "production" if self.is_production else "testnet",
             "connection_status": self.connection_status,
+            "connector_ready": self.connector_ready.is_set(),
+            "order_books": self.order_books.status(),
             "cache_size": len(self.data_cache),
             "rate_limit": {
                 "requests_this_minute": self.request_count,
@@ -776,6 +890,7 @@ class ProductionDataManager:
             "timestamp": datetime.now().isoformat()
         }
     
+    @timed_call("get_portfolio_data")
     def get_portfolio_data(self, use_cache: bool = True) -> Dict[str, Any]:
         """Get portfolio data in dashboard-compatible format (for /api/portfolio endpoint)"""
         # Check enhanced portfolio cache first with extended TTL
@@ -816,6 +931,7 @@ class ProductionDataManager:
             logger.error(f"get_portfolio_data error: {e}")
             return self._get_fallback_enhanced_portfolio()
 
+    @timed_call("get_trading_status")
     def get_trading_status(self, use_cache: bool = True) -> Dict[str, Any]:
         """Get trading status for dashboard/API"""
         try:
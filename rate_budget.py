@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+rate_budget.py
+--------------
+Thread-safe token bucket shared by everything that calls the exchange.
+
+Bybit enforces a per-IP request budget. Components that issue requests from
+several threads (range downloads, dashboards, the data manager) draw from the
+same bucket so that together they stay under the limit instead of each one
+sleeping a fixed amount before every request.
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second"""
+
+    def __init__(self, rate: float, burst: int):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = max(1, int(burst))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._blocked_until = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available right now, without waiting"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return False
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Seconds until ``tokens`` would be available (0 if available now)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            blocked = max(0.0, self._blocked_until - now)
+            missing = max(0.0, tokens - self._tokens)
+            return max(blocked, missing / self.rate)
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Block until tokens are available; returns False if ``timeout`` elapses first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.try_acquire(tokens):
+                return True
+            wait = self.wait_time(tokens)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(max(wait, 0.001))
+
+    def block_for(self, seconds: float):
+        """Stop handing out tokens for ``seconds`` (used after a 429 / rate-limit response)"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+_exchange_budget: Optional[TokenBucket] = None
+_exchange_budget_lock = threading.Lock()
+
+
+def get_exchange_rate_budget(config_file: str = "production_api_config.json") -> TokenBucket:
+    """Process-wide bucket sized from ``dashboard_configuration.rate_limits`` in the API config"""
+    global _exchange_budget
+    with _exchange_budget_lock:
+        if _exchange_budget is None:
+            requests_per_minute, burst = 600, 10
+            try:
+                with open(Path(config_file), "r") as f:
+                    limits = json.load(f).get("dashboard_configuration", {}).get("rate_limits", {})
+                requests_per_minute = limits.get("requests_per_minute", requests_per_minute)
+                burst = limits.get("burst_limit", burst)
+            except (OSError, ValueError):
+                pass
+            _exchange_budget = TokenBucket(rate=requests_per_minute / 60.0, burst=burst)
+        return _exchange_budget
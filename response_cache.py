@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+response_cache.py
+-----------------
+HTTP-level caching for the Flask dashboard API.
+
+Three layers, all keyed on the final response body:
+- ``@response_cache.cached(ttl)`` memoizes the serialized body of a GET route
+  for ``ttl`` seconds per path and query string. Concurrent misses on one key
+  run the handler only once.
+- Every 200 response to a GET gets a strong ETag. A matching
+  ``If-None-Match`` turns it into an empty 304.
+- Bodies above ``min_size`` are compressed with brotli (when installed) or
+  gzip, depending on ``Accept-Encoding``. The compressed variants of a cached
+  body are kept with it, so a hit costs neither serialization nor
+  compression.
+
+Streaming responses (SSE, file downloads) are passed through untouched.
+"""
+
+import gzip
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Callable, Dict, Iterator, Optional
+
+from flask import Response, current_app, g, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/plain", "text/csv", "application/javascript")
+
+
+@dataclass
+class CachedBody:
+    body: bytes
+    mimetype: str
+    etag: str
+    expires: float
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+
+@dataclass
+class _Inflight:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    users: int = 0  # threads filling or waiting on this key
+
+
+def _compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=min(level, 11))
+    # mtime=0 keeps the output, and so the ETag, deterministic
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+class ResponseCache:
+    """TTL memoization, ETag validation and compression for a Flask app"""
+
+    def __init__(self, app=None, min_size: int = 512, compress_level: int = 6, max_entries: int = 256):
+        self.min_size = min_size
+        self.compress_level = compress_level
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedBody]" = OrderedDict()
+        self._inflight: Dict[str, _Inflight] = {}  # only keys being filled right now
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self._finalize)
+
+    def cached(self, ttl: float) -> Callable:
+        """Memoize a GET view's serialized body for ``ttl`` seconds"""
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method != "GET":
+                    return view(*args, **kwargs)
+                # The view name keeps in-process calls (no matching URL) apart
+                key = f"{view.__module__}.{view.__name__}:{request.full_path}"
+                entry = self._fresh(key)
+                if entry is None:
+                    with self._key_lock(key):
+                        # Another thread may have filled it while we waited
+                        entry = self._fresh(key)
+                        if entry is None:
+                            self._count("misses")
+                            response = current_app.make_response(view(*args, **kwargs))
+                            if response.status_code != 200 or response.is_streamed:
+                                return response
+                            entry = self._store(key, response, ttl)
+                        else:
+                            self._count("hits")
+                else:
+                    self._count("hits")
+                g._cached_body = entry
+                return Response(entry.body, mimetype=entry.mimetype)
+
+            return wrapper
+
+        return decorator
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "not_modified": self.not_modified}
+
+    def _fresh(self, key: str) -> Optional[CachedBody]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires < time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    @contextmanager
+    def _key_lock(self, key: str) -> Iterator[None]:
+        """Serialize fills of ``key``; the key is forgotten once nobody is filling or waiting"""
+        with self._lock:
+            inflight = self._inflight.setdefault(key, _Inflight())
+            inflight.users += 1
+        try:
+            with inflight.lock:
+                yield
+        finally:
+            with self._lock:
+                inflight.users -= 1
+                if not inflight.users:
+                    del self._inflight[key]
+
+    def _store(self, key: str, response: Response, ttl: float) -> CachedBody:
+        body = response.get_data()
+        entry = CachedBody(body, response.mimetype, hashlib.blake2b(body, digest_size=16).hexdigest(),
+                           time.monotonic() + ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _choose_encoding(self) -> Optional[str]:
+        accepted = request.accept_encodings
+        if brotli is not None and accepted["br"]:
+            return "br"
+        if accepted["gzip"]:
+            return "gzip"
+        return None
+
+    def _finalize(self, response: Response) -> Response:
+        if (request.method not in ("GET", "HEAD") or response.status_code != 200
+                or response.is_streamed or response.direct_passthrough
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+
+        entry: Optional[CachedBody] = g.pop("_cached_body", None)
+        body = entry.body if entry is not None else response.get_data()
+        etag = entry.etag if entry is not None else hashlib.blake2b(body, digest_size=16).hexdigest()
+
+        encoding = self._choose_encoding() if len(body) >= self.min_size else None
+        response.vary.add("Accept-Encoding")
+        if encoding:
+            # Each encoding is its own representation and needs its own strong ETag
+            etag = f"{etag}-{encoding}"
+        response.set_etag(etag)
+
+        if request.if_none_match.contains(etag):
+            self._count("not_modified")
+            response.status_code = 304
+            response.set_data(b"")
+            response.headers.pop("Content-Type", None)
+            return response
+
+        if encoding:
+            encoded = entry.encoded.get(encoding) if entry is not None else None
+            if encoded is None:
+                encoded = _compress(body, encoding, self.compress_level)
+                if entry is not None:
+                    entry.encoded[encoding] = encoded
+            response.set_data(encoded)
+            response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+sharded_oms.py
+--------------
+Symbol-sharded order management across worker processes.
+
+Orders are hash-partitioned by symbol over N worker processes. Each worker
+owns a complete OrderManagementSystem for its symbols: books, matching
+engines, scheduler, state and its own journal database. It runs without the
+OMS threads, from one loop that takes commands, works off due orders and
+ticks its simulated markets. Nothing is shared between shards except a
+small shared-memory counter table. Each shard writes only its own row of
+daily volume, gross exposure and fill counts, and reads the other rows
+before its pre-trade risk checks, so the portfolio-wide daily volume and
+concentration limits still apply across shards. Peer counters are
+published once per command batch, so a cross-shard limit can be overrun by
+about one batch.
+
+ShardedOMS is the thin front end. It routes submits and cancels to the
+owning shard over multiprocessing queues and resolves replies on a reader
+thread. Portfolio totals are read straight from the counter table, with no
+round trip to the workers.
+
+    oms = ShardedOMS(shards=4)
+    ok, message = oms.submit_order(order)
+    print(oms.risk_exposure())
+    oms.shutdown()
+
+    python sharded_oms.py --shards 1 2 4 --orders 20000
+"""
+
+import argparse
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import Future
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from advanced_order_management_system import BlotterPage, OrderManagementSystem, OrderRequest, OrderState
+from volume_profile import offline_volume_profile_service
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ("day", "daily_volume", "gross_exposure", "orders", "fills", "filled_notional")
+_DAY, _DAILY_VOLUME, _GROSS_EXPOSURE, _ORDERS, _FILLS, _NOTIONAL = range(len(COUNTER_FIELDS))
+
+MAX_COMMAND_BATCH = 500  # commands taken per loop before due orders are executed
+
+
+def shard_for(symbol: str, shards: int, placement: Optional[Dict[str, int]] = None) -> int:
+    """Owning shard of a symbol: ``placement`` if it names one, else a hash stable across processes"""
+    if placement and symbol in placement:
+        return placement[symbol] % shards
+    return zlib.crc32(symbol.encode()) % shards
+
+
+class ShardCounters:
+    """Per-shard rows of COUNTER_FIELDS in shared memory.
+
+    Each row has a single writer, its shard, so no lock is needed: readers
+    may see a row mid-update, which for risk limits is no worse than reading
+    it a moment earlier.
+    """
+
+    def __init__(self, array: Any, shards: int):
+        self.array = array
+        self.shards = shards
+        self.width = len(COUNTER_FIELDS)
+
+    def publish(self, shard: int, oms: OrderManagementSystem):
+        today = date.today()
+        row = shard * self.width
+        risk = oms.risk_manager
+        self.array[row + _DAY] = today.toordinal()
+        self.array[row + _DAILY_VOLUME] = risk.daily_volumes[today]
+        self.array[row + _GROSS_EXPOSURE] = risk.gross_exposure
+        self.array[row + _ORDERS] = len(oms.orders)
+        self.array[row + _FILLS] = oms.execution_totals["count"]
+        self.array[row + _NOTIONAL] = oms.execution_totals["notional"]
+
+    def row(self, shard: int) -> Dict[str, float]:
+        start = shard * self.width
+        return dict(zip(COUNTER_FIELDS, self.array[start:start + self.width]))
+
+    def peers(self, shard: int) -> Tuple[float, float]:
+        """Today's volume and gross exposure booked by every other shard"""
+        today = date.today().toordinal()
+        daily_volume = gross_exposure = 0.0
+        for other in range(self.shards):
+            if other == shard:
+                continue
+            row = other * self.width
+            if self.array[row + _DAY] == today:
+                daily_volume += self.array[row + _DAILY_VOLUME]
+            gross_exposure += self.array[row + _GROSS_EXPOSURE]
+        return daily_volume, gross_exposure
+
+    def totals(self) -> Dict[str, float]:
+        today = date.today().toordinal()
+        rows = [self.row(shard) for shard in range(self.shards)]
+        return {
+            "daily_volume": sum(row["daily_volume"] for row in rows if row["day"] == today),
+            "gross_exposure": sum(row["gross_exposure"] for row in rows),
+            "orders": int(sum(row["orders"] for row in rows)),
+            "fills": int(sum(row["fills"] for row in rows)),
+            "filled_notional": sum(row["filled_notional"] for row in rows),
+        }
+
+
+def _run_shard(shard: int, shards: int, placement: Optional[Dict[str, int]], commands: Any, results: Any,
+               counter_array: Any, db_path: str, recover: bool, tick_interval: Optional[float], log_level: int,
+               refresh_volume_profiles: bool = True):
+    """Worker process: one OMS, driven by commands from the front end"""
+    logging.basicConfig(level=log_level, force=True)
+    volume_profiles = None if refresh_volume_profiles else offline_volume_profile_service()
+    oms = OrderManagementSystem(db_path=db_path, recover=recover, start_threads=False,
+                                volume_profiles=volume_profiles)
+    counters = ShardCounters(counter_array, shards)
+    symbols = {symbol for symbol in OrderManagementSystem.SIMULATED_BASE_PRICES
+               if shard_for(symbol, shards, placement) == shard}
+    symbols.update(order.symbol for order in oms.orders.values())
+    next_tick = 0.0
+    stop_request = None
+
+    def submit(order: OrderRequest) -> Tuple[bool, str]:
+        risk = oms.risk_manager
+        risk.peer_daily_volume, risk.peer_gross_exposure = counters.peers(shard)
+        if tick_interval and order.symbol not in symbols:
+            symbols.add(order.symbol)
+            oms.simulate_market_tick([order.symbol])  # new market: quote it before its first order runs
+        return oms.submit_order(order)
+
+    def drain():
+        while True:
+            order = oms.order_queue.pop(timeout=0)
+            if order is None:
+                return
+            try:
+                oms._execute_scheduled(order)
+            except Exception as e:
+                logger.error(f"Shard {shard} execution error: {e}")
+
+    def sync(_):
+        drain()
+        counters.publish(shard, oms)
+        return counters.row(shard)
+
+    handlers = {
+        "submit": submit,
+        "submit_many": lambda orders: [submit(order) for order in orders],
+        "cancel": oms.cancel_order,
+        "state": oms.order_states.get,
+        "query": lambda filters: oms.query_orders(**filters),
+        "sync": sync,
+    }
+
+    while stop_request is None:
+        now = time.time()
+        if tick_interval and now >= next_tick:
+            oms.simulate_market_tick(sorted(symbols))
+            next_tick = now + tick_interval
+        wait = 0.05
+        if tick_interval:
+            wait = min(wait, max(next_tick - now, 0.0))
+        next_release = oms.order_queue.stats()["next_release_in"]
+        if next_release is not None:
+            wait = min(wait, max(next_release, 0.0))
+
+        batch = []
+        try:
+            batch.append(commands.get(timeout=wait))
+            while len(batch) < MAX_COMMAND_BATCH:
+                batch.append(commands.get_nowait())
+        except queue.Empty:
+            pass
+
+        for op, request_id, payload in batch:
+            if op == "stop":
+                stop_request = request_id
+                continue
+            try:
+                results.put((request_id, True, handlers[op](payload)))
+            except Exception as e:
+                results.put((request_id, False, f"{type(e).__name__}: {e}"))
+        drain()
+        counters.publish(shard, oms)
+
+    oms.shutdown()
+    counters.publish(shard, oms)
+    results.put((stop_request, True, None))
+
+
+class ShardedOMS:
+    """Front end for an OMS hash-partitioned by symbol over worker processes"""
+
+    def __init__(self, shards: Optional[int] = None, db_dir: str = "data/oms_shards", recover: bool = True,
+                 tick_interval: Optional[float] = 1.0, start_method: str = "spawn",
+                 log_level: int = logging.WARNING, placement: Optional[Dict[str, int]] = None,
+                 refresh_volume_profiles: bool = True):
+        self.shards = shards or os.cpu_count() or 1
+        # Explicit symbol -> shard assignments, e.g. to balance a handful of busy symbols
+        self.placement = dict(placement or {})
+        context = multiprocessing.get_context(start_method)
+        self.counters = ShardCounters(context.RawArray('d', self.shards * len(COUNTER_FIELDS)), self.shards)
+        self._commands = [context.Queue() for _ in range(self.shards)]
+        self._results = context.Queue()
+        self._pending: Dict[int, Future] = {}
+        self._request_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._order_shard: Dict[str, int] = {}
+
+        Path(db_dir).mkdir(parents=True, exist_ok=True)
+        self._workers = []
+        for shard in range(self.shards):
+            db_path = str(Path(db_dir) / f"orders-shard{shard}-of-{self.shards}.db")
+            worker = context.Process(
+                target=_run_shard, name=f"oms-shard-{shard}", daemon=True,
+                args=(shard, self.shards, self.placement, self._commands[shard], self._results, self.counters.array, db_path,
+                      recover, tick_interval, log_level, refresh_volume_profiles))
+            worker.start()
+            self._workers.append(worker)
+        self._reader = threading.Thread(target=self._read_results, name="sharded-oms-results", daemon=True)
+        self._reader.start()
+        logger.info(f"Sharded OMS started with {self.shards} worker processes")
+
+    def _read_results(self):
+        while True:
+            message = self._results.get()
+            if message is None:
+                return
+            request_id, ok, value = message
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+
+    def _send(self, shard: int, op: str, payload: Any) -> Future:
+        future = Future()
+        with self._lock:
+            request_id = next(self._request_ids)
+            self._pending[request_id] = future
+        self._commands[shard].put((op, request_id, payload))
+        return future
+
+    def shard_for(self, symbol: str) -> int:
+        return shard_for(symbol, self.shards, self.placement)
+
+    def submit_order_async(self, order: OrderRequest) -> Future:
+        """Route an order to its shard; the future resolves to submit_order's (ok, message)"""
+        shard = self.shard_for(order.symbol)
+        self._order_shard[order.order_id] = shard
+        return self._send(shard, "submit", order)
+
+    def submit_order(self, order: OrderRequest, timeout: Optional[float] = 30) -> Tuple[bool, str]:
+        return self.submit_order_async(order).result(timeout)
+
+    def submit_orders(self, orders: List[OrderRequest], timeout: Optional[float] = 30) -> List[Tuple[bool, str]]:
+        """Submit a batch with one message per shard; results follow the input order"""
+        by_shard: Dict[int, List[int]] = defaultdict(list)
+        for position, order in enumerate(orders):
+            shard = self.shard_for(order.symbol)
+            self._order_shard[order.order_id] = shard
+            by_shard[shard].append(position)
+        futures = {shard: self._send(shard, "submit_many", [orders[i] for i in positions])
+                   for shard, positions in by_shard.items()}
+        results: List[Optional[Tuple[bool, str]]] = [None] * len(orders)
+        for shard, positions in by_shard.items():
+            for position, result in zip(positions, futures[shard].result(timeout)):
+                results[position] = result
+        return results
+
+    def cancel_order(self, order_id: str, timeout: Optional[float] = 30) -> Tuple[bool, str]:
+        shard = self._order_shard.get(order_id)
+        if shard is not None:
+            return self._send(shard, "cancel", order_id).result(timeout)
+        # Submitted before a restart: ask every shard
+        futures = [self._send(shard, "cancel", order_id) for shard in range(self.shards)]
+        replies = [future.result(timeout) for future in futures]
+        return next((reply for reply in replies if reply[1] != "Order not found"), replies[0])
+
+    def order_state(self, order_id: str, timeout: Optional[float] = 30) -> Optional[OrderState]:
+        shard = self._order_shard.get(order_id)
+        shards = [shard] if shard is not None else range(self.shards)
+        for future in [self._send(shard, "state", order_id) for shard in shards]:
+            state = future.result(timeout)
+            if state is not None:
+                return state
+        return None
+
+    def query_orders(self, timeout: Optional[float] = 30, **filters) -> BlotterPage:
+        """Blotter query across shards; a symbol filter goes to its shard only"""
+        if "symbol" in filters and filters["symbol"] is not None:
+            return self._send(self.shard_for(filters["symbol"]), "query", filters).result(timeout)
+        offset, limit = filters.pop("offset", 0), filters.pop("limit", 50)
+        pages = [future.result(timeout) for future in
+                 [self._send(shard, "query", {**filters, "offset": 0, "limit": offset + limit})
+                  for shard in range(self.shards)]]
+        rows = sorted((row for page in pages for row in page.rows), key=lambda row: row[0].created_at,
+                      reverse=True)
+        return BlotterPage(rows=rows[offset:offset + limit], offset=offset, limit=limit,
+                           total=None, has_more=len(rows) > offset + limit or any(page.has_more for page in pages))
+
+    def sync(self, timeout: Optional[float] = 30) -> List[Dict[str, float]]:
+        """Wait until every shard has worked off its commands and due orders; returns their counters"""
+        return [future.result(timeout) for future in
+                [self._send(shard, "sync", None) for shard in range(self.shards)]]
+
+    def risk_exposure(self) -> Dict[str, float]:
+        """Portfolio totals from the shared counters"""
+        return self.counters.totals()
+
+    def shutdown(self, timeout: float = 30):
+        futures = [self._send(shard, "stop", None) for shard in range(self.shards)]
+        for future in futures:
+            try:
+                future.result(timeout)
+            except Exception as e:
+                logger.warning(f"Shard did not stop cleanly: {e}")
+        for worker in self._workers:
+            worker.join(timeout)
+        self._results.put(None)
+        self._reader.join(timeout)
+
+
+def benchmark(shard_counts: List[int], orders: int = 20000, window: int = 1000,
+              symbols: Optional[List[str]] = None, seed: int = 0) -> Dict[int, Dict[str, float]]:
+    """Orders per second through submit, risk checks and execution for each shard count"""
+    import tempfile
+    from oms_benchmark import OMSBenchmarkConfig, OrderStream
+
+    symbols = symbols or list(OrderManagementSystem.SIMULATED_BASE_PRICES)
+    config = OMSBenchmarkConfig(orders=orders, symbols=symbols, seed=seed)
+    prices = {symbol: float(OrderManagementSystem.SIMULATED_BASE_PRICES.get(symbol, 100)) for symbol in symbols}
+    results = {}
+    for shards in shard_counts:
+        stream = OrderStream(config, prices)
+        stream_orders = [stream.next_order() for _ in range(orders)]
+        with tempfile.TemporaryDirectory() as tmp:
+            # Round-robin placement keeps the few benchmark symbols evenly spread
+            placement = {symbol: i % shards for i, symbol in enumerate(symbols)}
+            oms = ShardedOMS(shards=shards, db_dir=tmp, recover=False, placement=placement,
+                             refresh_volume_profiles=False)
+            oms.sync(timeout=120)  # workers up and markets quoted
+            started = time.perf_counter()
+            # Keep up to ``window`` orders per shard unacknowledged, as concurrent clients would
+            in_flight: List[Future] = []
+            for order in stream_orders:
+                in_flight.append(oms.submit_order_async(order))
+                if len(in_flight) >= window * shards:
+                    for future in in_flight:
+                        future.result(60)
+                    in_flight = []
+            for future in in_flight:
+                future.result(60)
+            counters = oms.sync(timeout=120)
+            elapsed = time.perf_counter() - started
+            totals = oms.risk_exposure()
+            oms.shutdown()
+        results[shards] = {
+            "orders_per_second": orders / elapsed,
+            "fills": totals["fills"],
+            "duration_s": elapsed,
+            "orders_per_shard": [int(row["orders"]) for row in counters],
+        }
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the symbol-sharded OMS")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--symbols", nargs="+")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, force=True)
+    results = benchmark(args.shards, args.orders, symbols=args.symbols)
+    base = results[args.shards[0]]["orders_per_second"]
+    for shards, result in results.items():
+        print(f"{shards} shard(s): {result['orders_per_second']:8.0f} orders/s "
+              f"({result['orders_per_second'] / base:.2f}x), {result['fills']} fills, "
+              f"orders per shard {result['orders_per_shard']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
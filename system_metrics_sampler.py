@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+system_metrics_sampler.py
+-------------------------
+Background sampler for host and process metrics.
+
+Request handlers used to call ``psutil.cpu_percent(interval=1)``, which sleeps
+for a whole second inside the request, and ``virtual_memory()`` /
+``disk_usage()`` several times per response. Here one daemon thread samples
+CPU, memory, disk and this process at a fixed cadence into a bounded ring,
+and readers get the latest sample, a window aggregate or a short history for
+sparklines without touching psutil.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, List, Optional, Sequence
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DISK_PATH = "C:\\" if os.name == "nt" else "/"
+
+
+@dataclass
+class SystemSample:
+    timestamp: float  # epoch seconds
+    cpu_percent: float
+    memory_percent: float
+    memory_available: int
+    memory_total: int
+    disk_percent: float
+    disk_free: int
+    disk_total: int
+    process_count: int
+    process_rss: int
+    process_cpu_percent: float
+    process_threads: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+NUMERIC_FIELDS = [f.name for f in fields(SystemSample) if f.name != "timestamp"]
+
+
+class SystemMetricsSampler:
+    """Samples system metrics every ``interval`` seconds into a ring of ``history_size`` samples"""
+
+    def __init__(self, interval: float = 2.0, history_size: int = 300, disk_path: str = DEFAULT_DISK_PATH):
+        self.interval = interval
+        self.disk_path = disk_path
+        self.boot_time = psutil.boot_time()
+        self.started_at = time.time()
+        self._samples: deque = deque(maxlen=history_size)
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sample_lock = threading.Lock()
+
+        # Prime the non-blocking CPU counters; the first real reading is then
+        # the utilisation since construction rather than a meaningless 0.0
+        psutil.cpu_percent(interval=None)
+        self._process.cpu_percent(interval=None)
+
+    def start(self) -> "SystemMetricsSampler":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="system-metrics-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sample_now()
+            except Exception as e:
+                logger.warning(f"System metrics sample failed: {e}")
+            self._stop.wait(self.interval)
+
+    def sample_now(self) -> SystemSample:
+        """Take one sample immediately (non-blocking CPU readings) and store it"""
+        with self._sample_lock:
+            memory = psutil.virtual_memory()
+            disk = psutil.disk_usage(self.disk_path)
+            with self._process.oneshot():
+                process_rss = self._process.memory_info().rss
+                process_cpu = self._process.cpu_percent(interval=None)
+                process_threads = self._process.num_threads()
+            sample = SystemSample(
+                timestamp=time.time(),
+                cpu_percent=psutil.cpu_percent(interval=None),
+                memory_percent=memory.percent,
+                memory_available=memory.available,
+                memory_total=memory.total,
+                disk_percent=disk.percent,
+                disk_free=disk.free,
+                disk_total=disk.total,
+                process_count=len(psutil.pids()),
+                process_rss=process_rss,
+                process_cpu_percent=process_cpu,
+                process_threads=process_threads,
+            )
+            self._samples.append(sample)
+            return sample
+
+    def latest(self) -> SystemSample:
+        """Most recent sample; samples once synchronously if the thread has not run yet"""
+        try:
+            return self._samples[-1]
+        except IndexError:
+            return self.sample_now()
+
+    def samples(self, seconds: Optional[float] = None) -> List[SystemSample]:
+        snapshot = list(self._samples)
+        if seconds is None:
+            return snapshot
+        cutoff = time.time() - seconds
+        return [s for s in snapshot if s.timestamp >= cutoff]
+
+    def window(self, seconds: float = 60, metrics: Sequence[str] = ("cpu_percent", "memory_percent")) -> Dict[str, Any]:
+        """min/max/mean of ``metrics`` over the last ``seconds``"""
+        window = self.samples(seconds) or [self.latest()]
+        result = {"samples": len(window), "seconds": seconds}
+        for name in metrics:
+            values = [getattr(s, name) for s in window]
+            result[name] = {"min": min(values), "max": max(values), "mean": sum(values) / len(values)}
+        return result
+
+    def history(self, seconds: Optional[float] = None,
+                metrics: Sequence[str] = ("cpu_percent", "memory_percent", "disk_percent")) -> Dict[str, List]:
+        """Column-oriented history for sparkline charts"""
+        window = self.samples(seconds)
+        series = {"timestamp": [s.timestamp for s in window]}
+        for name in metrics:
+            if name not in NUMERIC_FIELDS:
+                raise ValueError(f"Unknown metric: {name}")
+            series[name] = [getattr(s, name) for s in window]
+        return series
+
+    def uptime_seconds(self) -> float:
+        return time.time() - self.boot_time
+
+
+_sampler: Optional[SystemMetricsSampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_system_metrics_sampler() -> SystemMetricsSampler:
+    """Process-wide sampler, started on first use"""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = SystemMetricsSampler().start()
+        return _sampler
@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+from flask import Flask, jsonify, request
+
+from api_batch import BatchError, parse_batch, run_batch
+from response_cache import ResponseCache
+
+
+def _app():
+    app = Flask(__name__)
+    cache = ResponseCache(app)
+    calls = {"portfolio": 0}
+    lock = threading.Lock()
+
+    @app.route("/api/portfolio")
+    @cache.cached(ttl=60)
+    def portfolio_status():
+        with lock:
+            calls["portfolio"] += 1
+        time.sleep(0.2)
+        return jsonify({"total_value": 100})
+
+    @app.route("/core/status")
+    def core_status():
+        time.sleep(0.2)
+        return jsonify({"ok": True})
+
+    @app.route("/api/market/orderbook/<symbol>")
+    def market_order_book(symbol):
+        return jsonify({"symbol": symbol, "depth": request.args.get("depth", type=int)})
+
+    resources = {"portfolio": "portfolio_status", "core_status": "core_status", "orderbook": "market_order_book"}
+    return app, resources, calls
+
+
+def test_batch_runs_concurrently_and_shares_duplicates():
+    app, resources, calls = _app()
+    items = parse_batch({"resources": ["portfolio", "core_status", {"name": "portfolio", "key": "again"}]})
+    started = time.perf_counter()
+    results = run_batch(app, items, resources)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.35
+    assert calls["portfolio"] == 1
+    assert results["portfolio"] == results["again"] == {"status": 200, "data": {"total_value": 100}}
+    assert results["core_status"]["data"] == {"ok": True}
+
+
+def test_batch_params_and_errors():
+    app, resources, _ = _app()
+    items = parse_batch(["missing", {"name": "orderbook", "params": {"symbol": "BTCUSDT", "depth": 5}},
+                         {"name": "orderbook", "key": "no_symbol"}])
+    results = run_batch(app, items, resources)
+    assert results["orderbook"]["data"] == {"symbol": "BTCUSDT", "depth": 5}
+    assert results["missing"]["status"] == 404
+    assert results["no_symbol"]["status"] == 400
+
+    with pytest.raises(BatchError):
+        parse_batch({"resources": ["portfolio", "portfolio"]})
+    with pytest.raises(BatchError):
+        parse_batch({"resources": []})
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the dashboard API load-testing harness
+"""
+import time
+
+from flask import Flask, jsonify
+
+from api_load_test import (
+    LoadTestConfig, append_history, find_regressions, load_history, percentile, run_load_test,
+    serve_app_in_thread
+)
+
+
+def _app():
+    app = Flask(__name__)
+
+    @app.route("/fast")
+    def fast():
+        return jsonify({"ok": True})
+
+    @app.route("/slow")
+    def slow():
+        time.sleep(0.05)
+        return jsonify({"ok": True})
+
+    @app.route("/broken")
+    def broken():
+        return jsonify({"error": "boom"}), 500
+
+    return app
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 95) == 0.0
+
+
+def test_load_test_reports_per_endpoint_latency_and_errors(tmp_path):
+    server, base_url = serve_app_in_thread(_app())
+    try:
+        config = LoadTestConfig(base_url=base_url, concurrency=4, duration=5, max_requests=120,
+                                mix=[("/fast", 5), ("/slow", 2), ("/broken", 1)])
+        metrics = run_load_test(config)
+    finally:
+        server.shutdown()
+
+    assert metrics["requests"] == 120
+    endpoints = metrics["endpoints"]
+    assert endpoints["/slow"]["p50_ms"] >= 50
+    assert endpoints["/fast"]["p50_ms"] < endpoints["/slow"]["p50_ms"]
+    assert endpoints["/broken"]["error_rate"] == 1.0
+    assert 0 < metrics["error_rate"] < 1
+
+    history_file = tmp_path / "history.json"
+    append_history(metrics, path=history_file)
+    assert load_history(history_file)[-1]["name"] == "api_load"
+
+
+def test_regression_detection_flags_slower_p95():
+    endpoint = {"requests": 10, "errors": 0, "error_rate": 0.0, "p50_ms": 20, "p95_ms": 40,
+                "p99_ms": 50, "mean_ms": 25, "max_ms": 60}
+    baseline = {"concurrency": 4, "throughput_rps": 100, "endpoints": {"/api/risk/metrics": endpoint}}
+    current = {"concurrency": 4, "throughput_rps": 95,
+               "endpoints": {"/api/risk/metrics": dict(endpoint, p95_ms=1000)}}
+
+    regressions = find_regressions(current, [{"name": "api_load", "metrics": baseline}])
+
+    assert len(regressions) == 1 and "/api/risk/metrics" in regressions[0]
@@ -0,0 +1,78 @@
+import pytest
+from flask import Flask, jsonify
+
+from api_metrics import MetricsRegistry, instrument_app, instrument_exchange_client, timed_call
+
+
+def test_histogram_and_counter_render_prometheus_text():
+    registry = MetricsRegistry()
+    latency = registry.histogram("demo_seconds", "Demo latency", ["route"], buckets=(0.1, 1.0))
+    latency.observe(0.05, route="/a")
+    latency.observe(0.1, route="/a")
+    latency.observe(3, route="/a")
+    registry.counter("demo_total", "Demo counter", ["route"]).inc(route='/q"x')
+
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{route="/a"} 3' in text
+    assert 'demo_total{route="/q\\"x"} 1' in text
+
+    with pytest.raises(ValueError):
+        latency.observe(1, path="/a")
+    assert registry.histogram("demo_seconds", "Demo latency", ["route"]) is latency
+
+
+def test_flask_middleware_records_routes_errors_and_sizes():
+    registry = MetricsRegistry()
+    app = Flask(__name__)
+    instrument_app(app, registry)
+
+    @app.route("/api/orderbook/<symbol>")
+    def book(symbol):
+        return jsonify({"symbol": symbol})
+
+    @app.route("/api/broken")
+    def broken():
+        return jsonify({"error": "nope"}), 500
+
+    client = app.test_client()
+    client.get("/api/orderbook/BTCUSDT")
+    client.get("/api/orderbook/ETHUSDT")
+    client.get("/api/broken")
+    client.get("/missing")
+
+    text = registry.render()
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/orderbook/<symbol>",status="200"} 2' in text
+    assert 'http_request_errors_total{route="/api/broken",status="500"} 1' in text
+    assert 'http_request_errors_total{route="<unmatched>",status="404"} 1' in text
+    assert 'http_requests_in_flight{route="/api/orderbook/<symbol>"} 0' in text
+    assert 'http_response_size_bytes_count{route="/api/orderbook/<symbol>"} 2' in text
+
+
+def test_outbound_hooks_time_exchange_and_data_manager_calls():
+    registry = MetricsRegistry()
+
+    class FakeClient:
+        def add_timing_hook(self, hook):
+            self.hook = hook
+
+    client = FakeClient()
+    instrument_exchange_client(client, registry)
+    client.hook("GET", "https://api.bybit.com/v5/market/tickers?symbol=BTCUSDT", 200, 0.12, None)
+    client.hook("GET", "https://api.bybit.com/v5/market/tickers?symbol=ETHUSDT", None, 1.5, TimeoutError())
+
+    @timed_call("get_market_data", registry)
+    def get_market_data():
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        get_market_data()
+
+    text = registry.render()
+    assert 'exchange_request_duration_seconds_count{method="GET",endpoint="/v5/market/tickers",status="200"} 1' in text
+    assert 'exchange_request_errors_total{method="GET",endpoint="/v5/market/tickers"} 1' in text
+    assert 'data_manager_call_duration_seconds_count{method="get_market_data"} 1' in text
+    assert 'data_manager_call_errors_total{method="get_market_data"} 1' in text
@@ -0,0 +1,116 @@
+import itertools
+import sqlite3
+import time
+from datetime import datetime
+from typing import Iterator
+
+import pytest
+
+from advanced_order_management_system import (
+    AlgorithmicExecutor, ExecutionAlgorithm, MarketData, OrderManagementSystem, OrderStatus, OrderType,
+)
+from test_order_database import _order
+
+
+def test_iceberg_slices_are_built_on_demand():
+    parent = _order(quantity=10000.0, algorithm=ExecutionAlgorithm.ICEBERG)
+    slices = AlgorithmicExecutor().iceberg_slices(parent, display_size=1.0)
+    assert isinstance(slices, Iterator)
+    first_three = list(itertools.islice(slices, 3))
+    assert [child.order_id for child in first_three] == [f"{parent.order_id}_ICE_{i}" for i in (1, 2, 3)]
+    assert first_three[-1].metadata["hidden_quantity"] == 9997.0
+
+    # A live remaining-quantity source resizes the next slice
+    left = [0.4]
+    live = AlgorithmicExecutor().iceberg_slices(parent, display_size=1.0, remaining=lambda: left[0])
+    assert next(live).quantity == 0.4
+    left[0] = 0.0
+    assert next(live, None) is None
+
+
+def test_twap_resizes_to_remaining_and_prices_from_live_quote():
+    parent = _order(quantity=1.0, algorithm=ExecutionAlgorithm.TWAP)
+    parent.price = None
+    left = [1.0]
+    quote = MarketData("BTCUSDT", 44990.0, 45010.0, 3.0, 3.0, 45000.0, 100.0, datetime.now())
+    slices = AlgorithmicExecutor().twap_slices(parent, duration_minutes=60, remaining=lambda: left[0],
+                                               quote=lambda: quote)
+    first = next(slices)
+    assert first.quantity == 1.0 / 20
+    assert (first.order_type, first.price, first.time_in_force) == (OrderType.LIMIT, 45010.0, "IOC")
+
+    # The first slice went unfilled: the 19 remaining slices share the whole parent
+    second = next(slices)
+    assert second.quantity == 1.0 / 19
+    assert (second.created_at - first.created_at).total_seconds() == 180
+    assert len(AlgorithmicExecutor().execute_twap(_order(quantity=1.0, algorithm=ExecutionAlgorithm.TWAP))) == 20
+
+
+def test_oms_keeps_one_working_slice_per_parent(tmp_path):
+    oms = OrderManagementSystem(db_path=str(tmp_path / "orders.db"), start_threads=False)
+    oms.order_books.on_message(oms._simulated_book_message("BTCUSDT", 45000.0, 1))
+    oms._refresh_market_data("BTCUSDT", 45000.0, volume=1000.0)
+    oms._refresh_liquidity("BTCUSDT")
+
+    big = _order(quantity=10000.0, algorithm=ExecutionAlgorithm.ICEBERG)
+    big.price, big.display_quantity = 50.0, 1.0
+    assert oms.submit_order(big)[0]
+    assert len(oms.order_queue) == 1 and len(oms.order_states) == 2
+
+    parent = _order(quantity=0.3, algorithm=ExecutionAlgorithm.ICEBERG)
+    parent.price, parent.display_quantity = 46000.0, 0.1
+    assert oms.submit_order(parent)[0]
+    oms.cancel_order(big.order_id)
+    while True:
+        child = oms.order_queue.pop(timeout=0)
+        if child is None:
+            break
+        oms._execute_scheduled(child)
+
+    assert oms.order_states[parent.order_id].status == OrderStatus.FILLED
+    assert oms.order_states[f"{parent.order_id}_ICE_3"].status == OrderStatus.FILLED
+    assert f"{parent.order_id}_ICE_4" not in oms.order_states
+    assert not oms._child_streams and not oms._active_children
+    oms.shutdown()
+
+
+
+def test_cancelling_a_parent_cancels_its_resting_slice(tmp_path):
+    oms = OrderManagementSystem(db_path=str(tmp_path / "orders.db"), start_threads=False)
+    oms.order_books.on_message(oms._simulated_book_message("BTCUSDT", 45000.0, 1))
+    oms._refresh_market_data("BTCUSDT", 45000.0, volume=1000.0)
+    oms._refresh_liquidity("BTCUSDT")
+
+    parent = _order(quantity=3.0, algorithm=ExecutionAlgorithm.ICEBERG)
+    parent.price, parent.display_quantity = 50.0, 1.0  # far below the market: the slice rests
+    assert oms.submit_order(parent)[0]
+    oms._execute_scheduled(oms.order_queue.pop(timeout=0))
+    child_id = f"{parent.order_id}_ICE_1"
+    assert oms.order_states[child_id].status == OrderStatus.SUBMITTED and child_id in oms._working
+
+    assert oms.cancel_order(parent.order_id)[0]
+    assert oms.order_states[child_id].status == OrderStatus.CANCELLED
+    assert oms.query_orders(status=OrderStatus.PENDING).total == 0
+    assert not oms._working and not oms._child_parent and not oms._active_children
+    assert oms.wait_persisted(child_id, timeout=5)
+    oms.shutdown()
+    with sqlite3.connect(str(tmp_path / "orders.db")) as conn:
+        (status,) = conn.execute("SELECT status FROM order_states WHERE order_id = ?", (child_id,)).fetchone()
+    assert status == OrderStatus.CANCELLED.value
+
+@pytest.mark.performance
+def test_large_parents_slice_and_submit_in_constant_time(tmp_path):
+    parent = _order(quantity=1_000_000.0, algorithm=ExecutionAlgorithm.ICEBERG)
+    started = time.perf_counter()
+    list(itertools.islice(AlgorithmicExecutor().iceberg_slices(parent, display_size=1.0), 3))
+    assert time.perf_counter() - started < 0.01
+
+    oms = OrderManagementSystem(db_path=str(tmp_path / "orders.db"), recover=False, start_threads=False)
+    oms.order_books.on_message(oms._simulated_book_message("BTCUSDT", 45000.0, 1))
+    oms._refresh_market_data("BTCUSDT", 45000.0, volume=1000.0)
+    big = _order(quantity=10000.0, algorithm=ExecutionAlgorithm.ICEBERG)
+    big.price, big.display_quantity = 50.0, 1.0
+    started = time.perf_counter()
+    assert oms.submit_order(big)[0]
+    assert time.perf_counter() - started < 0.05
+    oms.shutdown()
@@ -0,0 +1,79 @@
+import json
+import threading
+
+from dashboard_event_stream import DashboardStreamClient, EventHub, sse_stream
+
+
+def _parse(chunk):
+    fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+    return fields["event"], json.loads(fields["data"])
+
+
+def test_publish_sends_only_changed_keys():
+    hub = EventHub()
+    first = hub.publish("portfolio", {"total_value": 100, "positions": []})
+    assert first.kind == "snapshot"
+    assert hub.publish("portfolio", {"total_value": 100, "positions": []}) is None
+
+    delta = hub.publish("portfolio", {"total_value": 105, "positions": []})
+    assert delta.kind == "delta"
+    assert delta.data == {"total_value": 105}
+
+    removed = hub.publish("portfolio", {"total_value": 105})
+    assert removed.data == {} and removed.removed == ["positions"]
+
+
+def test_stream_filters_topics_and_resumes_after_last_event_id():
+    hub = EventHub()
+    hub.publish("portfolio", {"total_value": 100})
+    hub.publish("alerts", {"alerts": []})
+
+    stream = sse_stream(hub, ["portfolio"], heartbeat=0.01)
+    assert next(stream).startswith("retry:")
+    assert _parse(next(stream)) == ("portfolio", {"kind": "snapshot", "data": {"total_value": 100}})
+    hub.publish("alerts", {"alerts": [{"level": "info"}]})
+    hub.publish("portfolio", {"total_value": 101})
+    assert _parse(next(stream)) == ("portfolio", {"kind": "delta", "data": {"total_value": 101}})
+    assert next(stream) == ": keep-alive\n\n"
+
+    # A reconnecting client only gets what it missed
+    resumed = sse_stream(hub, ["alerts"], last_event_id=2, heartbeat=0.01)
+    next(resumed)
+    topic, body = _parse(next(resumed))
+    assert topic == "alerts" and body["data"] == {"alerts": [{"level": "info"}]}
+
+
+def test_client_merges_deltas_into_local_state():
+    hub = EventHub()
+    hub.publish("portfolio", {"total_value": 100, "positions": [1]})
+    stream = sse_stream(hub, heartbeat=0.01)
+    next(stream)
+    snapshot = next(stream)
+    hub.publish("portfolio", {"total_value": 110})
+    delta = next(stream)
+
+    client = DashboardStreamClient.__new__(DashboardStreamClient)
+    client._state, client._updated, client._last_id = {}, {}, None
+    client._cond, client._stop, client.version = threading.Condition(), threading.Event(), 0
+    client._consume((snapshot + delta).split("\n"))
+
+    assert client.get("portfolio") == {"total_value": 110}
+    assert client.version == 2
+    assert client._last_id == "2"
+    assert client.wait_for_update(1, timeout=0)
+
+
+def test_other_topics_neither_wake_the_stream_nor_hide_later_events():
+    hub = EventHub()
+    hub.publish("portfolio", {"total_value": 100})
+    hub.publish("alerts", {"alerts": []})
+    assert hub.events_after(2, {"portfolio"}, timeout=0) == ([], 2)
+    hub.publish("alerts", {"alerts": [1]})
+    # Filtered-out events are covered by seen_id, so the caller resumes after them
+    assert hub.events_after(2, {"portfolio"}, timeout=0) == ([], 3)
+
+    stream = sse_stream(hub, ["portfolio"], last_event_id=3, heartbeat=5)
+    next(stream)
+    threading.Timer(0.05, hub.publish, args=("alerts", {"alerts": [2]})).start()
+    threading.Timer(0.1, hub.publish, args=("portfolio", {"total_value": 101})).start()
+    assert _parse(next(stream)) == ("portfolio", {"kind": "delta", "data": {"total_value": 101}})
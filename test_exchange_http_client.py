@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled exchange HTTP client against a local HTTP server
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from exchange_http_client import ExchangeHTTPClient, install_on_connector
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    client_ports = set()
+    hits = 0
+
+    def do_GET(self):
+        _Handler.client_ports.add(self.client_address[1])
+        _Handler.hits += 1
+        status = 429 if self.path.startswith("/limited") else 200
+        body = json.dumps({"retCode": 0}).encode()
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.client_ports = set()
+    _Handler.hits = 0
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_requests_reuse_one_connection(server):
+    client = ExchangeHTTPClient()
+    for _ in range(5):
+        assert client.get(f"{server}/v5/market/time").json()["retCode"] == 0
+    assert len(_Handler.client_ports) == 1
+
+
+def test_timing_hooks_see_every_request(server):
+    client = ExchangeHTTPClient()
+    seen = []
+    client.add_timing_hook(lambda method, url, status, elapsed, error: seen.append((method, status)))
+
+    client.get(f"{server}/a")
+    client.session.get(f"{server}/b")  # direct session use is observed too
+
+    assert seen == [("GET", 200), ("GET", 200)]
+
+
+def test_timing_hook_reports_connection_errors():
+    client = ExchangeHTTPClient(max_retries=0, timeout=1)
+    errors = []
+    client.add_timing_hook(lambda method, url, status, elapsed, error: errors.append((status, error)))
+
+    with pytest.raises(Exception):
+        client.get("http://127.0.0.1:9/unreachable")
+
+    assert errors and errors[0][0] is None and errors[0][1] is not None
+
+
+def test_install_on_connector_shares_session():
+    class Connector:
+        def __init__(self):
+            import requests
+            self.session = requests.Session()
+
+    client = ExchangeHTTPClient()
+    connector = install_on_connector(Connector(), client)
+    assert connector.session is client.session
+
+
+def test_rate_limited_responses_are_returned_without_retrying(server):
+    client = ExchangeHTTPClient()
+    response = client.get(f"{server}/limited")
+    assert response.status_code == 429
+    assert _Handler.hits == 1  # left to the rate-limit aware layers above
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the exchange request scheduler
+"""
+import threading
+import time
+
+from exchange_request_scheduler import (
+    ExchangeRequestScheduler, RequestLane, ScheduledConnector, TryLater
+)
+from rate_budget import TokenBucket
+
+
+def test_orders_overtake_queued_dashboard_reads():
+    budget = TokenBucket(rate=20, burst=1)
+    scheduler = ExchangeRequestScheduler(rate_budget=budget, max_workers=1)
+    order = []
+    gate = threading.Event()
+
+    def blocker():
+        gate.wait(2)
+
+    def record(name):
+        order.append(name)
+        return name
+
+    scheduler.submit(blocker, lane=RequestLane.DASHBOARD)
+    time.sleep(0.05)  # blocker dispatched, budget now empty
+    reads = [scheduler.submit(record, f"read{i}", lane=RequestLane.DASHBOARD) for i in range(3)]
+    placed = scheduler.submit(record, "order", lane=RequestLane.ORDERS)
+    gate.set()
+
+    assert placed.result(timeout=2) == "order"
+    for future in reads:
+        future.result(timeout=2)
+    assert order[0] == "order"
+    scheduler.shutdown()
+
+
+def test_submit_does_not_block_the_caller():
+    scheduler = ExchangeRequestScheduler(rate_budget=TokenBucket(rate=1, burst=1))
+    start = time.time()
+    futures = [scheduler.submit(lambda: None) for _ in range(5)]
+    assert time.time() - start < 0.1
+    assert not all(f.done() for f in futures)
+    scheduler.shutdown(wait=False)
+
+
+def test_try_submit_returns_try_later_when_budget_is_exhausted():
+    budget = TokenBucket(rate=1, burst=1)
+    budget.try_acquire()
+    scheduler = ExchangeRequestScheduler(rate_budget=budget)
+
+    outcome = scheduler.try_submit(lambda: None, lane=RequestLane.DASHBOARD)
+
+    assert isinstance(outcome, TryLater)
+    assert outcome.retry_after > 0
+    scheduler.shutdown(wait=False)
+
+
+def test_rate_limited_response_is_requeued():
+    scheduler = ExchangeRequestScheduler(rate_budget=TokenBucket(rate=1000, burst=10),
+                                         rate_limit_backoff=0.01)
+    answers = iter([{"retCode": 10006, "retMsg": "Too many visits"}, {"retCode": 0, "result": {}}])
+
+    result = scheduler.call(lambda: next(answers), timeout=2)
+
+    assert result["retCode"] == 0
+    assert scheduler.stats["rate_limited"] == 1
+    scheduler.shutdown()
+
+
+def test_scheduled_connector_disables_connector_sleeps_and_routes_orders():
+    class Connector:
+        def _apply_rate_limit(self):
+            time.sleep(5)
+
+        def place_order(self, symbol):
+            self._apply_rate_limit()
+            return {"retCode": 0, "symbol": symbol}
+
+    scheduler = ExchangeRequestScheduler(rate_budget=TokenBucket(rate=1000, burst=10))
+    connector = ScheduledConnector(Connector(), scheduler, default_lane=RequestLane.DASHBOARD)
+
+    start = time.time()
+    assert connector.place_order("BTCUSDT")["symbol"] == "BTCUSDT"
+    assert time.time() - start < 1
+    assert connector.lane_for("place_order") == RequestLane.ORDERS
+    assert connector.lane_for("get_ticker") == RequestLane.DASHBOARD
+    scheduler.shutdown()
+
+
+def test_scheduled_connector_routes_only_rest_methods():
+    class Connector:
+        def get_ticker(self, symbol):
+            return threading.current_thread().name
+
+        def subscribe_to_orderbook(self, symbol, callback):
+            return threading.current_thread().name
+
+    scheduler = ExchangeRequestScheduler(rate_budget=TokenBucket(rate=1000, burst=10))
+    connector = ScheduledConnector(Connector(), scheduler)
+
+    assert connector.get_ticker("BTCUSDT").startswith("exchange-request")
+    assert connector.subscribe_to_orderbook("BTCUSDT", print) == threading.current_thread().name
+    assert scheduler.stats["dispatched"] == 1
+    scheduler.shutdown()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for the paginated kline range downloader (no network access needed)
+"""
+import json
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from historical_data_downloader import HistoricalDataDownloader, interval_to_ms, plan_windows, to_milliseconds
+from rate_budget import TokenBucket
+
+MINUTE = 60 * 1000
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+    @property
+    def content(self):
+        return json.dumps(self._payload).encode()
+
+
+class FakeKlineSession:
+    """Serves 1-minute candles for any window, newest first like Bybit"""
+
+    def __init__(self, fail_windows=()):
+        self.calls = []
+        self.fail_windows = set(fail_windows)
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        start, end, limit = params["start"], params["end"], params["limit"]
+        with self.lock:
+            self.calls.append((start, end))
+        if (start, end) in self.fail_windows:
+            raise ValueError("simulated failure")
+        rows = []
+        ts = start
+        while ts <= end and len(rows) < limit:
+            rows.append([str(ts), "1.0", "2.0", "0.5", str(ts % 997), "10.0", "10.0"])
+            ts += MINUTE
+        return FakeResponse({"retCode": 0, "result": {"list": rows[::-1]}})
+
+
+def _downloader(session, tmp_path, **kwargs):
+    return HistoricalDataDownloader(
+        session=session, checkpoint_dir=tmp_path, rate_budget=TokenBucket(rate=10000, burst=50),
+        max_retries=1, **kwargs
+    )
+
+
+def test_plan_windows_covers_range_without_overlap():
+    windows = plan_windows(0, 2500 * MINUTE - 1, MINUTE, page_size=1000)
+    assert windows == [(0, 1000 * MINUTE - 1), (1000 * MINUTE, 2000 * MINUTE - 1),
+                       (2000 * MINUTE, 2500 * MINUTE - 1)]
+
+
+def test_interval_conversion():
+    assert interval_to_ms("1m") == MINUTE
+    assert interval_to_ms("1h") == 60 * MINUTE
+    assert interval_to_ms("D") == 24 * 60 * MINUTE
+
+
+def test_to_milliseconds_accepts_numpy_scalars_and_timestamps():
+    ms = 1700000000000
+    assert to_milliseconds(np.int64(ms)) == ms
+    assert to_milliseconds(pd.Series([ms]).iloc[-1]) == ms
+    assert to_milliseconds(np.float64(ms / 1000)) == ms  # seconds
+    assert to_milliseconds(ms) == ms
+    assert to_milliseconds(datetime.fromtimestamp(ms / 1000, tz=timezone.utc)) == ms
+
+
+def test_download_merges_pages_beyond_limit(tmp_path):
+    session = FakeKlineSession()
+    start = 1_700_000_000_000 - (1_700_000_000_000 % MINUTE)
+    end = start + 3456 * MINUTE
+
+    df = _downloader(session, tmp_path).download("BTCUSDT", "1m", start, end)
+
+    assert len(session.calls) == 4
+    assert len(df) == 3457
+    assert df["timestamp"].is_monotonic_increasing
+    assert not df["timestamp"].duplicated().any()
+    assert list(tmp_path.iterdir()) == []  # checkpoint removed after success
+
+
+def test_download_resumes_from_checkpoint(tmp_path):
+    start = 1_700_000_000_000 - (1_700_000_000_000 % MINUTE)
+    end = start + 2999 * MINUTE
+    failing = FakeKlineSession(fail_windows={(start + 1000 * MINUTE, start + 2000 * MINUTE - 1)})
+
+    with pytest.raises(RuntimeError):
+        _downloader(failing, tmp_path).download("BTCUSDT", "1m", start, end)
+
+    session = FakeKlineSession()
+    df = _downloader(session, tmp_path).download("BTCUSDT", "1m", start, end)
+
+    assert session.calls == [(start + 1000 * MINUTE, start + 2000 * MINUTE - 1)]
+    assert len(df) == 3000
+
+
+def test_kline_parser_matches_row_by_row_conversion():
+    from kline_parser import parse_kline_response
+
+    rows = [["1700000120000", "3", "4", "2", "3.5", "10", "35"],
+            ["1700000060000", "2", "3", "1", "2.5", "20", "50"]]
+    df = parse_kline_response(json.dumps({"retCode": 0, "result": {"list": rows}}).encode())
+
+    assert list(df.columns) == ["timestamp", "open", "high", "low", "close", "volume", "turnover"]
+    assert df["timestamp"].is_monotonic_increasing
+    assert df["close"].tolist() == [2.5, 3.5]
+    assert df["timestamp"].iloc[0].value // 1_000_000 == 1700000060000
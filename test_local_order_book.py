@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for the local L2 order book
+"""
+import pytest
+
+from local_order_book import LocalOrderBook, OrderBookManager
+
+
+def _message(msg_type, u, bids=(), asks=(), symbol="BTCUSDT"):
+    return {
+        "topic": f"orderbook.50.{symbol}",
+        "type": msg_type,
+        "ts": 1700000000000 + u,
+        "data": {"s": symbol, "b": [list(level) for level in bids], "a": [list(level) for level in asks], "u": u},
+    }
+
+
+def test_snapshot_and_deltas_keep_sides_sorted():
+    book = LocalOrderBook("BTCUSDT")
+    book.apply_message(_message("snapshot", 10,
+                                bids=[("100", "1"), ("99", "2"), ("98", "3")],
+                                asks=[("101", "1"), ("102", "2")]))
+
+    book.apply_message(_message("delta", 11, bids=[("100.5", "4"), ("99", "0")], asks=[("101", "0.5")]))
+
+    assert book.best_bid() == (100.5, 4.0)
+    assert book.best_ask() == (101.0, 0.5)
+    assert book.bid_depth(5).to_list() == [[100.5, 4.0], [100.0, 1.0], [98.0, 3.0]]
+    assert book.ask_depth(1).to_list() == [[101.0, 0.5]]
+    assert book.spread() == pytest.approx(0.5)
+
+
+def test_depth_view_reflects_later_updates_without_copying():
+    book = LocalOrderBook("BTCUSDT")
+    book.apply_snapshot([("100", "1")], [("101", "1")], update_id=1)
+    view = book.ask_depth(3)
+
+    book.apply_delta([], [("100.5", "2")], update_id=2)
+
+    assert view[0] == (100.5, 2.0)
+    assert len(view) == 2
+
+
+def test_microprice_and_imbalance():
+    book = LocalOrderBook("BTCUSDT")
+    book.apply_snapshot([("100", "3")], [("102", "1")], update_id=5)
+
+    # Heavier bid pulls the microprice towards the ask
+    assert book.microprice() == pytest.approx((100 * 1 + 102 * 3) / 4)
+    assert book.imbalance() == pytest.approx(0.5)
+
+
+def test_sequence_gap_marks_book_out_of_sync_and_requests_resync():
+    resynced = []
+    manager = OrderBookManager(resync=resynced.append)
+    manager.on_message(_message("snapshot", 1, bids=[("100", "1")], asks=[("101", "1")]))
+    manager.on_message(_message("delta", 2, bids=[("100", "2")]))
+
+    manager.on_message(_message("delta", 4, bids=[("100", "9")]))
+
+    assert resynced == ["BTCUSDT"]
+    assert manager.get("BTCUSDT") is None
+    # Deltas already queued behind the gap are dropped without another resync
+    for u in range(5, 10):
+        manager.on_message(_message("delta", u, bids=[("100", "3")]))
+    assert resynced == ["BTCUSDT"] and manager.gap_count == 1
+    assert manager.book("BTCUSDT").apply_message(_message("delta", 10)) is False
+
+    manager.on_message(_message("snapshot", 20, bids=[("100", "7")], asks=[("101", "1")]))
+    assert manager.get("BTCUSDT").best_bid() == (100.0, 7.0)
+    # A later gap triggers a new resync
+    manager.on_message(_message("delta", 23))
+    assert resynced == ["BTCUSDT", "BTCUSDT"]
+
+
+def test_duplicate_delta_is_ignored():
+    book = LocalOrderBook("BTCUSDT")
+    book.apply_snapshot([("100", "1")], [("101", "1")], update_id=7)
+
+    assert book.apply_delta([("100", "5")], [], update_id=7) is False
+    assert book.best_bid() == (100.0, 1.0)
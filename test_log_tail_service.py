@@ -0,0 +1,109 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from log_tail_service import LogTail, parse_query_time
+
+
+def _write_log(path, count, start=datetime(2025, 6, 1, 12, 0, 0)):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            stamp = (start + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S")
+            level = "ERROR" if i % 100 == 0 else "INFO"
+            f.write(f"{stamp},000 [{level}] event {i}\n")
+            if i % 100 == 0:
+                f.write("Traceback (most recent call last):\n  boom\n")
+
+
+def test_tail_reads_backwards_with_filters(tmp_path):
+    path = tmp_path / "api.log"
+    _write_log(path, 5000)
+    tail = LogTail(str(path), block_size=4096)
+
+    last = tail.tail(3)
+    assert [e.message for e in last] == ["event 4997", "event 4998", "event 4999"]
+
+    errors = tail.tail(2, level="ERROR")
+    assert errors[-1].message == "event 4900\nTraceback (most recent call last):\n  boom"
+    assert errors[0].message.startswith("event 4800")
+    assert tail.tail(1, contains="EVENT 123")[0].message == "event 1239"
+
+    # The whole file is never read for a short tail
+    tail.max_scan_bytes = 8192
+    assert len(tail.tail(5)) == 5
+
+
+def test_time_range_uses_offset_index(tmp_path):
+    path = tmp_path / "api.log"
+    _write_log(path, 5000)
+    tail = LogTail(str(path), block_size=1024)
+
+    since = datetime(2025, 6, 1, 12, 0, 0) + timedelta(seconds=3000)
+    entries = tail.between(since, since + timedelta(seconds=4), limit=10)
+    assert [e.message.split("\n")[0] for e in entries] == [f"event {i}" for i in range(3000, 3005)]
+    assert entries[0].message.endswith("boom")
+    assert tail._index
+
+    # A second query inside the indexed range starts from a checkpoint
+    nearby = tail.between(since + timedelta(seconds=10), limit=1)
+    assert nearby[0].message == "event 3010"
+    assert tail.offset_for(datetime(2030, 1, 1)) == path.stat().st_size
+
+
+def test_follow_yields_new_entries_and_survives_truncation(tmp_path):
+    path = tmp_path / "api.log"
+    _write_log(path, 3)
+    tail = LogTail(str(path))
+    stop = threading.Event()
+    follower = tail.follow(poll_interval=0.01, stop=stop)
+
+    assert next(follower) == ([], path.stat().st_size)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("2025-06-01 13:00:00,000 [WARNING] new one\n  detail\n")
+    next(follower)  # entry held until it is known to be complete
+    batch, resume = next(follower)
+    assert [e.message for e in batch] == ["new one\n  detail"]
+    assert resume == path.stat().st_size
+
+    path.write_text("2025-06-01 14:00:00,000 [INFO] after rotate\n", encoding="utf-8")
+    next(follower)
+    batch, _ = next(follower)
+    assert [e.message for e in batch] == ["after rotate"]
+    stop.set()
+
+
+def test_follow_detects_rotation_to_a_longer_file_and_stops_promptly(tmp_path):
+    path = tmp_path / "api.log"
+    _write_log(path, 3)
+    tail = LogTail(str(path))
+    stop = threading.Event()
+    follower = tail.follow(poll_interval=0.01, stop=stop)
+    assert next(follower) == ([], path.stat().st_size)
+
+    # The rotated-in file is already longer than the old read position
+    rotated = tmp_path / "api.log.new"
+    _write_log(rotated, 5, start=datetime(2025, 6, 2))
+    rotated.replace(path)
+    batch, _ = next(follower)
+    assert [e.message.splitlines()[0] for e in batch] == [f"event {i}" for i in range(4)]
+
+    # stop interrupts the poll wait instead of sleeping out the interval
+    slow = tail.follow(poll_interval=30, stop=stop)
+    next(slow)
+    threading.Timer(0.1, stop.set).start()
+    started = time.monotonic()
+    assert next(slow, None) is None
+    assert time.monotonic() - started < 5
+
+
+def test_query_times_with_an_offset_compare_as_local_time(tmp_path):
+    path = tmp_path / "api.log"
+    _write_log(path, 300)
+    local = datetime(2025, 6, 1, 12, 1, 0)
+    utc = local.astimezone().astimezone(timezone.utc)
+
+    since = parse_query_time(utc.strftime("%Y-%m-%dT%H:%M:%SZ"))
+    assert since == local and since.tzinfo is None
+    assert parse_query_time("2025-06-01T12:01:00") == local
+    entries = LogTail(str(path)).between(since, parse_query_time(utc.isoformat()), limit=5)
+    assert [e.message for e in entries] == ["event 60"]
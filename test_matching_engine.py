@@ -0,0 +1,88 @@
+import pytest
+
+from matching_engine import MatchingEngine, benchmark
+
+
+def test_price_time_priority_and_partial_fills():
+    engine = MatchingEngine("BTCUSDT")
+    engine.submit("a1", "sell", 1.0, price=101.0)
+    engine.submit("a2", "sell", 1.0, price=100.0)
+    engine.submit("a3", "sell", 2.0, price=100.0)
+    assert engine.best_ask() == (100.0, 3.0)
+
+    report = engine.submit("b1", "buy", 2.5, price=100.5)
+    assert [(t.maker_id, t.price, t.quantity) for t in report.trades] == [("a2", 100.0, 1.0), ("a3", 100.0, 1.5)]
+    assert report.status == "filled"
+    assert engine.depth(5) == {"bids": [], "asks": [[100.0, 0.5], [101.0, 1.0]]}
+
+    # Remainder of a crossing GTC limit rests at its price; IOC remainder is dropped
+    rest = engine.submit("b2", "buy", 1.0, price=100.0)
+    assert rest.status == "partially_filled" and rest.remaining == 0.5
+    assert engine.best_bid() == (100.0, 0.5)
+    ioc = engine.submit("b3", "buy", 5.0, price=101.0, time_in_force="IOC")
+    assert ioc.status == "cancelled" and ioc.filled == 1.0 and ioc.expired == ["b3"]
+    assert engine.cancel("b2") and not engine.cancel("b2")
+    assert engine.best_bid() is None and engine.best_ask() is None
+
+
+def test_fok_iceberg_and_stop_orders():
+    engine = MatchingEngine("BTCUSDT")
+    engine.submit("ice", "sell", 5.0, "iceberg", price=100.0, display_quantity=1.0)
+    engine.submit("plain", "sell", 1.0, price=100.0)
+
+    # An iceberg refresh goes behind orders already queued at the level
+    fills = engine.submit("b1", "buy", 1.5, "market").trades
+    assert [(t.maker_id, t.quantity) for t in fills] == [("ice", 1.0), ("plain", 0.5)]
+
+    killed = engine.submit("fok", "buy", 10.0, price=100.0, time_in_force="FOK")
+    assert killed.status == "killed" and not killed.trades
+    assert engine.submit("fok2", "buy", 4.5, price=100.0, time_in_force="FOK").status == "filled"
+
+    engine.submit("a2", "sell", 1.0, price=105.0)
+    stop = engine.submit("stop", "buy", 1.0, "stop", stop_price=103.0)
+    assert stop.status == "pending" and engine.has_order("stop")
+    engine.submit("a1", "sell", 1.0, price=103.0)
+    triggered = engine.submit("b2", "buy", 1.0, price=103.0)
+    assert [(t.taker_id, t.price) for t in triggered.trades] == [("b2", 103.0), ("stop", 105.0)]
+    assert not engine.has_order("stop")
+
+
+def test_benchmark_is_deterministic():
+    first, second = benchmark(5_000, seed=3), benchmark(5_000, seed=3)
+    assert first["trades"] == second["trades"] > 0
+
+
+@pytest.mark.benchmark
+def test_benchmark_event_throughput():
+    # 100k+ events/s on a developer machine; keep headroom for slow CI hosts
+    assert benchmark(50_000, seed=3)["events_per_second"] > 30_000
+
+
+def test_oms_fills_come_from_the_matching_engine(tmp_path):
+    import uuid
+    from datetime import datetime
+
+    from advanced_order_management_system import (
+        ExecutionAlgorithm, OrderManagementSystem, OrderPriority, OrderRequest, OrderSide, OrderStatus, OrderType,
+    )
+
+    oms = OrderManagementSystem(db_path=str(tmp_path / "orders.db"), start_threads=False)
+    oms.order_books.on_message(oms._simulated_book_message("BTCUSDT", 45000.0, 1))
+    oms._refresh_market_data("BTCUSDT", 45000.0, volume=1000.0)
+    oms._refresh_liquidity("BTCUSDT")
+    best_ask = oms.matching_engine("BTCUSDT").best_ask()
+
+    order = OrderRequest(
+        order_id=str(uuid.uuid4()), symbol="BTCUSDT", side=OrderSide.BUY, order_type=OrderType.MARKET,
+        quantity=0.5, price=None, stop_price=None, time_in_force="GTC", algorithm=ExecutionAlgorithm.AGGRESSIVE,
+        priority=OrderPriority.NORMAL, parent_order_id=None, client_order_id=None, trader_id="t-1",
+        created_at=datetime.now(), valid_until=None, min_quantity=None, display_quantity=None, metadata={},
+    )
+    assert oms.submit_order(order)[0]
+    oms._execute_scheduled(oms.order_queue.pop(timeout=0))
+
+    state = oms.order_states[order.order_id]
+    assert state.status == OrderStatus.FILLED
+    assert state.avg_fill_price == best_ask[0]
+    assert state.executions[0].liquidity_flag == "taker"
+    oms.shutdown()
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from advanced_order_management_system import OrderManagementSystem, OrderSide, RiskManager, RollingHistory
+from test_order_database import _order
+
+
+def test_rolling_history_bounds_memory_and_pages_back():
+    backing = list(range(25))
+    history = RollingHistory(10, lambda offset, limit: backing[offset:offset + limit])
+    history.extend(backing)
+
+    assert len(history) == 10 and history.total_count == 25 and history.spilled == 15
+    assert list(history) == list(range(15, 25))
+    assert history.recent(3) == [22, 23, 24]
+    assert history.older(limit=5) == [10, 11, 12, 13, 14]
+    assert history.older(limit=5, skip=12) == [0, 1, 2]
+    assert history.older(limit=5, skip=15) == []
+
+
+def test_risk_manager_tracks_exposure_incrementally():
+    risk = RiskManager()
+    risk.on_fill("BTCUSDT", OrderSide.BUY, 10.0, 40000.0, account="alice")
+    risk.on_fill("ETHUSDT", OrderSide.SELL, 100.0, 3000.0, account="bob")
+    order = _order(quantity=1.0)
+    order.price = None
+    assert risk.pre_trade_risk_check(order)[0].status == "passed"  # below the concentration threshold
+
+    risk.on_fill("BTCUSDT", OrderSide.BUY, 10.0, 42000.0, account="bob")
+    assert risk.positions["BTCUSDT"] == 20.0
+    assert risk.gross_exposure == 20 * 42000.0 + 100 * 3000.0
+    assert risk.account_exposure["alice"] == 10 * 40000.0
+    assert risk.account_exposure["bob"] == 100 * 3000.0 + 10 * 42000.0
+    assert risk.daily_volumes[datetime.now().date()] == 400000.0 + 300000.0 + 420000.0
+
+    # Concentration uses the running gross exposure and the symbol's last fill price
+    checks = risk.pre_trade_risk_check(order)
+    assert [c.check_type for c in checks] == ["POSITION_CONCENTRATION"]
+
+
+def test_oms_keeps_running_totals_and_survives_history_eviction(tmp_path):
+    path = str(tmp_path / "orders.db")
+    oms = OrderManagementSystem(db_path=path, history_size=5, start_threads=False)
+    order = _order(quantity=1.0)
+    assert oms.submit_order(order)[0]
+    oms._working[order.order_id] = order
+    for price in (100.0, 102.0, 104.0, 106.0):
+        oms._apply_fill(order.order_id, 0.2, price, "taker")
+
+    state = oms.order_states[order.order_id]
+    assert abs(state.avg_fill_price - 103.0) < 1e-9
+    assert oms.execution_totals["count"] == 4
+    assert abs(oms.execution_totals["notional"] - 0.2 * 412.0) < 1e-9
+
+    for _ in range(6):
+        oms.submit_order(_order(quantity=0.01))
+    assert len(oms.risk_checks) == 5 and sum(oms.risk_check_counts.values()) == 7
+    spilled = oms.risk_checks.older(limit=10)
+    assert len(spilled) == 2 and spilled[0].order_id == order.order_id
+    oms.shutdown()
+
+    restarted = OrderManagementSystem(db_path=path, history_size=5, start_threads=False)
+    assert restarted.execution_totals["count"] == 4
+    assert restarted.risk_manager.positions["BTCUSDT"] == 0.8
+    assert abs(restarted.order_states[order.order_id].filled_notional - 0.2 * 412.0) < 1e-9
+    restarted.shutdown()
+
+
+def test_history_without_recovery_pages_back_only_this_session(tmp_path):
+    path = str(tmp_path / "orders.db")
+    earlier = OrderManagementSystem(db_path=path, history_size=2, start_threads=False)
+    for _ in range(3):
+        earlier.submit_order(_order(quantity=0.01))
+    earlier.shutdown()
+
+    fresh = OrderManagementSystem(db_path=path, recover=False, history_size=2, start_threads=False)
+    orders = [_order(quantity=0.01) for _ in range(3)]
+    for order in orders:
+        fresh.submit_order(order)
+    assert [check.order_id for check in fresh.risk_checks.older(limit=10)] == [orders[0].order_id]
+    fresh.shutdown()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for the OMS benchmark harness
+"""
+import json
+import threading
+
+import pytest
+
+from advanced_order_management_system import OrderManagementSystem
+from api_load_test import append_history, load_history
+from oms_benchmark import OMSBenchmarkConfig, OrderStream, append_results, find_regressions, run_oms_benchmark
+
+
+def test_oms_without_threads_starts_nothing(tmp_path):
+    before = set(threading.enumerate())
+    oms = OrderManagementSystem(db_path=str(tmp_path / "orders.db"), recover=False, start_threads=False)
+    # Only the database writer; threads left by earlier tests may exit meanwhile
+    assert [thread.name for thread in set(threading.enumerate()) - before] == ["order-db-writer"]
+    oms.shutdown()
+
+
+def test_order_stream_is_seeded_and_follows_the_mix():
+    config = OMSBenchmarkConfig(symbols=["BTCUSDT", "ETHUSDT"], mix={"limit": 1, "iceberg": 1}, seed=3)
+    first = OrderStream(config, {"BTCUSDT": 45000.0, "ETHUSDT": 3000.0}).next_order()
+    stream = OrderStream(config, {"BTCUSDT": 45000.0, "ETHUSDT": 3000.0})
+    orders = [stream.next_order() for _ in range(200)]
+    assert orders[0].order_id == first.order_id
+    assert {order.metadata["benchmark"] for order in orders} == {"limit", "iceberg"}
+    assert {order.symbol for order in orders} == {"BTCUSDT", "ETHUSDT"}
+    assert all(order.price is not None for order in orders)
+    assert all(order.display_quantity for order in orders if order.metadata["benchmark"] == "iceberg")
+
+
+def test_unknown_order_kind_is_rejected():
+    with pytest.raises(ValueError, match="twapp"):
+        OMSBenchmarkConfig(mix={"market": 1, "twapp": 1})
+    config = OMSBenchmarkConfig()
+    config.mix = {"markt": 1}
+    with pytest.raises(ValueError, match="markt"):
+        OrderStream(config, {})
+
+
+def test_benchmark_reports_latency_fills_and_memory(tmp_path, monkeypatch):
+    downloads = []
+    monkeypatch.setattr("volume_profile._download_klines", lambda *args: downloads.append(args))
+    config = OMSBenchmarkConfig(orders=400, symbols=["BTCUSDT", "ETHUSDT"], batch_size=20, tick_every=5)
+    assert "vwap" in config.mix
+    metrics = run_oms_benchmark(config)
+    assert downloads == []  # VWAP schedules come from the offline profile service
+
+    assert metrics["accepted"] + metrics["rejected"] == 400
+    assert 0 < metrics["submit"]["p50_ms"] <= metrics["submit"]["p95_ms"] <= metrics["submit"]["p99_ms"]
+    assert 0 < metrics["risk_check"]["share_of_submit"] < 1
+    assert metrics["execution"]["fills"] > 0 and metrics["execution"]["fills_per_second"] > 0
+    assert "memory_increase_mb" in metrics["memory"]
+
+    history = tmp_path / "history.json"
+    append_history(metrics, "oms", history)
+    assert find_regressions(metrics, load_history(history)) == []
+    slower = json.loads(json.dumps(metrics))
+    slower["submit"]["p95_ms"] *= 3
+    slower["execution"]["fills_per_second"] /= 3
+    assert len(find_regressions(slower, load_history(history))) == 2
+
+    results = tmp_path / "benchmark_results.json"
+    results.write_text(json.dumps({"order_execution": {}}))
+    append_results(metrics, results)
+    (run,) = json.loads(results.read_text())["order_execution"].values()
+    assert run["orders_400"]["orders_per_second"] == metrics["orders_per_second"]
@@ -0,0 +1,93 @@
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import pytest
+
+from advanced_order_management_system import (
+    ExecutionAlgorithm, OrderBlotter, OrderManagementSystem, OrderState, OrderStatus,
+)
+from test_order_database import _order
+
+
+def _state(order, status=OrderStatus.SUBMITTED):
+    return OrderState(order.order_id, status, 0.0, order.quantity, 0.0, datetime.now(), "", [])
+
+
+def test_oms_indexes_follow_submissions_children_and_transitions(tmp_path):
+    oms = OrderManagementSystem(db_path=str(tmp_path / "orders.db"), start_threads=False)
+    plain = _order(quantity=0.1)
+    twap = _order(quantity=0.2, algorithm=ExecutionAlgorithm.TWAP)
+    assert oms.submit_order(plain)[0] and oms.submit_order(twap)[0]
+
+    children = oms.query_orders(parent_order_id=twap.order_id).rows
+    assert len(children) == 1 and children[0][0].parent_order_id == twap.order_id
+    assert [order.order_id for order, _ in oms.query_orders(top_level_only=True).rows] == [twap.order_id,
+                                                                                         plain.order_id]
+    assert oms.blotter.status_counts[OrderStatus.SUBMITTED] == 2
+    assert oms.blotter.status_counts[OrderStatus.PENDING] == 1  # the scheduled slice
+
+    oms.cancel_order(plain.order_id)
+    page = oms.query_orders(status=OrderStatus.CANCELLED)
+    assert [order.order_id for order, _ in page.rows] == [plain.order_id] and page.total == 1
+    assert page.rows[0][1] is oms.order_states[plain.order_id]
+    assert oms.query_orders(status=OrderStatus.SUBMITTED, symbol="BTCUSDT").rows[0][0].order_id == twap.order_id
+    oms.shutdown()
+
+
+def test_pages_are_disjoint_and_combined_filters_match_a_full_scan():
+    blotter = OrderBlotter()
+    start = datetime(2024, 1, 1)
+    orders = []
+    for i in range(1000):
+        order = replace(_order(), symbol=("BTCUSDT", "ETHUSDT")[i % 2], trader_id=f"t-{i % 3}",
+                        created_at=start + timedelta(seconds=i * 7))
+        blotter.add(order, _state(order))
+        orders.append(order)
+    for order in orders[::5]:
+        blotter.set_status(order.order_id, OrderStatus.FILLED)
+    for order in orders[::10]:  # leave and re-enter a status
+        blotter.set_status(order.order_id, OrderStatus.PARTIALLY_FILLED)
+        blotter.set_status(order.order_id, OrderStatus.FILLED)
+
+    seen = []
+    offset = 0
+    while True:
+        page = blotter.query(symbol="ETHUSDT", offset=offset, limit=64)
+        seen += [order.order_id for order, _ in page.rows]
+        offset += 64
+        if not page.has_more:
+            break
+    assert page.total == 500 and seen == [o.order_id for o in reversed(orders) if o.symbol == "ETHUSDT"]
+
+    since, until = start + timedelta(minutes=10), start + timedelta(minutes=70)
+    expected = [o.order_id for o in reversed(orders)
+                if o.trader_id == "t-1" and o.order_id in {x.order_id for x in orders[::5]} and since <= o.created_at <= until]
+    got = [o.order_id for o, _ in blotter.query(status=OrderStatus.FILLED, trader_id="t-1", since=since, until=until,
+                                                limit=1000).rows]
+    assert got == expected
+    assert blotter.status_counts[OrderStatus.FILLED] == 200
+    assert len(blotter.query(status=OrderStatus.FILLED, limit=1000).rows) == 200
+
+
+@pytest.mark.performance
+def test_blotter_queries_stay_sub_millisecond_on_large_sessions():
+    blotter = OrderBlotter()
+    template = _order()
+    start = datetime(2024, 1, 1)
+    symbols = ["BTCUSDT", "ETHUSDT", "ADAUSDT", "DOTUSDT", "LINKUSDT"]
+    for i in range(200_000):
+        order = replace(template, order_id=f"o-{i}", symbol=symbols[i % 5], trader_id=f"t-{i % 50}",
+                        created_at=start + timedelta(seconds=i))
+        blotter.add(order, _state(order))
+        if i % 4:
+            blotter.set_status(order.order_id, OrderStatus.FILLED)
+
+    queries = [dict(), dict(symbol="ETHUSDT", offset=5000), dict(status=OrderStatus.SUBMITTED),
+               dict(status=OrderStatus.FILLED, trader_id="t-7"), dict(since=start + timedelta(hours=30))]
+    for query in queries:
+        started = time.perf_counter()
+        for _ in range(100):
+            page = blotter.query(limit=50, **query)
+        assert len(page.rows) == 50
+        assert (time.perf_counter() - started) / 100 < 1e-3, query
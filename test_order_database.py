@@ -0,0 +1,109 @@
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from advanced_order_management_system import (
+    ExecutionAlgorithm, OrderDatabase, OrderExecution, OrderManagementSystem, OrderPriority, OrderRequest,
+    OrderSide, OrderState, OrderStatus, OrderType,
+)
+
+
+def _order(quantity=1.0, algorithm=ExecutionAlgorithm.AGGRESSIVE):
+    return OrderRequest(
+        order_id=str(uuid.uuid4()), symbol="BTCUSDT", side=OrderSide.BUY, order_type=OrderType.LIMIT,
+        quantity=quantity, price=45000.0, stop_price=None, time_in_force="GTC", algorithm=algorithm,
+        priority=OrderPriority.NORMAL, parent_order_id=None, client_order_id="c-1", trader_id="t-1",
+        created_at=datetime.now(), valid_until=None, min_quantity=None, display_quantity=None,
+        metadata={"note": "test"},
+    )
+
+
+def test_group_commit_batches_and_collapses_state_updates(tmp_path):
+    db = OrderDatabase(str(tmp_path / "orders.db"), flush_interval_ms=50)
+    order = _order()
+    db.record_order(order)
+    state = OrderState(order.order_id, OrderStatus.PENDING, 0.0, 1.0, 0.0, datetime.now(), "new", [])
+    for status in (OrderStatus.PENDING, OrderStatus.SUBMITTED, OrderStatus.PARTIALLY_FILLED):
+        state.status = status
+        seq = db.record_state(state)
+    db.record_execution(OrderExecution(str(uuid.uuid4()), order.order_id, "BTCUSDT", OrderSide.BUY, 0.4, 45000.0,
+                                       18.0, datetime.now(), "binance", "maker", "SMART"))
+
+    assert db.durable_seq < seq  # nothing written synchronously
+    assert db.wait_durable(seq, timeout=5)
+    assert db.committed_batches == 1
+
+    conn = sqlite3.connect(db.db_path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("SELECT status FROM order_states").fetchall() == [("partially_filled",)]
+    assert conn.execute("SELECT COUNT(*) FROM executions").fetchone()[0] == 1
+    conn.close()
+    db.close()
+
+
+def test_close_drains_everything_appended(tmp_path):
+    db = OrderDatabase(str(tmp_path / "orders.db"), flush_interval_ms=1000, max_batch=100)
+    orders = [_order() for _ in range(250)]
+    for order in orders:
+        db.record_order(order)
+    db.close()
+    assert db.durable_seq == 250
+    assert set(db.load()["orders"]) == {order.order_id for order in orders}
+
+
+
+def test_unwritable_row_is_set_aside_without_stalling_the_journal(tmp_path):
+    db = OrderDatabase(str(tmp_path / "orders.db"), flush_interval_ms=50)
+    good, bad = _order(), _order()
+    bad.quantity = Decimal("0.5")  # a type sqlite3 cannot bind
+    db.record_order(good)
+    db.record_order(bad)
+    assert db.wait_durable(timeout=5)
+    assert db.rejected_rows == 1
+    assert set(db.load()["orders"]) == {good.order_id}
+    db.close()
+
+
+def test_dead_writer_makes_producers_and_waiters_raise(tmp_path, monkeypatch):
+    def broken(self, conn, batch):
+        raise MemoryError("disk controller on fire")
+
+    monkeypatch.setattr(OrderDatabase, "_commit", broken)
+    db = OrderDatabase(str(tmp_path / "orders.db"), flush_interval_ms=1, max_pending=1)
+    seq = db.record_order(_order())
+    with pytest.raises(RuntimeError, match="writer failed"):
+        db.wait_durable(seq, timeout=5)
+    with pytest.raises(RuntimeError, match="writer failed"):
+        db.record_order(_order())
+    db.close()
+
+def test_oms_recovers_acknowledged_orders_after_restart(tmp_path):
+    path = str(tmp_path / "orders.db")
+    oms = OrderManagementSystem(db_path=path, start_threads=False)
+    order = _order(quantity=0.5)
+
+    assert oms.submit_order(order)[0]
+    assert oms.wait_persisted(order.order_id, timeout=5)
+    assert oms.is_persisted(order.order_id)
+    oms.shutdown()
+
+    restarted = OrderManagementSystem(db_path=path, start_threads=False)
+    recovered = restarted.orders[order.order_id]
+    assert recovered.quantity == 0.5 and recovered.metadata == {"note": "test"}
+    assert restarted.order_states[order.order_id].status == OrderStatus.SUBMITTED
+    assert len(restarted.risk_checks) == len(oms.risk_checks)
+    assert order.order_id in [queued.order_id for queued in restarted.order_queue]
+    restarted.shutdown()
+
+
+@pytest.mark.performance
+def test_submit_does_not_wait_for_the_journal(tmp_path):
+    oms = OrderManagementSystem(db_path=str(tmp_path / "orders.db"), start_threads=False)
+    started = time.perf_counter()
+    assert oms.submit_order(_order(quantity=0.5))[0]
+    assert time.perf_counter() - started < 0.05
+    oms.shutdown()
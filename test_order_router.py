@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from advanced_order_management_system import MarketData, OrderRouter
+from local_order_book import OrderBookManager
+from test_order_database import _order
+
+
+def _books(symbol, asks):
+    books = OrderBookManager()
+    books.on_message({"topic": f"orderbook.50.{symbol}", "type": "snapshot",
+                      "data": {"s": symbol, "b": [["99.9", "100"]], "a": [[str(p), str(q)] for p, q in asks],
+                               "u": 1}})
+    return books
+
+
+def _market(price=100.0):
+    return {"BTCUSDT": MarketData("BTCUSDT", price - 0.05, price + 0.05, 1.0, 1.0, price, 1000.0, None)}
+
+
+def test_live_measurements_reorder_cached_rankings():
+    router = OrderRouter()
+    order = _order(quantity=0.01)
+    first = router.rank_venues("BTCUSDT", True, 0.01, 100.0)
+    assert router.select_venue(order, _market()) == "INTERNAL"
+    assert router.rank_venues("BTCUSDT", True, 0.01, 100.0) is first  # served from the cache
+
+    router.record_latency("INTERNAL", 10.2)  # noise below the tolerance keeps the ranking
+    assert router.rank_venues("BTCUSDT", True, 0.01, 100.0) is first
+
+    for _ in range(30):
+        router.record_latency("INTERNAL", 2000.0)
+        router.record_fill("INTERNAL", 1.0, 0.0)
+    assert router.stats["INTERNAL"].latency_ms > 1000 and router.stats["INTERNAL"].fill_rate < 0.01
+    assert router.select_venue(order, _market()) == "BINANCE"
+
+
+def test_depth_aware_routing_splits_large_orders():
+    router = OrderRouter()
+    router.attach_books("INTERNAL", _books("BTCUSDT", [(100.0, 1.0), (101.0, 1.0), (105.0, 10.0)]))
+    router.attach_books("BINANCE", _books("BTCUSDT", [(100.0, 1.0), (100.5, 1.0), (106.0, 10.0)]))
+
+    small = _order(quantity=0.5)
+    assert router.route(small, _market()) == [("INTERNAL", 0.5)]
+
+    large = _order(quantity=3.0)
+    allocation = dict(router.route(large, _market()))
+    assert set(allocation) == {"INTERNAL", "BINANCE"}
+    assert abs(sum(allocation.values()) - 3.0) < 1e-9
+
+    # A book update invalidates the cached ranking for that symbol
+    ranking = router.rank_venues("BTCUSDT", True, 3.0, 100.0)
+    router.books["INTERNAL"].on_message({"topic": "orderbook.50.BTCUSDT", "type": "delta",
+                                         "data": {"s": "BTCUSDT", "b": [], "a": [["100.0", "50"]], "u": 2}})
+    assert router.rank_venues("BTCUSDT", True, 3.0, 100.0) is not ranking
+
+
+@pytest.mark.performance
+def test_cached_routing_decision_takes_microseconds():
+    router = OrderRouter()
+    router.attach_books("INTERNAL", _books("BTCUSDT", [(100.0 + i * 0.1, 1.0) for i in range(50)]))
+    order, market = _order(quantity=0.5), _market()
+    router.select_venue(order, market)
+
+    started = time.perf_counter()
+    for _ in range(10000):
+        router.select_venue(order, market)
+    per_call = (time.perf_counter() - started) / 10000
+    assert per_call < 50e-6
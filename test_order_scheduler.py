@@ -0,0 +1,85 @@
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from advanced_order_management_system import (
+    ExecutionAlgorithm, OrderPriority, OrderRequest, OrderScheduler, OrderSide, OrderType,
+)
+
+
+def _order(priority=OrderPriority.NORMAL, created_at=None):
+    return OrderRequest(
+        order_id=str(uuid.uuid4()), symbol="BTCUSDT", side=OrderSide.BUY, order_type=OrderType.LIMIT,
+        quantity=1.0, price=45000.0, stop_price=None, time_in_force="GTC", algorithm=ExecutionAlgorithm.AGGRESSIVE,
+        priority=priority, parent_order_id=None, client_order_id=None, trader_id="t-1",
+        created_at=created_at or datetime.now(), valid_until=None, min_quantity=None, display_quantity=None,
+        metadata={},
+    )
+
+
+def test_due_orders_come_out_by_priority_then_fifo():
+    scheduler = OrderScheduler()
+    low, normal_a, urgent, normal_b = (_order(OrderPriority.LOW), _order(), _order(OrderPriority.URGENT), _order())
+    for order in (low, normal_a, urgent, normal_b):
+        scheduler.push(order)
+
+    assert len(scheduler) == 4
+    popped = [scheduler.pop(timeout=0) for _ in range(4)]
+    assert popped == [urgent, normal_a, normal_b, low]
+    assert scheduler.pop(timeout=0.01) is None
+
+
+def test_slices_are_released_at_their_scheduled_time():
+    scheduler = OrderScheduler()
+    later = _order(OrderPriority.URGENT, created_at=datetime.now() + timedelta(seconds=0.2))
+    scheduler.push(later)
+    assert scheduler.pop(timeout=0.05) is None
+
+    # A due order pushed from another thread wakes the sleeping consumer immediately
+    now = _order(OrderPriority.LOW)
+    threading.Timer(0.02, scheduler.push, args=(now,)).start()
+    started = time.monotonic()
+    assert scheduler.pop(timeout=1) is now
+    assert time.monotonic() - started < 0.15
+
+    assert scheduler.pop(timeout=1) is later
+    assert scheduler.stats() == {"ready": 0, "delayed": 0, "next_release_in": None}
+    scheduler.close()
+    assert scheduler.pop() is None
+
+
+def _consume_concurrently(orders):
+    """Push ``orders`` while a consumer thread pops them; returns (consumed, elapsed seconds)"""
+    scheduler = OrderScheduler()
+    consumed = []
+
+    def consume():
+        while len(consumed) < len(orders):
+            order = scheduler.pop(timeout=1)
+            if order is None:
+                break
+            consumed.append(order)
+
+    consumer = threading.Thread(target=consume)
+    started = time.perf_counter()
+    consumer.start()
+    scheduler.extend(orders)
+    consumer.join(timeout=10)
+    return consumed, time.perf_counter() - started
+
+
+def test_scheduler_hands_every_order_to_a_consumer_thread():
+    orders = [_order(priority) for priority in (OrderPriority.LOW, OrderPriority.HIGH) * 500]
+    consumed, _ = _consume_concurrently(orders)
+    assert sorted(map(id, consumed)) == sorted(map(id, orders))
+
+
+@pytest.mark.performance
+def test_scheduler_sustains_thousands_of_orders_per_second():
+    orders = [_order(priority) for priority in (OrderPriority.LOW, OrderPriority.HIGH) * 5000]
+    consumed, elapsed = _consume_concurrently(orders)
+    assert len(consumed) == len(orders)
+    assert len(orders) / elapsed > 5000
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test that ProductionDataManager construction does not block on the connector
+"""
+import threading
+import time
+
+import pandas as pd
+
+from production_data_manager import ProductionDataManager
+
+
+class _SlowConnector:
+    def get_ticker(self, symbol):
+        return {"retCode": 0, "result": {"list": [{"symbol": symbol, "lastPrice": "1.0"}]}}
+
+
+def _slow_initialize(delay):
+    def initialize(self):
+        time.sleep(delay)
+        self.bybit_connector = _SlowConnector()
+        self.connector_ready.set()
+    return initialize
+
+
+def test_constructor_returns_before_connector_is_ready(monkeypatch):
+    monkeypatch.setattr(ProductionDataManager, "_initialize_connector", _slow_initialize(1.0))
+
+    start = time.time()
+    manager = ProductionDataManager()
+    elapsed = time.time() - start
+
+    assert elapsed < 0.5
+    assert not manager.connector_ready.is_set()
+    assert manager.get_status()["connector_ready"] is False
+
+
+def test_first_call_waits_for_readiness(monkeypatch):
+    monkeypatch.setattr(ProductionDataManager, "_initialize_connector", _slow_initialize(0.2))
+    manager = ProductionDataManager()
+
+    result = manager.get_market_data("BTCUSDT", use_cache=False)
+
+    assert manager.connector_ready.is_set()
+    assert result["retCode"] == 0
+
+
+def test_first_call_falls_back_after_deadline(monkeypatch):
+    never_ready = threading.Event()
+    monkeypatch.setattr(ProductionDataManager, "_initialize_connector", lambda self: never_ready.wait(5))
+    manager = ProductionDataManager()
+    manager.connector_init_timeout = 0.1
+
+    start = time.time()
+    result = manager.get_market_data("BTCUSDT", use_cache=False)
+
+    assert time.time() - start < 1.0
+    assert result["data_source"] == "fallback"
+
+
+def test_long_history_requests_exactly_limit_candles_under_rate_limit(monkeypatch):
+    monkeypatch.setattr(ProductionDataManager, "_initialize_connector", lambda self: self.connector_ready.set())
+    manager = ProductionDataManager()
+    windows = []
+
+    def fake_range(symbol, interval, start, end, use_cache=True):
+        windows.append((start, end))
+        return pd.DataFrame({"close": [1.0]})
+
+    monkeypatch.setattr(manager, "get_historical_range", fake_range)
+    manager.request_count = 0
+
+    manager.get_historical_data("BTCUSDT", "1h", limit=1500, use_cache=False)
+
+    start, end = windows[0]
+    assert end - start == 1499 * 3_600_000
+    assert manager.request_count == 1
+
+    manager.request_count = manager.rate_limit
+    assert manager.get_historical_data("BTCUSDT", "1h", limit=1500, use_cache=False).empty
+    assert len(windows) == 1
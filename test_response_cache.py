@@ -0,0 +1,87 @@
+import gzip
+
+from flask import Flask, Response, jsonify
+
+from response_cache import ResponseCache
+
+
+def _app():
+    app = Flask(__name__)
+    cache = ResponseCache(app, min_size=100)
+    calls = {"portfolio": 0}
+
+    @app.route("/api/portfolio")
+    @cache.cached(ttl=60)
+    def portfolio():
+        calls["portfolio"] += 1
+        return jsonify({"positions": [{"symbol": "BTCUSDT", "size": i} for i in range(20)]})
+
+    @app.route("/api/missing")
+    @cache.cached(ttl=60)
+    def missing():
+        return jsonify({"error": "not found"}), 404
+
+    @app.route("/api/small")
+    def small():
+        return jsonify({"ok": True})
+
+    @app.route("/api/stream")
+    def stream():
+        return Response((chunk for chunk in ["data: 1\n\n"]), mimetype="text/event-stream")
+
+    return app, cache, calls
+
+
+def test_cached_route_runs_handler_once_per_ttl():
+    app, cache, calls = _app()
+    client = app.test_client()
+    first = client.get("/api/portfolio")
+    second = client.get("/api/portfolio")
+    assert calls["portfolio"] == 1
+    assert first.data == second.data
+    client.get("/api/portfolio?symbol=ETHUSDT")
+    assert calls["portfolio"] == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_etag_and_conditional_get():
+    app, cache, _ = _app()
+    client = app.test_client()
+    first = client.get("/api/small")
+    etag = first.headers["ETag"]
+    assert etag.startswith('"') and not etag.startswith("W/")
+
+    again = client.get("/api/small", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert client.get("/api/small", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_gzip_negotiation_and_stream_passthrough():
+    app, _, _ = _app()
+    client = app.test_client()
+    plain = client.get("/api/portfolio")
+    assert "Content-Encoding" not in plain.headers
+
+    compressed = client.get("/api/portfolio", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers["ETag"] != plain.headers["ETag"]
+
+    # Bodies below min_size go out as-is
+    assert "Content-Encoding" not in client.get("/api/small", headers={"Accept-Encoding": "gzip"}).headers
+
+    stream = client.get("/api/stream", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in stream.headers and "ETag" not in stream.headers
+
+
+def test_fill_locks_are_released_for_uncached_and_cache_busting_requests():
+    app, cache, calls = _app()
+    client = app.test_client()
+    for i in range(50):
+        client.get(f"/api/portfolio?_={i}")
+        assert client.get("/api/missing").status_code == 404
+    assert calls["portfolio"] == 50
+    assert cache._inflight == {}
+    assert cache.stats()["misses"] == 100
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the symbol-sharded OMS
+"""
+import multiprocessing
+from dataclasses import replace
+
+from advanced_order_management_system import OrderManagementSystem, OrderStatus, OrderType
+from sharded_oms import COUNTER_FIELDS, ShardCounters, ShardedOMS, shard_for
+from test_order_database import _order
+
+
+def test_symbol_placement_is_stable_and_overridable():
+    assert shard_for("BTCUSDT", 4) == shard_for("BTCUSDT", 4)
+    assert {shard_for(f"SYM{i}USDT", 4) for i in range(50)} == {0, 1, 2, 3}
+    assert shard_for("BTCUSDT", 4, {"BTCUSDT": 2}) == 2
+    assert shard_for("ETHUSDT", 4, {"BTCUSDT": 2}) == shard_for("ETHUSDT", 4)
+
+
+def test_shared_counters_apply_portfolio_limits_across_shards(tmp_path):
+    counters = ShardCounters(multiprocessing.RawArray('d', 2 * len(COUNTER_FIELDS)), 2)
+    busy = OrderManagementSystem(db_path=str(tmp_path / "a.db"), recover=False, start_threads=False)
+    busy.risk_manager.on_fill("ETHUSDT", _order().side, 3300.0, 3000.0)  # $9.9M traded on shard 0
+    counters.publish(0, busy)
+
+    other = OrderManagementSystem(db_path=str(tmp_path / "b.db"), recover=False, start_threads=False)
+    risk = other.risk_manager
+    risk.peer_daily_volume, risk.peer_gross_exposure = counters.peers(1)
+    assert risk.peer_daily_volume == 9_900_000
+    ok, message = other.submit_order(_order(quantity=5.0))  # $225k more on shard 1
+    assert not ok and "daily volume" in message
+    assert counters.totals()["gross_exposure"] == 9_900_000
+    busy.shutdown()
+    other.shutdown()
+
+
+def test_worker_processes_route_execute_cancel_and_aggregate(tmp_path):
+    oms = ShardedOMS(shards=2, db_dir=str(tmp_path), recover=False, tick_interval=60,
+                     placement={"BTCUSDT": 0, "ETHUSDT": 1}, refresh_volume_profiles=False)
+    try:
+        btc = replace(_order(quantity=0.01), order_type=OrderType.MARKET, price=None)
+        eth = replace(_order(quantity=0.1), symbol="ETHUSDT", order_type=OrderType.MARKET, price=None)
+        resting = replace(_order(quantity=0.01), price=1000.0)  # far below the market
+        results = oms.submit_orders([btc, eth, resting])
+        assert all(ok for ok, _ in results)
+        counters = oms.sync()
+        assert [int(row["orders"]) for row in counters] == [2, 1]
+
+        assert oms.order_state(btc.order_id).status == OrderStatus.FILLED
+        assert oms.order_state(eth.order_id).status == OrderStatus.FILLED
+        assert oms.cancel_order(resting.order_id)[0]
+        assert oms.order_state(resting.order_id).status == OrderStatus.CANCELLED
+
+        page = oms.query_orders(status=OrderStatus.FILLED)
+        assert {order.order_id for order, _ in page.rows} == {btc.order_id, eth.order_id}
+        totals = oms.risk_exposure()
+        assert totals["orders"] == 3 and totals["fills"] >= 2 and totals["gross_exposure"] > 0
+    finally:
+        oms.shutdown()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Tests for the background system metrics sampler
+"""
+import time
+
+import pytest
+
+from system_metrics_sampler import SystemMetricsSampler
+
+
+def test_latest_is_served_without_blocking():
+    sampler = SystemMetricsSampler(interval=0.05).start()
+    time.sleep(0.2)
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        sample = sampler.latest()
+    elapsed = time.perf_counter() - started
+    sampler.stop()
+
+    assert elapsed < 0.05
+    assert 0 <= sample.cpu_percent <= 100 * 256
+    assert sample.memory_total > 0
+
+
+def test_history_and_window_cover_recent_samples():
+    sampler = SystemMetricsSampler(interval=0.01, history_size=5)
+    for _ in range(8):
+        sampler.sample_now()
+
+    history = sampler.history(metrics=["cpu_percent", "process_rss"])
+    window = sampler.window(60, ["memory_percent"])
+
+    assert len(history["timestamp"]) == 5
+    assert len(history["process_rss"]) == 5
+    assert window["samples"] == 5
+    assert window["memory_percent"]["min"] <= window["memory_percent"]["mean"] <= window["memory_percent"]["max"]
+
+
+def test_unknown_metric_is_rejected():
+    sampler = SystemMetricsSampler()
+    with pytest.raises(ValueError):
+        sampler.history(metrics=["not_a_metric"])
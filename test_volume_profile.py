@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from advanced_order_management_system import AlgorithmicExecutor, ExecutionAlgorithm, OrderManagementSystem
+from test_order_database import _order
+from volume_profile import DAY_MS, VolumeProfile, VolumeProfileService, offline_volume_profile_service
+
+START = 1_700_006_400_000  # a UTC midnight
+
+
+def _klines(days, start=START, peak_hour=14):
+    timestamps = start + np.arange(0, days * DAY_MS, 5 * 60 * 1000, dtype=np.int64)
+    minute = (timestamps % DAY_MS) // 60000
+    volume = 1 + 5 * np.exp(-((minute - peak_hour * 60) / 60.0) ** 2)
+    return pd.DataFrame({"timestamp": pd.to_datetime(timestamps, unit="ms"), "volume": volume})
+
+
+def test_profile_buckets_by_time_of_day_and_decays_old_days():
+    frame = _klines(10)
+    bulk = VolumeProfile("BTCUSDT", half_life_days=2)
+    assert bulk.add_frame(frame) == len(frame)
+    one_by_one = VolumeProfile("BTCUSDT", half_life_days=2)
+    for ts, volume in zip(frame["timestamp"], frame["volume"]):
+        one_by_one.add(ts, volume)
+    assert np.allclose(bulk.curve(), one_by_one.curve())
+    assert bulk.curve().argmax() == 14 * 12 and abs(bulk.curve().sum() - 1) < 1e-9
+
+    # Three recent days peaking at 02:00 outweigh ten older days peaking at 14:00
+    bulk.add_frame(_klines(3, start=START + 10 * DAY_MS, peak_hour=2))
+    assert bulk.curve().argmax() == 2 * 12
+
+    # A re-sent forming candle replaces its volume; older candles are ignored
+    last = bulk.last_timestamp
+    before = bulk.curve()
+    assert bulk.add(last, 1000.0) and not np.allclose(bulk.curve(), before)
+    assert bulk.add(last, 1.0) and np.allclose(bulk.curve(), before)
+    assert not bulk.add(last - DAY_MS, 50.0)
+    assert bulk.candles == len(frame) + 3 * 288
+
+
+def test_service_caches_on_disk_and_fetches_only_new_candles(tmp_path):
+    calls = []
+    history = _klines(5)
+
+    def fetch(symbol, interval, start_ms, end_ms):
+        calls.append((start_ms, end_ms))
+        stamps = np.asarray(history["timestamp"], dtype="datetime64[ms]").astype(np.int64)
+        return history[(stamps >= start_ms) & (stamps <= end_ms)]
+
+    service = VolumeProfileService(cache_dir=tmp_path, fetch=fetch)
+    now = START + 5 * DAY_MS
+    assert service.refresh("BTCUSDT", now=now - DAY_MS) == 4 * 288 + 1
+    assert service.refresh("BTCUSDT", now=now) == 288  # the boundary candle is re-applied, not double counted
+    assert calls[1][0] == START + 4 * DAY_MS
+
+    restarted = VolumeProfileService(cache_dir=tmp_path, fetch=fetch)
+    assert np.allclose(restarted.get("BTCUSDT").curve(), service.get("BTCUSDT").curve())
+    assert not restarted.is_stale("BTCUSDT")
+    weights = restarted.schedule("BTCUSDT", START + 13 * 3600 * 1000, slices=12, slice_minutes=5)
+    assert len(weights) == 12 and weights == sorted(weights)  # volume builds towards the 14:00 peak
+
+
+def test_vwap_slices_follow_the_volume_curve(tmp_path):
+    service = VolumeProfileService(cache_dir=tmp_path, fetch=lambda *args: pd.DataFrame())
+    service.update("BTCUSDT", _klines(3))
+    parent = _order(quantity=1.0, algorithm=ExecutionAlgorithm.VWAP)
+    parent.created_at = datetime.fromtimestamp((START + 13 * 3600 * 1000) / 1000, tz=timezone.utc)
+
+    slices = AlgorithmicExecutor(volume_profiles=service).execute_vwap(parent)
+    expected = service.schedule("BTCUSDT", parent.created_at, 12, 5)
+    quantities = [child.quantity for child in slices]
+    assert len(slices) == 12 and abs(sum(quantities) - 1.0) < 1e-9
+    assert np.allclose(quantities, np.asarray(expected) / sum(expected))
+
+
+def test_oms_schedules_vwap_from_an_injected_offline_service(tmp_path):
+    service = offline_volume_profile_service(tmp_path / "profiles")
+    service.fetch = lambda *args: (_ for _ in ()).throw(AssertionError("offline service fetched klines"))
+    oms = OrderManagementSystem(db_path=str(tmp_path / "orders.db"), recover=False, start_threads=False,
+                                volume_profiles=service)
+    assert oms.executor.volume_profiles is service
+
+    parent = _order(quantity=1.2, algorithm=ExecutionAlgorithm.VWAP)
+    assert oms.submit_order(parent)[0]
+    assert f"{parent.order_id}_VWAP_1" in oms.order_states
+    assert not service._refreshing and not (tmp_path / "profiles").exists()
+    oms.shutdown()
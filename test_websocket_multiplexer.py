@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for the WebSocket multiplexer ring buffers and fan-out
+"""
+import json
+import threading
+import time
+
+from websocket_multiplexer import CALLBACK_BATCH, ReadPolicy, TopicRing, TopicReader, WebSocketMultiplexer
+
+
+def _frame(topic, n):
+    return json.dumps({"topic": topic, "ts": n, "data": {"n": n}})
+
+
+def test_each_reader_gets_every_message_once():
+    mux = WebSocketMultiplexer("ws://unused", autostart=False)
+    first = mux.reader("tickers.BTCUSDT")
+    second = mux.reader("tickers.BTCUSDT")
+
+    for n in range(5):
+        mux.on_raw_message(_frame("tickers.BTCUSDT", n))
+    mux.on_raw_message(_frame("tickers.ETHUSDT", 99))  # not subscribed
+
+    assert [m["data"]["n"] for m in first.poll()] == [0, 1, 2, 3, 4]
+    assert [m["data"]["n"] for m in second.poll(max_items=2)] == [0, 1]
+    assert [m["data"]["n"] for m in second.poll()] == [2, 3, 4]
+    assert first.poll() == []
+    assert mux.stats["unrouted"] == 1
+
+
+def test_slow_reader_drops_oldest_when_ring_wraps():
+    ring = TopicRing("trades", capacity=4)
+    reader = TopicReader(ring, ReadPolicy.DROP_OLDEST)
+
+    for n in range(10):
+        ring.publish(n)
+
+    assert reader.poll() == [6, 7, 8, 9]
+    assert reader.dropped == 6
+
+
+def test_conflating_reader_sees_only_latest():
+    ring = TopicRing("tickers", capacity=8)
+    reader = TopicReader(ring, ReadPolicy.CONFLATE)
+
+    for n in range(5):
+        ring.publish(n)
+
+    assert reader.poll() == [4]
+    assert reader.dropped == 4
+    assert reader.poll() == []
+
+
+def test_slow_callback_does_not_block_socket_thread():
+    mux = WebSocketMultiplexer("ws://unused", autostart=False)
+    release = threading.Event()
+    fast_seen = []
+    mux.add_callback("orderbook.50.BTCUSDT", lambda message: release.wait(2))
+    mux.add_callback("orderbook.50.ETHUSDT", lambda message: fast_seen.append(message["ts"]))
+
+    started = time.time()
+    for n in range(100):
+        mux.on_raw_message(_frame("orderbook.50.BTCUSDT", n))
+        mux.on_raw_message(_frame("orderbook.50.ETHUSDT", n))
+    publish_time = time.time() - started
+
+    deadline = time.time() + 2
+    while len(fast_seen) < 100 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    mux.stop()
+
+    assert publish_time < 0.5
+    assert fast_seen == list(range(100))
+
+
+def test_callbacks_share_a_bounded_worker_pool():
+    mux = WebSocketMultiplexer("ws://unused", autostart=False, callback_workers=2)
+    seen = {}
+    done = threading.Event()
+
+    def record(message):
+        seen.setdefault(message["topic"], []).append(message["data"]["n"])
+        if sum(map(len, seen.values())) == 200 * 10:
+            done.set()
+
+    for i in range(200):
+        mux.add_callback(f"orderbook.50.SYM{i}USDT", record)
+    for n in range(10):
+        for i in range(200):
+            mux.on_raw_message(_frame(f"orderbook.50.SYM{i}USDT", n))
+
+    assert done.wait(5)
+    mux.stop()
+    assert len(mux._consumers) == 2
+    assert all(values == list(range(10)) for values in seen.values())  # per-topic order kept
+
+
+def test_order_book_gap_resubscribes_once_and_skips_the_stale_backlog():
+    from local_order_book import OrderBookManager
+
+    class Mux(WebSocketMultiplexer):
+        resubscribed = []
+
+        def resubscribe(self, topic):
+            self.resubscribed.append(topic)
+
+    mux = Mux("ws://unused", autostart=False, callback_workers=1)
+    manager = OrderBookManager()
+    gate = threading.Event()
+    manager.add_listener(lambda book: gate.wait(2))  # a slow consumer
+    manager.subscribe_stream(mux, ["BTCUSDT"])
+    topic = "orderbook.50.BTCUSDT"
+
+    def book_frame(kind, u):
+        return json.dumps({"topic": topic, "type": kind, "ts": u,
+                           "data": {"s": "BTCUSDT", "b": [["100", "1"]], "a": [["101", "1"]], "u": u}})
+
+    mux.on_raw_message(book_frame("snapshot", 10))
+    mux.on_raw_message(book_frame("delta", 13))  # gap
+    for u in range(14, 300):  # more than one callback batch behind
+        mux.on_raw_message(book_frame("delta", u))
+    gate.set()
+    deadline = time.time() + 2
+    while manager._stream_readers["BTCUSDT"].lag:
+        if time.time() > deadline:
+            break
+        time.sleep(0.01)
+    mux.stop()
+
+    assert mux.resubscribed == [topic]
+    assert manager.gap_count == 1
+    # Deltas beyond the batch already in hand are skipped, never replayed
+    assert manager._stream_readers["BTCUSDT"].dropped >= 287 - CALLBACK_BATCH
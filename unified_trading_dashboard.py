@@ -19,10 +19,11 @@ import plotly.graph_objects as go
 import plotly.express as px
 import json
 import requests
-import time
 from datetime import datetime, timedelta
 import warnings
 import logging
+
+from dashboard_event_stream import DashboardStreamClient
 warnings.filterwarnings('ignore')
 
 # Dodaj ścieżki do importów
@@ -167,6 +168,8 @@ class UnifiedDashboard:
             print("⚠️ python-dotenv not available")
         
         self.api_base = "http://localhost:5001"
+        # Dane portfela, statusu i alertów przychodzą strumieniem SSE zamiast odpytywania API
+        self.stream = DashboardStreamClient(self.api_base, ["portfolio", "bot_status", "alerts"])
         self.production_mode = os.getenv("BYBIT_PRODUCTION_ENABLED", "").lower() == "true"
         self.production_manager = None
         
@@ -198,6 +201,9 @@ class UnifiedDashboard:
             'Real-Time Market Data': "🟢 Integrated",        }
         
         # Sprawdź tylko Enhanced Dashboard API jako backend
+        if self.stream.connected:
+            services['Enhanced Dashboard API'] = "🟢 Online"
+            return services
         try:
             response = requests.get(f"{self.api_base}/health", timeout=3)
             api_status = "🟢 Online" if response.status_code == 200 else "🟡 Issues"
@@ -240,11 +246,13 @@ class UnifiedDashboard:
                 # Don't show error messages here, let render functions handle display
                 pass
         
-        # Try Enhanced Dashboard API portfolio endpoint
+        # Enhanced Dashboard API portfolio - pushed over the stream, REST only until it connects
         try:
-            response = requests.get(f"{self.api_base}/api/portfolio", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
+            data = self.stream.get("portfolio")
+            if data is None:
+                response = requests.get(f"{self.api_base}/api/portfolio", timeout=5)
+                data = response.json() if response.status_code == 200 else None
+            if data is not None:
                 return {
                     'total_profit': data.get('performance', {}).get('total_pnl', 0),
                     'active_bots': len(data.get('positions', [])),
@@ -1238,6 +1246,7 @@ def main():
     if 'unified_dashboard' not in st.session_state:
         st.session_state.unified_dashboard = UnifiedDashboard()
     dashboard = st.session_state.unified_dashboard
+    stream_version = dashboard.stream.version
     
     # Sidebar z nawigacją
     st.sidebar.markdown("""
@@ -1297,9 +1306,10 @@ def main():
     elif page == "📤 Eksport/Import Danych":
         render_data_export()
     
-    # Auto-refresh logic
+    # Auto-refresh logic: rerun as soon as the API pushes a change,
+    # at the latest after refresh_interval
     if auto_refresh:
-        time.sleep(refresh_interval)
+        dashboard.stream.wait_for_update(stream_version, timeout=refresh_interval)
         st.rerun()
       # Footer z informacjami
     st.markdown("---")
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+volume_profile.py
+-----------------
+Intraday volume curves per symbol, built from klines, for VWAP scheduling.
+
+Until now the OMS fed VWAP twelve random numbers as its "historical volume".
+A VolumeProfile buckets candle volume by time of day (UTC) and weights each
+day exponentially, so recent sessions count more. With ``half_life_days=5``
+a candle from five days ago counts half as much as one from today.
+
+Decay costs nothing per update. Rather than shrinking every bucket when a
+new day starts, a candle from day ``d`` is added with weight
+``2 ** ((d - ref_day) / half_life)``, and the curve is normalised when it is
+read. The common factor cancels, and ``ref_day`` is moved forward now and
+then so the weights stay in floating-point range. Each new or updated
+candle therefore touches only its own buckets, and history is never
+rescanned.
+
+VolumeProfileService caches one profile per symbol in memory and as JSON
+under ``data/cache/volume_profiles``. It tops profiles up in the background
+with the candles published since the last one seen. Benchmarks and tests
+pass ``offline_volume_profile_service()`` instead, which never refreshes.
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 24 * 60 * 60 * 1000
+MINUTES_PER_DAY = 24 * 60
+REBASE_DAYS = 256  # 2 ** (256 / half_life) stays far from float overflow
+
+TimeLike = Union[int, float, datetime, pd.Timestamp]
+
+
+def _epoch_ms(value: TimeLike) -> int:
+    if isinstance(value, pd.Timestamp):
+        return int(value.value // 1_000_000)
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+    return int(value)
+
+
+class VolumeProfile:
+    """Exponentially weighted time-of-day volume curve for one symbol"""
+
+    def __init__(self, symbol: str, bucket_minutes: int = 5, half_life_days: float = 5.0):
+        if MINUTES_PER_DAY % bucket_minutes:
+            raise ValueError("bucket_minutes must divide a day")
+        self.symbol = symbol
+        self.bucket_minutes = bucket_minutes
+        self.bucket_ms = bucket_minutes * 60 * 1000
+        self.half_life_days = half_life_days
+        self._sums = np.zeros(MINUTES_PER_DAY // bucket_minutes)
+        self._ref_day: Optional[int] = None
+        self.last_timestamp: Optional[int] = None  # open time (ms) of the newest candle applied
+        self._last_candle: Optional[Tuple[int, int, float]] = None  # (open ms, interval ms, volume)
+        self.candles = 0
+        self._lock = threading.Lock()
+
+    @property
+    def buckets(self) -> int:
+        return len(self._sums)
+
+    def _day_weight(self, day: int) -> float:
+        return 2.0 ** ((day - self._ref_day) / self.half_life_days)
+
+    def _rebase(self, day: int):
+        self._sums *= 2.0 ** ((self._ref_day - day) / self.half_life_days)
+        self._ref_day = day
+
+    def _spread(self, timestamp: int, interval_ms: int, volume: float):
+        """Add ``volume`` evenly over the buckets the candle covers"""
+        day = timestamp // DAY_MS
+        if self._ref_day is None:
+            self._ref_day = day
+        elif day - self._ref_day > REBASE_DAYS:
+            self._rebase(day)
+        covered = max(1, interval_ms // self.bucket_ms)
+        first = (timestamp % DAY_MS) // self.bucket_ms
+        share = volume * self._day_weight(day) / covered
+        if covered == 1:
+            self._sums[first] += share
+        else:
+            index = (first + np.arange(covered)) % self.buckets
+            np.add.at(self._sums, index, share)
+
+    def add(self, timestamp: TimeLike, volume: float, interval_ms: Optional[int] = None) -> bool:
+        """
+        Apply one candle. Returns False for a candle older than the newest one seen.
+
+        Re-sending the newest candle replaces its earlier contribution, so a
+        candle that is still forming can be pushed on every update.
+        """
+        timestamp = _epoch_ms(timestamp)
+        interval_ms = interval_ms or self.bucket_ms
+        with self._lock:
+            if self.last_timestamp is not None and timestamp < self.last_timestamp:
+                return False
+            if self.last_timestamp == timestamp and self._last_candle is not None:
+                _, previous_interval, previous_volume = self._last_candle
+                self._spread(timestamp, previous_interval, -previous_volume)
+            else:
+                self.candles += 1
+            self._spread(timestamp, interval_ms, float(volume))
+            self.last_timestamp = timestamp
+            self._last_candle = (timestamp, interval_ms, float(volume))
+            return True
+
+    def add_frame(self, frame: pd.DataFrame, interval_ms: Optional[int] = None) -> int:
+        """Apply the candles of a kline DataFrame (``timestamp``, ``volume``) newer than the last one seen"""
+        if frame is None or frame.empty:
+            return 0
+        timestamps = frame["timestamp"]
+        if pd.api.types.is_datetime64_any_dtype(timestamps):
+            timestamps = np.asarray(timestamps, dtype="datetime64[ms]").astype(np.int64)
+        else:
+            timestamps = np.asarray(timestamps, dtype=np.int64)
+        volumes = np.asarray(frame["volume"], dtype=np.float64)
+        order = np.argsort(timestamps, kind="stable")
+        timestamps, volumes = timestamps[order], volumes[order]
+        interval_ms = interval_ms or self.bucket_ms
+
+        if self.last_timestamp is not None:
+            keep = timestamps >= self.last_timestamp
+            timestamps, volumes = timestamps[keep], volumes[keep]
+        applied = 0
+        if len(timestamps) and timestamps[0] == self.last_timestamp:
+            # Re-sent newest candle: replace its earlier volume
+            applied += self.add(int(timestamps[0]), float(volumes[0]), interval_ms)
+            timestamps, volumes = timestamps[1:], volumes[1:]
+        if not len(timestamps):
+            return applied
+        if interval_ms > self.bucket_ms:
+            return applied + sum(self.add(int(ts), float(v), interval_ms) for ts, v in zip(timestamps, volumes))
+
+        # Bulk path: all but the newest candle in one vectorised pass
+        body_ts, body_v = timestamps[:-1], volumes[:-1]
+        if len(body_ts):
+            with self._lock:
+                days = body_ts // DAY_MS
+                if self._ref_day is None:
+                    self._ref_day = int(days[0])
+                if days[-1] - self._ref_day > REBASE_DAYS:
+                    self._rebase(int(days[-1]))
+                weights = np.exp2((days - self._ref_day) / self.half_life_days)
+                np.add.at(self._sums, (body_ts % DAY_MS) // self.bucket_ms, body_v * weights)
+                self.candles += len(body_ts)
+                self.last_timestamp = int(body_ts[-1])
+                self._last_candle = (int(body_ts[-1]), interval_ms, float(body_v[-1]))
+            applied += len(body_ts)
+        # The newest candle may still be forming; add() lets a later update replace it
+        return applied + self.add(int(timestamps[-1]), float(volumes[-1]), interval_ms)
+
+    def curve(self) -> np.ndarray:
+        """Share of daily volume per bucket; flat when nothing has been loaded"""
+        with self._lock:
+            sums = np.clip(self._sums, 0.0, None)
+        total = sums.sum()
+        if total <= 0:
+            return np.full(self.buckets, 1.0 / self.buckets)
+        return sums / total
+
+    def schedule(self, start: TimeLike, slices: int, slice_minutes: int) -> List[float]:
+        """Expected volume share of each of ``slices`` consecutive windows starting at ``start``"""
+        per_minute = np.repeat(self.curve() / self.bucket_minutes, self.bucket_minutes)
+        first_minute = (_epoch_ms(start) // 60000) % MINUTES_PER_DAY
+        minutes = (first_minute + np.arange(slices * slice_minutes)) % MINUTES_PER_DAY
+        return per_minute[minutes].reshape(slices, slice_minutes).sum(axis=1).tolist()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "symbol": self.symbol,
+                "bucket_minutes": self.bucket_minutes,
+                "half_life_days": self.half_life_days,
+                "ref_day": self._ref_day,
+                "last_timestamp": self.last_timestamp,
+                "last_candle": list(self._last_candle) if self._last_candle else None,
+                "candles": self.candles,
+                "sums": self._sums.tolist(),
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "VolumeProfile":
+        profile = cls(data["symbol"], data["bucket_minutes"], data["half_life_days"])
+        profile._sums = np.asarray(data["sums"], dtype=np.float64)
+        profile._ref_day = data["ref_day"]
+        profile.last_timestamp = data["last_timestamp"]
+        profile._last_candle = tuple(data["last_candle"]) if data.get("last_candle") else None
+        profile.candles = data["candles"]
+        return profile
+
+
+def _download_klines(symbol: str, interval: str, start_ms: int, end_ms: int) -> pd.DataFrame:
+    from historical_data_downloader import download_history
+    return download_history(symbol, interval, start_ms, end_ms)
+
+
+class VolumeProfileService:
+    """Cached, incrementally refreshed volume profiles"""
+
+    def __init__(self, cache_dir: Union[str, Path] = "data/cache/volume_profiles", interval: str = "5",
+                 lookback_days: int = 20, half_life_days: float = 5.0, max_age: float = 3600,
+                 fetch: Optional[Callable[[str, str, int, int], pd.DataFrame]] = None):
+        self.cache_dir = Path(cache_dir)
+        self.interval = interval
+        self.interval_ms = int(interval) * 60 * 1000
+        self.lookback_days = lookback_days
+        self.half_life_days = half_life_days
+        self.max_age = max_age
+        self.fetch = fetch or _download_klines
+        self._profiles: Dict[str, VolumeProfile] = {}
+        self._refreshed_at: Dict[str, float] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str) -> Path:
+        return self.cache_dir / f"{symbol}_{self.interval}.json"
+
+    def get(self, symbol: str) -> VolumeProfile:
+        """Profile from memory, else from the disk cache, else a new empty one"""
+        with self._lock:
+            profile = self._profiles.get(symbol)
+            if profile is not None:
+                return profile
+            path = self._path(symbol)
+            profile = None
+            if path.exists():
+                try:
+                    profile = VolumeProfile.from_dict(json.loads(path.read_text(encoding="utf-8")))
+                    self._refreshed_at[symbol] = path.stat().st_mtime
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Ignoring unreadable volume profile cache {path}: {e}")
+            if profile is None:
+                profile = VolumeProfile(symbol, int(self.interval), self.half_life_days)
+            self._profiles[symbol] = profile
+            return profile
+
+    def save(self, symbol: str):
+        profile = self.get(symbol)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(symbol)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(profile.to_dict()), encoding="utf-8")
+        tmp.replace(path)
+
+    def update(self, symbol: str, frame: pd.DataFrame) -> int:
+        """Fold new candles into the profile and persist it"""
+        applied = self.get(symbol).add_frame(frame, self.interval_ms)
+        with self._lock:
+            self._refreshed_at[symbol] = time.time()
+        if applied:
+            self.save(symbol)
+        return applied
+
+    def refresh(self, symbol: str, now: Optional[TimeLike] = None) -> int:
+        """Fetch only the candles published since the newest one in the profile"""
+        profile = self.get(symbol)
+        end_ms = _epoch_ms(now) if now is not None else int(time.time() * 1000)
+        start_ms = profile.last_timestamp if profile.last_timestamp is not None \
+            else end_ms - self.lookback_days * DAY_MS
+        frame = self.fetch(symbol, self.interval, start_ms, end_ms)
+        applied = self.update(symbol, frame)
+        logger.info(f"Volume profile {symbol}: {applied} candles applied ({profile.candles} total)")
+        return applied
+
+    def is_stale(self, symbol: str) -> bool:
+        return time.time() - self._refreshed_at.get(symbol, 0.0) > self.max_age
+
+    def refresh_async(self, symbol: str) -> bool:
+        """Start a background refresh unless one is running or the profile is fresh"""
+        with self._lock:
+            if symbol in self._refreshing or not self.is_stale(symbol):
+                return False
+            self._refreshing.add(symbol)
+            # A failed refresh is not retried before max_age either
+            self._refreshed_at[symbol] = time.time()
+
+        def run():
+            try:
+                self.refresh(symbol)
+            except Exception as e:
+                logger.warning(f"Volume profile refresh for {symbol} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(symbol)
+
+        threading.Thread(target=run, name=f"volume-profile-{symbol}", daemon=True).start()
+        return True
+
+    def schedule(self, symbol: str, start: TimeLike, slices: int, slice_minutes: int) -> List[float]:
+        """Slice weights from the cached curve; never waits for the network"""
+        profile = self.get(symbol)
+        if self.is_stale(symbol):
+            self.refresh_async(symbol)
+        return profile.schedule(start, slices, slice_minutes)
+
+
+_service: Optional[VolumeProfileService] = None
+_service_lock = threading.Lock()
+
+
+def get_volume_profile_service() -> VolumeProfileService:
+    """Process-wide service"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = VolumeProfileService()
+        return _service
+
+
+def offline_volume_profile_service(cache_dir: Union[str, Path] = "data/cache/volume_profiles") -> VolumeProfileService:
+    """Service that serves cached (or flat) profiles and never downloads or writes them"""
+    return VolumeProfileService(cache_dir=cache_dir, max_age=float("inf"))
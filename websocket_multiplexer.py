@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+websocket_multiplexer.py
+------------------------
+One WebSocket per Bybit stream endpoint, shared by every topic and consumer.
+
+BybitConnector subscribes topics one at a time and runs the single registered
+callback synchronously on the socket thread, so one slow consumer stalls the
+whole feed. WebSocketMultiplexer keeps one connection per endpoint URL,
+subscribes topics in batches, decodes each frame exactly once and publishes
+it into a per-topic ring buffer. The socket thread is the only writer and
+never waits for readers. Each consumer reads through its own cursor at its
+own pace. A reader that falls behind either loses the oldest messages
+(DROP_OLDEST) or only ever sees the newest one (CONFLATE). Callbacks run on a
+small shared worker pool, so hundreds of topics do not need hundreds of
+threads.
+"""
+
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+try:
+    import orjson
+
+    def _decode(raw):
+        return orjson.loads(raw)
+except ImportError:  # pragma: no cover - orjson is optional
+    def _decode(raw):
+        return json.loads(raw)
+
+try:
+    import websocket
+except ImportError:  # pragma: no cover - only needed for live connections
+    websocket = None
+
+logger = logging.getLogger(__name__)
+
+BYBIT_PUBLIC_STREAM = "wss://stream.bybit.com/v5/public/{category}"
+BYBIT_PUBLIC_TESTNET_STREAM = "wss://stream-testnet.bybit.com/v5/public/{category}"
+SUBSCRIBE_BATCH_SIZE = 10  # Bybit accepts at most 10 args per spot subscribe request
+CALLBACK_WORKERS = 4  # threads shared by every add_callback consumer
+CALLBACK_BATCH = 100  # messages one callback handles before yielding its worker
+PING_INTERVAL = 20  # seconds; Bybit drops idle connections without an app-level ping
+
+
+def public_stream_url(category: str = "spot", use_testnet: bool = False) -> str:
+    # BYBIT_WS_BASE_URL points every stream at another host, e.g. a local replay server
+    override = os.getenv("BYBIT_WS_BASE_URL")
+    if override:
+        return f"{override.rstrip('/')}/v5/public/{category}"
+    template = BYBIT_PUBLIC_TESTNET_STREAM if use_testnet else BYBIT_PUBLIC_STREAM
+    return template.format(category=category)
+
+
+class ReadPolicy(Enum):
+    DROP_OLDEST = "drop_oldest"  # deliver everything still in the ring, count what was overwritten
+    CONFLATE = "conflate"        # deliver only the newest message
+
+
+class TopicRing:
+    """
+    Fixed-size single-writer ring of decoded messages for one topic.
+
+    The writer stores the slot and then advances ``write_seq``; readers never
+    take a lock and instead discard anything the writer may have overwritten
+    while they were copying. One spare slot absorbs the write in progress, so
+    the newest ``capacity`` messages are always readable.
+    """
+
+    def __init__(self, topic: str, capacity: int):
+        self.topic = topic
+        self.capacity = capacity
+        self.write_seq = 0
+        self._size = capacity + 1
+        self._slots: List[Any] = [None] * self._size
+        self._waiters: List[threading.Event] = []
+        self._listeners: List[Callable[[], None]] = []  # cheap wake-ups, run on the writer thread
+
+    def publish(self, message: Any):
+        seq = self.write_seq
+        self._slots[seq % self._size] = message
+        self.write_seq = seq + 1
+        for event in self._waiters:
+            event.set()
+        for listener in self._listeners:
+            listener()
+
+    def read(self, cursor: int, max_items: int):
+        """Return (messages, next_cursor, dropped) starting at ``cursor``"""
+        end = self.write_seq
+        start = max(cursor, end - self.capacity)
+        stop = min(end, start + max_items)
+        size = self._size
+        slots = self._slots
+        items = [slots[i % size] for i in range(start, stop)]
+        # The writer may have wrapped around while we copied; the slot it is
+        # writing right now counts as overwritten too
+        oldest_valid = self.write_seq - size + 1
+        if start < oldest_valid:
+            lost = min(oldest_valid - start, len(items))
+            items = items[lost:]
+            start += lost
+        return items, start + len(items), start - cursor
+
+    def latest(self) -> Any:
+        seq = self.write_seq
+        return self._slots[(seq - 1) % self._size] if seq else None
+
+
+class TopicReader:
+    """A consumer's cursor into one topic ring"""
+
+    def __init__(self, ring: TopicRing, policy: ReadPolicy = ReadPolicy.DROP_OLDEST,
+                 from_start: bool = False):
+        self.ring = ring
+        self.policy = policy
+        self.cursor = 0 if from_start else ring.write_seq
+        self.dropped = 0
+        self._event = threading.Event()
+        ring._waiters.append(self._event)
+
+    @property
+    def lag(self) -> int:
+        return self.ring.write_seq - self.cursor
+
+    def poll(self, max_items: int = 1000) -> List[Any]:
+        """Messages published since the last read, without waiting"""
+        self._event.clear()
+        if self.policy == ReadPolicy.CONFLATE:
+            end = self.ring.write_seq
+            if end == self.cursor:
+                return []
+            self.dropped += end - self.cursor - 1
+            self.cursor = end
+            return [self.ring.latest()]
+        items, self.cursor, dropped = self.ring.read(self.cursor, max_items)
+        self.dropped += dropped
+        return items
+
+    def get(self, timeout: Optional[float] = None, max_items: int = 1000) -> List[Any]:
+        """Like poll, but waits up to ``timeout`` seconds for something to arrive"""
+        items = self.poll(max_items)
+        if items or not self._event.wait(timeout):
+            return items
+        return self.poll(max_items)
+
+    def skip_to_latest(self) -> int:
+        """Discard the backlog; returns how many unread messages were skipped"""
+        skipped = self.lag
+        self.cursor = self.ring.write_seq
+        self.dropped += skipped
+        return skipped
+
+    def close(self):
+        try:
+            self.ring._waiters.remove(self._event)
+        except ValueError:
+            pass
+
+
+class _Subscription:
+    """A callback bound to a reader, scheduled on the multiplexer's worker pool"""
+
+    __slots__ = ("topic", "reader", "callback", "scheduled")
+
+    def __init__(self, topic: str, reader: TopicReader, callback: Callable[[Dict[str, Any]], None]):
+        self.topic = topic
+        self.reader = reader
+        self.callback = callback
+        self.scheduled = False
+
+
+class WebSocketMultiplexer:
+    """Shared connection to one stream endpoint with per-topic fan-out"""
+
+    def __init__(self, url: str, ring_size: int = 1024, batch_size: int = SUBSCRIBE_BATCH_SIZE,
+                 reconnect_delay: float = 5.0, autostart: bool = True, callback_workers: int = CALLBACK_WORKERS):
+        self.url = url
+        self.autostart = autostart
+        self.ring_size = ring_size
+        self.batch_size = batch_size
+        self.reconnect_delay = reconnect_delay
+
+        self.topics: Dict[str, TopicRing] = {}
+        self.stats = {"messages": 0, "decode_errors": 0, "unrouted": 0, "reconnects": 0}
+
+        self._subscribed = set()  # topics acknowledged as sent on the current connection
+        self._lock = threading.Lock()
+        self._ws = None
+        self._connected = threading.Event()
+        self._running = False
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self.callback_workers = callback_workers
+        self._consumers: List[threading.Thread] = []
+        self._ready: "queue.Queue[_Subscription]" = queue.Queue()
+        self._schedule_lock = threading.Lock()
+        self._frame_taps: List[Callable[[str, Any], None]] = []
+        self._req_ids = itertools.count(1)
+
+    # ------------------------------------------------------------- topics
+
+    def _ring(self, topic: str) -> TopicRing:
+        ring = self.topics.get(topic)
+        if ring is None:
+            with self._lock:
+                ring = self.topics.setdefault(topic, TopicRing(topic, self.ring_size))
+        return ring
+
+    def subscribe(self, topics: Iterable[str]):
+        """Add topics to the shared connection; starts it on first use"""
+        new = [t for t in topics if t not in self.topics]
+        for topic in new:
+            self._ring(topic)
+        if self._connected.is_set():
+            self._send_subscribe(new)
+        if self.autostart:
+            self.start()
+
+    def unsubscribe(self, topics: Iterable[str]):
+        topics = [t for t in topics if t in self.topics]
+        with self._lock:
+            for topic in topics:
+                self.topics.pop(topic, None)
+                self._subscribed.discard(topic)
+        self._send_op("unsubscribe", topics)
+
+    def resubscribe(self, topic: str):
+        """Ask the exchange to resend a topic from scratch (orderbook topics restart with a snapshot)"""
+        self._send_op("unsubscribe", [topic])
+        with self._lock:
+            self._subscribed.discard(topic)
+        self._send_subscribe([topic])
+
+    def reader(self, topic: str, policy: ReadPolicy = ReadPolicy.DROP_OLDEST) -> TopicReader:
+        self.subscribe([topic])
+        return TopicReader(self._ring(topic), policy)
+
+    def add_callback(self, topic: str, callback: Callable[[Dict[str, Any]], None],
+                     policy: ReadPolicy = ReadPolicy.DROP_OLDEST) -> TopicReader:
+        """
+        Drive a connector-style callback from the shared worker pool.
+
+        The callback sees the same decoded message dict the connector would
+        pass. A topic with new messages is queued once; a worker handles up
+        to CALLBACK_BATCH of them and requeues the topic if more are waiting,
+        so a slow callback holds at most one worker and calls for one topic
+        never overlap.
+        """
+        reader = self.reader(topic, policy)
+        subscription = _Subscription(topic, reader, callback)
+        reader.ring._listeners.append(lambda: self._schedule(subscription))
+        self._start_workers()
+        self._schedule(subscription)
+        return reader
+
+    def _schedule(self, subscription: _Subscription):
+        with self._schedule_lock:
+            if subscription.scheduled or not subscription.reader.lag:
+                return
+            subscription.scheduled = True
+        self._ready.put(subscription)
+
+    def _start_workers(self):
+        with self._lock:
+            missing = self.callback_workers - len(self._consumers)
+            for _ in range(missing):
+                thread = threading.Thread(target=self._consume, name=f"ws-consumer-{len(self._consumers)}",
+                                          daemon=True)
+                self._consumers.append(thread)
+                thread.start()
+
+    def _consume(self):
+        while True:
+            try:
+                subscription = self._ready.get(timeout=1.0)
+            except queue.Empty:
+                if self._stopped:
+                    return
+                continue
+            for message in subscription.reader.poll(CALLBACK_BATCH):
+                try:
+                    subscription.callback(message)
+                except Exception as e:
+                    logger.error(f"Callback for {subscription.topic} failed: {e}")
+            requeue = False
+            with self._schedule_lock:
+                if subscription.reader.lag:
+                    requeue = True
+                else:
+                    subscription.scheduled = False
+            if requeue:
+                self._ready.put(subscription)
+
+    # ---------------------------------------------------------- socket side
+
+    def add_frame_tap(self, tap: Callable[[str, Any], None]):
+        """Called as tap(url, raw_frame) for every frame before decoding (used by recorders)"""
+        self._frame_taps.append(tap)
+
+    def on_raw_message(self, raw):
+        """Decode once and publish into the topic's ring; runs on the socket thread"""
+        for tap in self._frame_taps:
+            try:
+                tap(self.url, raw)
+            except Exception as e:
+                logger.debug(f"Frame tap failed: {e}")
+        try:
+            message = _decode(raw)
+        except ValueError:
+            self.stats["decode_errors"] += 1
+            return
+        self.stats["messages"] += 1
+        topic = message.get("topic")
+        if topic is None:
+            if message.get("op") == "subscribe" and not message.get("success", True):
+                logger.error(f"Subscribe rejected on {self.url}: {message.get('ret_msg')}")
+            return
+        ring = self.topics.get(topic)
+        if ring is None:
+            self.stats["unrouted"] += 1
+            return
+        ring.publish(message)
+
+    def start(self):
+        if self._running:
+            return
+        if websocket is None:
+            raise RuntimeError("websocket-client is required for live streams")
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"ws-mux-{self.url}", daemon=True)
+        self._thread.start()
+        threading.Thread(target=self._ping_loop, name="ws-mux-ping", daemon=True).start()
+
+    def stop(self):
+        self._running = False
+        self._stopped = True
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        while self._running:
+            self._ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=lambda ws, raw: self.on_raw_message(raw),
+                on_error=lambda ws, error: logger.error(f"WebSocket error on {self.url}: {error}"),
+                on_close=lambda ws, code, msg: self._connected.clear(),
+            )
+            self._ws.run_forever()
+            self._connected.clear()
+            if self._running:
+                self.stats["reconnects"] += 1
+                logger.warning(f"WebSocket {self.url} closed, reconnecting in {self.reconnect_delay}s")
+                time.sleep(self.reconnect_delay)
+
+    def _on_open(self, ws):
+        with self._lock:
+            self._subscribed.clear()
+        self._connected.set()
+        logger.info(f"WebSocket connected to {self.url}, subscribing {len(self.topics)} topics")
+        self._send_subscribe(list(self.topics))
+
+    def _ping_loop(self):
+        while self._running:
+            time.sleep(PING_INTERVAL)
+            if self._connected.is_set():
+                self._send({"op": "ping"})
+
+    def _send_subscribe(self, topics: List[str]):
+        with self._lock:
+            pending = [t for t in topics if t not in self._subscribed]
+            self._subscribed.update(pending)
+        self._send_op("subscribe", pending)
+
+    def _send_op(self, op: str, topics: List[str]):
+        for i in range(0, len(topics), self.batch_size):
+            self._send({"req_id": str(next(self._req_ids)), "op": op, "args": topics[i:i + self.batch_size]})
+
+    def _send(self, payload: Dict[str, Any]):
+        if not self._connected.is_set() or self._ws is None:
+            return
+        try:
+            self._ws.send(json.dumps(payload))
+        except Exception as e:
+            logger.error(f"WebSocket send failed on {self.url}: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "connected": self._connected.is_set(),
+            "topics": len(self.topics),
+            **self.stats,
+        }
+
+
+_multiplexers: Dict[str, WebSocketMultiplexer] = {}
+_multiplexers_lock = threading.Lock()
+
+
+def get_multiplexer(url: str) -> WebSocketMultiplexer:
+    """Process-wide multiplexer for a stream endpoint"""
+    with _multiplexers_lock:
+        if url not in _multiplexers:
+            _multiplexers[url] = WebSocketMultiplexer(url)
+        return _multiplexers[url]